@@ -0,0 +1,350 @@
+"""Exportación e importación del historial por bloques (CSV, NDJSON y Arrow).
+
+La exportación recorre el almacén por páginas con `get_page` y codifica y
+comprime cada página por separado, así que la memoria no depende del
+tamaño del historial. La importación decodifica el cuerpo también por
+bloques a un fichero temporal y valida todas las filas antes de dar de alta
+la primera, así que un archivo con una fila inválida no deja nada
+importado; en una segunda pasada las da de alta en lotes con `add_many`.
+Los ids se asignan de nuevo al importar y los timestamps se normalizan a
+hora local sin zona; pueden llegar en cualquier orden, también anteriores
+a los del historial.
+
+pyarrow (formato Arrow IPC en streaming) y zstandard (Content-Encoding
+zstd) son opcionales.
+"""
+import csv
+import io
+import math
+import tempfile
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+from app.compression import negotiate
+from app.history import HistoryBackend, HistoryRecord, local_timestamp
+from app.operations import OPERATIONS
+from app.responses import dumps
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow es opcional
+    pa = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard es opcional
+    zstandard = None
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson es opcional
+    import json
+    _loads = json.loads
+
+DECOMPRESSION_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+COLUMNS = ("id", "result", "operation", "operation_type", "timestamp")
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+CHUNK_ROWS = 10000
+# Cuerpo de una importación: en memoria hasta este tamaño, después en disco
+SPOOL_BYTES = 8 * 1024 * 1024
+READ_BYTES = 64 * 1024
+
+
+class ArchiveError(ValueError):
+    """Archivo de importación inválido o formato no disponible."""
+
+
+def available_encodings() -> List[str]:
+    return (["zstd"] if zstandard is not None else []) + ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Elige zstd o gzip según Accept-Encoding (None = sin comprimir)."""
+    return negotiate(accept_encoding, available_encodings())
+
+
+def _compressor(encoding: str):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    return zlib.compressobj(6, zlib.DEFLATED, 31)
+
+
+def _decompressor(encoding: Optional[str]):
+    if not encoding or encoding == "identity":
+        return None
+    if encoding == "gzip":
+        return zlib.decompressobj(47)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ArchiveError("Content-Encoding zstd requiere el paquete zstandard")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ArchiveError(f"Content-Encoding no soportado: {encoding}")
+
+
+def _row(record: HistoryRecord) -> tuple:
+    return (record.seq, record.result, record.operation, record.operation_type, record.timestamp)
+
+
+class CSVEncoder:
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _take(self) -> bytes:
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(COLUMNS)
+        return self._take()
+
+    def encode(self, page: List[HistoryRecord]) -> bytes:
+        # str(float) es el repr más corto: se relee sin pérdida
+        self._writer.writerows(_row(record) for record in page)
+        return self._take()
+
+    def footer(self) -> bytes:
+        return b""
+
+
+class NDJSONEncoder:
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, page: List[HistoryRecord]) -> bytes:
+        return b"".join(dumps(dict(zip(COLUMNS, self._row(record)))) + b"\n" for record in page)
+
+    @staticmethod
+    def _row(record: HistoryRecord) -> tuple:
+        # orjson escribe inf y NaN como null; "inf"/"-inf"/"nan" se releen con float()
+        row = _row(record)
+        return row if math.isfinite(record.result) else (row[0], str(record.result)) + row[2:]
+
+    def footer(self) -> bytes:
+        return b""
+
+
+def arrow_schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("result", pa.float64()),
+        ("operation", pa.string()),
+        ("operation_type", pa.string()),
+        ("timestamp", pa.string()),
+    ])
+
+
+class ArrowEncoder:
+    def __init__(self):
+        self._sink = io.BytesIO()
+        self._writer = pa.ipc.new_stream(self._sink, arrow_schema())
+
+    def _take(self) -> bytes:
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    def header(self) -> bytes:
+        return self._take()
+
+    def encode(self, page: List[HistoryRecord]) -> bytes:
+        columns = list(zip(*(_row(record) for record in page)))
+        self._writer.write_batch(pa.record_batch([list(column) for column in columns], schema=arrow_schema()))
+        return self._take()
+
+    def footer(self) -> bytes:
+        self._writer.close()
+        return self._take()
+
+
+def _encoder(fmt: str):
+    if fmt == "csv":
+        return CSVEncoder()
+    if fmt == "ndjson":
+        return NDJSONEncoder()
+    if pa is None:
+        raise ArchiveError("El formato arrow requiere el paquete pyarrow")
+    return ArrowEncoder()
+
+
+def export_history(
+    backend: HistoryBackend,
+    fmt: str,
+    encoding: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> Iterator[bytes]:
+    """Historial codificado (y comprimido) página a página.
+
+    El codificador se crea aquí y no al iterar, para que un formato no
+    disponible falle antes de empezar la respuesta.
+    """
+    encoder = _encoder(fmt)
+    compressor = _compressor(encoding) if encoding else None
+    return _export_chunks(backend, encoder, compressor, chunk_rows)
+
+
+def _export_chunks(backend: HistoryBackend, encoder, compressor, chunk_rows: int) -> Iterator[bytes]:
+    def chunks() -> Iterator[bytes]:
+        yield encoder.header()
+        cursor = None
+        while True:
+            page = backend.get_page(cursor=cursor, limit=chunk_rows)
+            if not page:
+                break
+            yield encoder.encode(page)
+            cursor = page[-1].seq
+        yield encoder.footer()
+
+    for chunk in chunks():
+        data = compressor.compress(chunk) if compressor is not None else chunk
+        if data:
+            yield data
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _timestamp(value) -> str:
+    text = str(value)
+    # fromisoformat no acepta el sufijo Z hasta Python 3.11
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    return local_timestamp(datetime.fromisoformat(text))
+
+
+def _record(values: Dict, line: int) -> HistoryRecord:
+    try:
+        # Un tipo desconocido no se podría filtrar y quedaría para siempre en el almacén
+        operation_type = values.get("operation_type") or None
+        if operation_type is not None and operation_type not in OPERATIONS:
+            raise ValueError(f"tipo de operación desconocido: {operation_type}")
+        return HistoryRecord(
+            float(values["result"]),
+            str(values["operation"]),
+            _timestamp(values["timestamp"]),
+            operation_type=operation_type,
+        )
+    except (KeyError, TypeError, ValueError) as e:
+        raise ArchiveError(f"Fila {line} inválida: {e}") from None
+
+
+async def _decoded(stream: AsyncIterator[bytes], content_encoding: Optional[str]) -> AsyncIterator[bytes]:
+    decompressor = _decompressor(content_encoding)
+    async for chunk in stream:
+        if decompressor is None:
+            yield chunk
+            continue
+        try:
+            data = decompressor.decompress(chunk)
+        except DECOMPRESSION_ERRORS as e:
+            raise ArchiveError(f"Cuerpo comprimido inválido: {e}") from None
+        if data:
+            yield data
+
+
+async def _lines(stream: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def _text_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[HistoryRecord]:
+    header = None
+    number = 0
+    async for raw in _lines(stream):
+        number += 1
+        line = raw.strip()
+        if not line:
+            continue
+        if fmt == "ndjson":
+            try:
+                values = _loads(line)
+            except ValueError as e:
+                raise ArchiveError(f"Fila {number} inválida: {e}") from None
+            if not isinstance(values, dict):
+                raise ArchiveError(f"Fila {number} inválida: se esperaba un objeto")
+            yield _record(values, number)
+            continue
+        try:
+            text = line.decode()
+        except UnicodeDecodeError as e:
+            raise ArchiveError(f"Fila {number} inválida: {e}") from None
+        fields = next(csv.reader([text]))
+        if header is None:
+            header = fields
+            continue
+        yield _record(dict(zip(header, fields)), number)
+
+
+async def _arrow_records(spool) -> AsyncIterator[HistoryRecord]:
+    # El lector IPC necesita un fichero: lee directamente el volcado del cuerpo
+    if pa is None:
+        raise ArchiveError("El formato arrow requiere el paquete pyarrow")
+    try:
+        reader = pa.ipc.open_stream(spool)
+        number = 0
+        for batch in reader:
+            for values in batch.to_pylist():
+                number += 1
+                yield _record(values, number)
+    except pa.ArrowInvalid as e:
+        raise ArchiveError(f"Stream Arrow inválido: {e}") from None
+
+
+async def _read(spool) -> AsyncIterator[bytes]:
+    while True:
+        chunk = spool.read(READ_BYTES)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _records(spool, fmt: str) -> AsyncIterator[HistoryRecord]:
+    spool.seek(0)
+    return _arrow_records(spool) if fmt == "arrow" else _text_records(_read(spool), fmt)
+
+
+async def import_history(
+    backend: HistoryBackend,
+    stream: AsyncIterator[bytes],
+    fmt: str,
+    content_encoding: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+) -> int:
+    """Da de alta las filas del archivo en lotes de `chunk_rows`; devuelve cuántas.
+
+    Todo o nada: el cuerpo se vuelca a un fichero temporal y se valida
+    entero (sin retener las filas) antes de dar de alta ninguna; un
+    ArchiveError en cualquier fila deja el historial sin tocar.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        async for chunk in _decoded(stream, content_encoding):
+            spool.write(chunk)
+        async for _ in _records(spool, fmt):
+            pass
+        batch: List[HistoryRecord] = []
+        imported = 0
+        async for record in _records(spool, fmt):
+            batch.append(record)
+            if len(batch) == chunk_rows:
+                backend.add_many(batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            backend.add_many(batch)
+            imported += len(batch)
+    return imported
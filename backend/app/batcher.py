@@ -0,0 +1,130 @@
+"""Micro-batching de peticiones dentro del event loop.
+
+`MicroBatcher.submit` encola el elemento y espera su resultado; el lote se
+procesa de una vez cuando pasa la ventana (`window_ms`, contada desde el
+primer elemento) o al llegar a `max_items`. Con ventana 0 se agrupa lo que
+llegue en la misma vuelta del loop, sin añadir espera.
+
+Los elementos con la misma clave que otro ya encolado no entran en el
+lote: esperan el mismo resultado (coalescencia). Clave None = no se
+combina nunca. El handler recibe cuántos llamantes esperan cada elemento,
+para que lo que haga por llamante (p.ej. el historial) no se pierda.
+
+El estado es por event loop, así que el mismo batcher sirve si cada hilo
+corre su propio loop (como hace TestClient).
+"""
+import asyncio
+import os
+import weakref
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+
+class _Batch:
+    __slots__ = ("items", "counts", "futures", "inflight", "timer")
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.counts: List[int] = []
+        self.futures: List[asyncio.Future] = []
+        self.inflight: Dict[Hashable, int] = {}
+        self.timer: Optional[asyncio.Handle] = None
+
+
+class MicroBatcher:
+    """Agrupa llamadas concurrentes y las resuelve con una sola llamada a `handler`.
+
+    `handler(items, counts)` devuelve un resultado por elemento, en orden;
+    `counts[i]` es el número de llamantes que esperan `items[i]`. Una
+    excepción en la lista se lanza solo en los llamantes correspondientes.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any], List[int]], List[Any]],
+        window_ms: float = 1.0,
+        max_items: int = 256,
+    ):
+        if max_items < 1:
+            raise ValueError("max_items debe ser mayor que cero")
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_items = max_items
+        self._batches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.submitted = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.largest_batch = 0
+
+    async def submit(self, key: Optional[Hashable], item: Any) -> Any:
+        self.submitted += 1
+        loop = asyncio.get_running_loop()
+        batch = self._batches.get(loop)
+        if batch is None:
+            batch = self._batches[loop] = _Batch()
+        position = batch.inflight.get(key) if key is not None else None
+        if position is not None:
+            self.coalesced += 1
+            batch.counts[position] += 1
+            future = batch.futures[position]
+        else:
+            position = len(batch.items)
+            future = loop.create_future()
+            batch.items.append(item)
+            batch.counts.append(1)
+            batch.futures.append(future)
+            if key is not None:
+                batch.inflight[key] = position
+            if len(batch.items) >= self.max_items:
+                self._flush(loop)
+            elif batch.timer is None:
+                batch.timer = (
+                    loop.call_later(self.window, self._flush, loop) if self.window > 0
+                    else loop.call_soon(self._flush, loop)
+                )
+        # shield: si un llamante se cancela, los que comparten el resultado no
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # El lote se resuelve de una vez: sin resultado aún, no se ha procesado
+            if not future.done():
+                batch.counts[position] -= 1
+            raise
+
+    def _flush(self, loop: asyncio.AbstractEventLoop) -> None:
+        batch = self._batches.pop(loop, None)
+        if batch is None or not batch.items:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch.items))
+        try:
+            results = self.handler(batch.items, batch.counts)
+        except Exception as e:
+            results = [e] * len(batch.items)
+        for future, result in zip(batch.futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_items": self.max_items,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "mean_batch": (self.submitted - self.coalesced) / self.batches if self.batches else 0.0,
+        }
+
+
+def create_calculation_batcher(handler: Callable[[List[Any], List[int]], List[Any]]) -> Optional[MicroBatcher]:
+    """Batcher de /calculate según el entorno; None si no está activado."""
+    window = os.environ.get("CALCULATE_BATCH_WINDOW_MS")
+    if not window:
+        return None
+    return MicroBatcher(handler, float(window), int(os.environ.get("CALCULATE_BATCH_MAX_ITEMS", "256")))
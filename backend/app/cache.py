@@ -0,0 +1,72 @@
+"""Caché LRU acotada para resultados de `/calculate`."""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class ResultCache:
+    """Caché LRU con TTL opcional y contadores de aciertos, fallos y desalojos."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: Optional[float] = None):
+        if max_size <= 0:
+            raise ValueError("max_size debe ser mayor que cero")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl_seconds is None else time.monotonic() + self.ttl_seconds
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def create_result_cache() -> Optional[ResultCache]:
+    """Crea la caché si RESULT_CACHE_SIZE es mayor que cero (desactivada por defecto)."""
+    size = int(os.environ.get("RESULT_CACHE_SIZE", "0"))
+    if size <= 0:
+        return None
+    ttl = os.environ.get("RESULT_CACHE_TTL_SECONDS")
+    return ResultCache(max_size=size, ttl_seconds=float(ttl) if ttl else None)
@@ -0,0 +1,185 @@
+"""Compresión de respuestas de la API (Brotli o gzip según Accept-Encoding).
+
+Los responders son propios y solo usan la API pública de Starlette: las
+respuestas por debajo de `minimum_size`, las que ya traen Content-Encoding
+(p.ej. la exportación comprimida con zstd) y los tipos excluidos
+(text/event-stream) pasan sin tocar. brotli es opcional; sin él solo se ofrece gzip.
+"""
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli es opcional
+    brotli = None
+
+DEFAULT_EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+# Trozos a partir de este tamaño se comprimen fuera del event loop
+THREAD_MINIMUM_SIZE = 128 * 1024
+
+
+def parse_accept_encoding(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Codificación -> calidad (q) de una cabecera Accept-Encoding."""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    return accepted
+
+
+def available_encodings() -> List[str]:
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def negotiate(accept_encoding: Optional[str], available: List[str]) -> Optional[str]:
+    """La codificación de `available` con mayor q; a igual q manda el orden de la lista."""
+    accepted = parse_accept_encoding(accept_encoding)
+    candidates = [name for name in available if accepted.get(name, accepted.get("*", 0)) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda name: accepted.get(name, accepted.get("*", 0)))
+
+
+class IdentityResponder:
+    """Envía la respuesta tal cual; las subclases comprimen los cuerpos grandes.
+
+    No se usan los responders de Starlette: su constructor y
+    `apply_compression` cambian entre versiones.
+    """
+
+    content_encoding: Optional[str] = None
+
+    def __init__(self, app: ASGIApp, minimum_size: int, exclude_content_types: Tuple[str, ...]):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.exclude_content_types = tuple(exclude_content_types)
+        self.send: Optional[Send] = None
+        self.initial_message: Message = {}
+        self.started = False
+        self.passthrough = False
+        self.compressing = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message: Message) -> None:
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # La cabecera se retiene hasta ver el primer trozo del cuerpo
+            self.initial_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or headers.get(
+                "content-type", ""
+            ).startswith(self.exclude_content_types)
+        elif message_type == "http.response.body" and not self.started:
+            self.started = True
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if not self.passthrough and (more_body or len(body) >= self.minimum_size):
+                headers = MutableHeaders(raw=self.initial_message["headers"])
+                headers.add_vary_header("Accept-Encoding")
+                if self.content_encoding is not None:
+                    self.compressing = True
+                    message["body"] = await self.apply_compression(body, more_body=more_body)
+                    headers["Content-Encoding"] = self.content_encoding
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.initial_message)
+            await self.send(message)
+        elif message_type == "http.response.body":
+            if self.compressing:
+                message["body"] = await self.apply_compression(
+                    message.get("body", b""), more_body=message.get("more_body", False)
+                )
+            await self.send(message)
+        else:
+            # http.response.pathsend y demás extensiones pasan sin comprimir
+            if not self.started:
+                self.started = True
+                await self.send(self.initial_message)
+            await self.send(message)
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.compress, body, more_body)
+        return self.compress(body, more_body)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        return body
+
+
+class GZipResponder(IdentityResponder):
+    content_encoding = "gzip"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, exclude_content_types: Tuple[str, ...], level: int = 6):
+        super().__init__(app, minimum_size, exclude_content_types)
+        # wbits=31: cabecera y cola gzip en lugar de zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        data = self._compressor.compress(body)
+        return data + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, exclude_content_types: Tuple[str, ...], quality: int = 4):
+        super().__init__(app, minimum_size, exclude_content_types)
+        self.quality = quality
+        self._compressor = None
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware:
+    """Comprime con Brotli (si está instalado) o gzip las respuestas grandes."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        exclude_content_types: Tuple[str, ...] = DEFAULT_EXCLUDED_CONTENT_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.exclude_content_types = exclude_content_types
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"), available_encodings())
+        excluded = self.exclude_content_types
+        responder: IdentityResponder
+        if encoding == "br":
+            responder = BrotliResponder(self.app, self.minimum_size, excluded, self.brotli_quality)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, excluded, self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size, excluded)
+        await responder(scope, receive, send)
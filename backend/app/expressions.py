@@ -0,0 +1,194 @@
+"""Expresiones aritméticas compiladas para `POST /evaluate`.
+
+La expresión se analiza con `ast.parse` y solo se aceptan números,
+variables, paréntesis, `+ - * /` (también `×` y `÷`), `**` (o `^`), `%`,
+`//` y el signo unario; nunca se ejecuta código. Los operadores binarios
+son los del registro de operaciones de `/calculate`. El árbol se compila a clausuras anidadas que se
+reutilizan con distintos valores de las variables, y las expresiones
+compiladas se guardan en una caché LRU, así que repetir una fórmula no
+vuelve a analizarla. Con NumPy la misma expresión se evalúa sobre arrays.
+"""
+import ast
+import math
+import operator
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+from app import engine
+from app.engine import np
+from app.operations import OPERATIONS, OperationError
+
+MAX_DEPTH = 200
+
+BINARY_OPERATORS = {
+    ast.Add: OPERATIONS["add"],
+    ast.Sub: OPERATIONS["subtract"],
+    ast.Mult: OPERATIONS["multiply"],
+    ast.Div: OPERATIONS["divide"],
+    ast.Pow: OPERATIONS["power"],
+    ast.Mod: OPERATIONS["modulo"],
+    ast.FloorDiv: OPERATIONS["integer_divide"],
+}
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+
+class ExpressionError(ValueError):
+    """Expresión no válida o variables incorrectas."""
+
+
+class CompiledExpression:
+    """Expresión compilada: `evaluate` para escalares y `evaluate_many` para columnas."""
+
+    __slots__ = ("source", "variables", "_tree", "_scalar", "_vector")
+
+    def __init__(self, source: str):
+        self.source = source
+        text = source.replace("×", "*").replace("÷", "/").replace("^", "**")
+        try:
+            tree = ast.parse(text.strip(), mode="eval").body
+        except (SyntaxError, ValueError, RecursionError, MemoryError) as e:
+            raise ExpressionError(f"Expresión no válida: {getattr(e, 'msg', e)}") from None
+        names: List[str] = []
+        self._tree = _fold(tree, names, 0)
+        self.variables = tuple(dict.fromkeys(names))
+        self._scalar = _compile_scalar(self._tree)
+        self._vector = None
+
+    def _missing(self, bindings: Dict) -> None:
+        missing = [name for name in self.variables if name not in bindings]
+        if missing:
+            raise ExpressionError(f"Variables sin valor: {', '.join(missing)}")
+
+    def evaluate(self, bindings: Dict[str, float]) -> float:
+        """Resultado redondeado a 6 decimales; ZeroDivisionError u OperationError si no está definido."""
+        self._missing(bindings)
+        return round(self._scalar(bindings), 6)
+
+    def evaluate_many(self, bindings: Dict[str, Union[float, Sequence[float]]]) -> List[Optional[float]]:
+        """Evalúa columnas de igual longitud (los escalares se repiten); None donde no está definido."""
+        self._missing(bindings)
+        lengths = {len(bindings[name]) for name in self.variables if not isinstance(bindings[name], (int, float))}
+        if len(lengths) > 1:
+            raise ExpressionError("Todas las variables deben tener la misma longitud")
+        count = lengths.pop() if lengths else 1
+        if not engine.HAS_NUMPY:
+            return [self._evaluate_row(bindings, index) for index in range(count)]
+        if self._vector is None:
+            self._vector = _compile_vector(self._tree)
+        columns = {name: np.asarray(bindings[name], dtype=np.float64) for name in self.variables}
+        masks: list = []
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            result = np.broadcast_to(self._vector(columns, masks), (count,)).astype(np.float64)
+            values = engine.round6(result).tolist()
+        if masks:
+            invalid = np.zeros(count, dtype=bool)
+            for mask in masks:
+                invalid |= mask
+            for index in np.flatnonzero(invalid).tolist():
+                values[index] = None
+        return values
+
+    def _evaluate_row(self, bindings: Dict, index: int) -> Optional[float]:
+        row = {}
+        for name in self.variables:
+            value = bindings[name]
+            row[name] = float(value if isinstance(value, (int, float)) else value[index])
+        try:
+            return round(self._scalar(row), 6)
+        except (ZeroDivisionError, OperationError):
+            return None
+
+
+@lru_cache(maxsize=256)
+def _compiled(source: str) -> CompiledExpression:
+    return CompiledExpression(source)
+
+
+def evaluate_many(source: str, bindings: Dict[str, Union[float, Sequence[float]]]) -> List[Optional[float]]:
+    """`CompiledExpression(source).evaluate_many(bindings)` para ejecutores de procesos.
+
+    Lo compilado no se puede serializar: cada proceso compila y guarda sus
+    propias expresiones.
+    """
+    return _compiled(source).evaluate_many(bindings)
+
+
+def _fold(node: ast.AST, names: List[str], depth: int) -> ast.AST:
+    """Valida el árbol, recoge las variables y pliega las subexpresiones constantes."""
+    if depth > MAX_DEPTH:
+        raise ExpressionError("Expresión demasiado anidada")
+    # bool es subclase de int: True/False no son números válidos aquí
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        try:
+            value = float(node.value)
+        except OverflowError:
+            value = math.inf
+        if not math.isfinite(value):
+            raise ExpressionError("Número fuera de rango")
+        return ast.Constant(value)
+    if isinstance(node, ast.Name):
+        names.append(node.id)
+        return node
+    if isinstance(node, ast.UnaryOp) and type(node.op) in UNARY_OPERATORS:
+        operand = _fold(node.operand, names, depth + 1)
+        if isinstance(operand, ast.Constant):
+            return ast.Constant(UNARY_OPERATORS[type(node.op)](operand.value))
+        return ast.UnaryOp(node.op, operand)
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        left = _fold(node.left, names, depth + 1)
+        right = _fold(node.right, names, depth + 1)
+        if isinstance(left, ast.Constant) and isinstance(right, ast.Constant):
+            try:
+                return ast.Constant(BINARY_OPERATORS[type(node.op)].apply(left.value, right.value))
+            except (ZeroDivisionError, OperationError) as e:
+                raise ExpressionError(str(e)) from None
+        return ast.BinOp(left, node.op, right)
+    raise ExpressionError(f"Elemento no permitido en la expresión: {type(node).__name__}")
+
+
+def _compile_scalar(node: ast.AST) -> Callable:
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda env: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda env: env[name]
+    if isinstance(node, ast.UnaryOp):
+        function = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_scalar(node.operand)
+        return lambda env: function(operand(env))
+    operation = BINARY_OPERATORS[type(node.op)]
+    function = operation.function if operation.validate is None else operation.apply
+    left = _compile_scalar(node.left)
+    right = _compile_scalar(node.right)
+    return lambda env: function(left(env), right(env))
+
+
+def _compile_vector(node: ast.AST) -> Callable:
+    # Misma estructura sobre arrays; cada operación con validación anota
+    # dónde no está definida (p.ej. divisor cero)
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda env, masks: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        return lambda env, masks: env[name]
+    if isinstance(node, ast.UnaryOp):
+        function = UNARY_OPERATORS[type(node.op)]
+        operand = _compile_vector(node.operand)
+        return lambda env, masks: function(operand(env, masks))
+    operation = BINARY_OPERATORS[type(node.op)]
+    function = operation.vector
+    left = _compile_vector(node.left)
+    right = _compile_vector(node.right)
+    invalid = operation.vector_invalid
+    if invalid is not None:
+        def checked(env, masks):
+            x, y = left(env, masks), right(env, masks)
+            masks.append(invalid(x, y))
+            return function(x, y)
+        return checked
+    return lambda env, masks: function(left(env, masks), right(env, masks))
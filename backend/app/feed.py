@@ -0,0 +1,121 @@
+"""Canal en vivo del historial con Server-Sent Events.
+
+Cada alta se codifica una sola vez y se guarda en un anillo de eventos
+recientes compartido por todos los suscriptores; cada suscriptor solo
+guarda su posición, así que no hay copias ni colas por suscriptor. Un
+suscriptor lento (o un cliente que reconecta con `Last-Event-ID`) recupera
+lo que siga en el anillo; si se quedó fuera recibe un evento `reset` y debe
+releer `GET /history`.
+
+Los ids de evento son propios de cada proceso: con varios workers cada
+conexión ve las altas del worker que la atiende.
+"""
+import asyncio
+import os
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from app.responses import dumps
+
+
+class HistoryFeed:
+    """Difusión de altas a suscriptores SSE desde el hilo del event loop."""
+
+    def __init__(self, replay_size: int = 1000, heartbeat_seconds: float = 15.0):
+        if replay_size <= 0:
+            raise ValueError("replay_size debe ser mayor que cero")
+        self.replay_size = replay_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self._events: "deque[bytes]" = deque(maxlen=replay_size)
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.last_id = 0
+        self.subscribers = 0
+        self.resets = 0
+
+    @property
+    def first_id(self) -> int:
+        return self.last_id - len(self._events) + 1
+
+    def _append(self, payload: Dict) -> None:
+        self.last_id += 1
+        self._events.append(b"id: %d\ndata: %s\n\n" % (self.last_id, dumps(payload)))
+
+    def publish(self, payload: Dict) -> None:
+        self._append(payload)
+        if self._waiters:
+            self._wake()
+
+    def publish_many(self, payloads: Iterable[Dict]) -> None:
+        for payload in payloads:
+            self._append(payload)
+        if self._waiters:
+            self._wake()
+
+    def _wake(self) -> None:
+        waiters, self._waiters = self._waiters, []
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for loop, future in waiters:
+            if loop is running:
+                if not future.done():
+                    future.set_result(None)
+            else:
+                loop.call_soon_threadsafe(_resolve, future)
+
+    def _reset_event(self) -> bytes:
+        self.resets += 1
+        return b"event: reset\ndata: %s\n\n" % dumps({"first_id": self.first_id, "last_id": self.last_id})
+
+    async def subscribe(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Eventos posteriores a `last_event_id` (o solo los nuevos si es None)."""
+        loop = asyncio.get_running_loop()
+        position = self.last_id if last_event_id is None else last_event_id
+        self.subscribers += 1
+        try:
+            if position > self.last_id:
+                # Id de otra ejecución del proceso: no hay nada que reanudar
+                yield self._reset_event()
+                position = self.last_id
+            while True:
+                if position < self.last_id:
+                    first = self.first_id
+                    if position + 1 < first:
+                        yield self._reset_event()
+                        position = first - 1
+                    # Todo lo pendiente en un solo envío; el anillo no se copia
+                    chunk = b"".join(islice(self._events, position - first + 1, None))
+                    position = self.last_id
+                    yield chunk
+                    continue
+                future = loop.create_future()
+                self._waiters.append((loop, future))
+                try:
+                    await asyncio.wait_for(future, self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+        finally:
+            self.subscribers -= 1
+
+    def stats(self) -> Dict:
+        return {
+            "subscribers": self.subscribers,
+            "last_id": self.last_id,
+            "first_id": self.first_id,
+            "replay_size": self.replay_size,
+            "resets": self.resets,
+        }
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def create_history_feed() -> HistoryFeed:
+    return HistoryFeed(
+        replay_size=int(os.environ.get("FEED_REPLAY_SIZE", "1000")),
+        heartbeat_seconds=float(os.environ.get("FEED_HEARTBEAT_SECONDS", "15")),
+    )
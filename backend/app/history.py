@@ -0,0 +1,878 @@
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from array import array
+import heapq
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.operations import OPERATIONS
+from app.stats import HistoryStats
+
+
+class EvictionPolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"
+    TTL = "ttl"
+
+
+@lru_cache(maxsize=4096)
+def _second_prefix(seconds: int) -> str:
+    return datetime.fromtimestamp(seconds).isoformat()
+
+
+def format_timestamp(epoch_ns: int) -> str:
+    """Hora local ISO con microsegundos, como `datetime.now().isoformat()`."""
+    seconds, nanoseconds = divmod(epoch_ns, 1_000_000_000)
+    micros = nanoseconds // 1000
+    prefix = _second_prefix(seconds)
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+def local_timestamp(moment: datetime) -> str:
+    """Límite de consulta comparable con los timestamps guardados (hora local, sin zona)."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+@lru_cache(maxsize=4096)
+def _prefix_seconds(prefix: str) -> Optional[int]:
+    try:
+        moment = datetime.fromisoformat(prefix)
+        if moment.tzinfo is not None or moment.microsecond:
+            return None
+        seconds = int(moment.timestamp())
+    except (ValueError, OverflowError, OSError):
+        return None
+    # Horas locales inexistentes (cambio de hora) no vuelven al mismo texto
+    return seconds if _second_prefix(seconds) == prefix else None
+
+
+def parse_timestamp(timestamp: str) -> Optional[int]:
+    """Inverso exacto de format_timestamp; None si el texto no se reproduciría igual."""
+    prefix, dot, fraction = timestamp.partition(".")
+    micros = 0
+    if dot:
+        if len(fraction) != 6 or not (fraction.isascii() and fraction.isdigit()) or fraction == "000000":
+            return None
+        micros = int(fraction)
+    seconds = _prefix_seconds(prefix)
+    return None if seconds is None else seconds * 1_000_000_000 + micros * 1000
+
+
+def parse_label(operation_type: Optional[str], operation: str) -> Optional[Tuple[float, float]]:
+    """Operandos de una etiqueta `"a <símbolo> b"`; None si no se reproduciría igual."""
+    spec = OPERATIONS.get(operation_type) if operation_type is not None else None
+    if spec is None:
+        return None
+    left, separator, right = operation.partition(f" {spec.symbol} ")
+    if not separator:
+        return None
+    try:
+        a, b = float(left), float(right)
+    except ValueError:
+        return None
+    return (a, b) if spec.label(a, b) == operation else None
+
+
+class HistoryRecord:
+    """Registro del historial tal como lo ven los lectores (sin objetos pydantic).
+
+    `operation` y `timestamp` se pueden dar ya formateados o construirse al
+    leerlos a partir de los operandos `a`, `b` y del instante `epoch_ns`.
+    Si se dan ambos, quien crea el registro garantiza que coinciden.
+    """
+
+    __slots__ = ("seq", "result", "_operation", "_timestamp", "operation_type", "created", "a", "b", "epoch_ns")
+
+    def __init__(
+        self,
+        result: float,
+        operation: Optional[str] = None,
+        timestamp: Optional[str] = None,
+        created: Optional[float] = None,
+        operation_type: Optional[str] = None,
+        a: Optional[float] = None,
+        b: Optional[float] = None,
+        epoch_ns: Optional[int] = None,
+    ):
+        self.seq = 0
+        self.result = result
+        self._operation = operation
+        self._timestamp = timestamp
+        self.operation_type = operation_type
+        self.created = time.monotonic() if created is None else created
+        self.a = a
+        self.b = b
+        self.epoch_ns = epoch_ns
+
+    @property
+    def operation(self) -> str:
+        if self._operation is None:
+            self._operation = OPERATIONS[self.operation_type].label(self.a, self.b)
+        return self._operation
+
+    @property
+    def timestamp(self) -> str:
+        if self._timestamp is None:
+            self._timestamp = format_timestamp(self.epoch_ns)
+        return self._timestamp
+
+    def operands(self) -> Optional[Tuple[float, float]]:
+        if self.a is not None:
+            return self.a, self.b
+        return parse_label(self.operation_type, self._operation)
+
+    def epoch(self) -> Optional[int]:
+        if self.epoch_ns is not None:
+            return self.epoch_ns
+        return parse_timestamp(self._timestamp)
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.seq,
+            "result": self.result,
+            "operation": self.operation,
+            "timestamp": self.timestamp,
+        }
+
+
+class HistoryBackend(ABC):
+    """Interfaz común de los almacenes de historial."""
+
+    # True si leer, limpiar o consultar la versión puede bloquear (disco o
+    # espera a otro hilo); la API ejecuta entonces esas llamadas en un hilo
+    blocking = False
+
+    @abstractmethod
+    def add_calculation(self, calculation) -> None:
+        ...
+
+    def add_many(self, calculations: List[HistoryRecord]) -> None:
+        for calculation in calculations:
+            self.add_calculation(calculation)
+
+    @abstractmethod
+    def get_history(self) -> List[HistoryRecord]:
+        ...
+
+    @abstractmethod
+    def get_page(
+        self,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        operation_type: Optional[str] = None,
+        min_result: Optional[float] = None,
+        max_result: Optional[float] = None,
+    ) -> List[HistoryRecord]:
+        """Registros con id mayor que `cursor` que cumplen los filtros, en orden.
+
+        `since`/`until` acotan el timestamp (ISO, inclusivos) y
+        `min_result`/`max_result` el resultado (inclusivos).
+        """
+        ...
+
+    @abstractmethod
+    def clear_history(self) -> None:
+        ...
+
+    @abstractmethod
+    def version(self) -> int:
+        """Contador que cambia con cada alta, descarte o clear (para ETags)."""
+        ...
+
+    @abstractmethod
+    def memory_usage(self) -> Dict:
+        ...
+
+    @abstractmethod
+    def entry_count(self) -> int:
+        """Registros del historial, quizá algo desfasado, sin bloquear nunca.
+
+        Sirve para estimar el coste de una consulta desde el event loop.
+        """
+        ...
+
+    @abstractmethod
+    def get_stats(self, window_seconds: Optional[float] = None) -> Dict:
+        """Agregados por operación sin recorrer el historial."""
+        ...
+
+    def close(self) -> None:
+        pass
+
+
+class OperationIndex:
+    """Ids de una operación en orden de alta.
+
+    Las entradas desalojadas del buffer siempre son las más antiguas, así
+    que basta con avanzar `start`; el prefijo muerto se compacta de vez en
+    cuando para que la lista no crezca sin límite.
+    """
+
+    __slots__ = ("seqs", "start")
+
+    def __init__(self):
+        self.seqs = array("q")
+        self.start = 0
+
+    def drop_first(self) -> None:
+        self.start += 1
+        if self.start > 1024 and self.start * 2 > len(self.seqs):
+            del self.seqs[:self.start]
+            self.start = 0
+
+
+NO_OPERATION_TYPE = -1
+
+
+def _packed_record(
+    result: float,
+    a: float,
+    b: float,
+    epoch_ns: int,
+    created: float,
+    operation_type: Optional[str],
+    unpacked: Optional[Tuple[Optional[str], Optional[str]]],
+) -> HistoryRecord:
+    record = HistoryRecord(result, None, None, created, operation_type, a, b, epoch_ns)
+    if unpacked is not None:
+        operation, timestamp = unpacked
+        if operation is not None:
+            record._operation = operation
+            record.a = record.b = None
+        if timestamp is not None:
+            record._timestamp = timestamp
+            record.epoch_ns = None
+    return record
+
+
+class PackedRecords:
+    """Copia por columnas de registros; los HistoryRecord se crean al acceder.
+
+    Los ids son consecutivos desde `first_seq`, salvo que se den en `seqs`
+    (páginas filtradas).
+    """
+
+    __slots__ = ("first_seq", "results", "a", "b", "epochs", "created", "types", "type_names", "unpacked", "seqs")
+
+    def __init__(self, first_seq, results, a, b, epochs, created, types, type_names, unpacked, seqs=None):
+        self.first_seq = first_seq
+        self.results = results
+        self.a = a
+        self.b = b
+        self.epochs = epochs
+        self.created = created
+        self.types = types
+        self.type_names = type_names
+        self.unpacked = unpacked
+        self.seqs = seqs
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def _record(self, position: int) -> HistoryRecord:
+        code = self.types[position]
+        seq = self.seqs[position] if self.seqs is not None else self.first_seq + position
+        record = _packed_record(
+            self.results[position], self.a[position], self.b[position], self.epochs[position],
+            self.created[position], None if code == NO_OPERATION_TYPE else self.type_names[code],
+            self.unpacked.get(seq) if self.unpacked else None,
+        )
+        record.seq = seq
+        return record
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._record(position) for position in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError(item)
+        return self._record(item)
+
+    def __iter__(self) -> Iterator[HistoryRecord]:
+        # Bucle propio sin _record: es la ruta de /history y de los snapshots
+        type_names, unpacked = self.type_names, self.unpacked
+        seqs = self.seqs if self.seqs is not None else range(self.first_seq, self.first_seq + len(self))
+        for seq, result, a, b, epoch_ns, created, code in zip(
+            seqs, self.results, self.a, self.b, self.epochs, self.created, self.types
+        ):
+            if unpacked and seq in unpacked:
+                operation_type = None if code == NO_OPERATION_TYPE else type_names[code]
+                record = _packed_record(result, a, b, epoch_ns, created, operation_type, unpacked[seq])
+            else:
+                record = HistoryRecord(result, None, None, created, type_names[code], a, b, epoch_ns)
+            record.seq = seq
+            yield record
+
+
+def _key_text(key) -> str:
+    if isinstance(key, str):
+        return key
+    prefix, micros = key
+    return f"{prefix}.{micros:06d}" if micros else prefix
+
+
+class CalculationHistory(HistoryBackend):
+    """Historial en memoria sobre un buffer circular de capacidad fija.
+
+    Al llenarse se descarta el registro más antiguo. Con la política TTL
+    además se descartan los registros con más de `ttl_seconds` de antigüedad.
+
+    El buffer se guarda por columnas en arrays (resultado, operandos,
+    instante en ns, código de operación y `created`): la etiqueta y el
+    timestamp ISO se construyen al leer. Los registros cuyo texto no se
+    puede reconstruir igual (modos exactos, importaciones) guardan sus
+    cadenas aparte en `_unpacked`, por id.
+
+    Modelo de concurrencia: las altas solo hacen `deque.append`, que es
+    atómico (también en Python sin GIL), y no compiten por el lock. Todo el
+    estado del buffer, los índices y los agregados se modifica únicamente
+    con `_lock` tomado, al volcar las altas pendientes; los lectores toman
+    el lock, vuelcan lo pendiente y copian las columnas que necesitan; los
+    registros se crean ya sin el lock.
+
+    La etiqueta y el timestamp ya formateados de los últimos
+    `FORMAT_CACHE_SIZE` registros leídos se guardan por id (los ids no se
+    reutilizan), para que sondear /history no vuelva a formatear las mismas
+    filas en cada consulta.
+    """
+
+    # Altas pendientes a partir de las cuales un escritor intenta volcarlas
+    DRAIN_THRESHOLD = 256
+    MAX_PENDING = 4096
+    FORMAT_CACHE_SIZE = 10000
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        eviction_policy: EvictionPolicy = EvictionPolicy.DROP_OLDEST,
+        ttl_seconds: Optional[float] = None,
+    ):
+        if max_size <= 0:
+            raise ValueError("max_size debe ser mayor que cero")
+        eviction_policy = EvictionPolicy(eviction_policy)
+        if eviction_policy == EvictionPolicy.TTL and not ttl_seconds:
+            raise ValueError("La política TTL requiere ttl_seconds")
+        self.max_size = max_size
+        self.eviction_policy = eviction_policy
+        self.ttl_seconds = ttl_seconds
+        zeros = bytes(8 * max_size)
+        self._results = array("d", zeros)
+        self._a = array("d", zeros)
+        self._b = array("d", zeros)
+        self._epochs = array("q", zeros)
+        self._created = array("d", zeros)
+        self._types = array("i", bytes(4 * max_size))
+        self._unpacked: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
+        # (etiqueta, timestamp) ya formateados por id, del menos al más usado;
+        # tiene su propio lock porque se usa después de soltar `_lock`
+        self._formatted: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        self._format_lock = threading.Lock()
+        # Tipos de operación internados: los del registro primero, luego los desconocidos
+        self._type_names: List[str] = list(OPERATIONS)
+        self._type_codes: Dict[str, int] = {name: code for code, name in enumerate(self._type_names)}
+        self._head = 0
+        self._size = 0
+        self._next_seq = 1
+        # Mayor timestamp añadido e ids que llegaron con uno anterior, por
+        # orden de alta (ver _note_order)
+        self._last_timestamp = None
+        self._disordered: Dict[int, None] = {}
+        self._lock = threading.Lock()
+        self._pending: "deque" = deque()
+        self.stats = HistoryStats()
+        self._operation_index: Dict[str, OperationIndex] = {}
+        self.evicted = 0
+        # Empieza en la hora de creación (µs): otro proceso no repite versiones
+        self._version = time.time_ns() // 1000
+        # Diario opcional (app.journal.HistoryJournal); recibe las altas ya con id
+        self.journal = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._size
+
+    def _oldest_index(self) -> int:
+        return (self._head - self._size) % self.max_size
+
+    def _drop_oldest(self) -> None:
+        code = self._types[self._oldest_index()]
+        if code != NO_OPERATION_TYPE:
+            self._operation_index[self._type_names[code]].drop_first()
+        if self._unpacked:
+            self._unpacked.pop(self._next_seq - self._size, None)
+        if self._disordered:
+            self._disordered.pop(self._next_seq - self._size, None)
+        self._size -= 1
+        self.evicted += 1
+        self._version += 1
+
+    def _expire(self) -> None:
+        if self.eviction_policy != EvictionPolicy.TTL:
+            return
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._size and self._created[self._oldest_index()] < cutoff:
+            self._drop_oldest()
+
+    def add_calculation(self, calculation) -> None:
+        if not isinstance(calculation, HistoryRecord):
+            calculation = HistoryRecord(calculation.result, calculation.operation, calculation.timestamp)
+        self._pending.append((calculation, time.time()))
+        self._maybe_drain()
+
+    def add_many(self, calculations: List[HistoryRecord]) -> None:
+        now = time.time()
+        self._pending.extend([(calculation, now) for calculation in calculations])
+        self._maybe_drain()
+
+    def _maybe_drain(self) -> None:
+        # Acota la cola sin bloquear: si otro hilo tiene el lock, ya volcará él.
+        # Pasado MAX_PENDING el escritor espera al lock para no crecer sin límite.
+        pending = len(self._pending)
+        if pending < self.DRAIN_THRESHOLD:
+            return
+        if self._lock.acquire(blocking=pending >= self.MAX_PENDING):
+            try:
+                self._sync()
+            finally:
+                self._lock.release()
+
+    def _sync(self) -> None:
+        """Vuelca las altas pendientes en orden de llegada. Requiere `_lock`."""
+        pending = self._pending
+        # Solo lo encolado hasta ahora: los escritores pueden seguir añadiendo
+        for _ in range(len(pending)):
+            calculation, now = pending.popleft()
+            self._append(calculation, now)
+        self._expire()
+
+    def _append(self, calculation: HistoryRecord, now: float, count: bool = True) -> None:
+        if count:
+            self.stats.add(calculation.result, calculation.operation_type, now)
+        if self._size == self.max_size:
+            self._drop_oldest()
+        seq = calculation.seq = self._next_seq
+        self._next_seq += 1
+        index = self._head
+        operation_type = calculation.operation_type
+        if operation_type is None:
+            self._types[index] = NO_OPERATION_TYPE
+        else:
+            code = self._type_codes.get(operation_type)
+            if code is None:
+                code = self._type_codes[operation_type] = len(self._type_names)
+                self._type_names.append(operation_type)
+            self._types[index] = code
+            operation_index = self._operation_index.get(operation_type)
+            if operation_index is None:
+                operation_index = self._operation_index[operation_type] = OperationIndex()
+            operation_index.seqs.append(seq)
+        self._results[index] = calculation.result
+        self._created[index] = calculation.created
+        operands = calculation.operands()
+        epoch_ns = calculation.epoch()
+        if operands is not None:
+            self._a[index], self._b[index] = operands
+        self._epochs[index] = 0 if epoch_ns is None else epoch_ns
+        self._note_order(seq, epoch_ns, calculation.timestamp if epoch_ns is None else None)
+        if operands is None or epoch_ns is None:
+            self._unpacked[seq] = (
+                None if operands is not None else calculation.operation,
+                None if epoch_ns is not None else calculation.timestamp,
+            )
+        self._head = (index + 1) % self.max_size
+        self._size += 1
+        self._version += 1
+        if self.journal is not None:
+            self.journal.record(calculation, now)
+
+    def _note_order(self, seq: int, epoch_ns: Optional[int], timestamp: Optional[str]) -> None:
+        # Los filtros de tiempo buscan en binario porque los timestamps llegan
+        # en orden. Uno anterior al mayor ya visto (reloj ajustado, hilos
+        # concurrentes, cambio de hora) se anota aparte y se comprueba a mano
+        # hasta que salga del buffer; el resto sigue en orden
+        if epoch_ns is not None:
+            seconds, nanoseconds = divmod(epoch_ns, 1_000_000_000)
+            key = (_second_prefix(seconds), nanoseconds // 1000)
+        else:
+            key = timestamp
+        last = self._last_timestamp
+        if last is not None:
+            if isinstance(key, tuple) and isinstance(last, tuple):
+                disordered = key < last
+            else:
+                disordered = _key_text(key) < _key_text(last)
+            if disordered:
+                self._disordered[seq] = None
+                return
+        self._last_timestamp = key
+
+    def flush_pending(self) -> None:
+        """Vuelca ya las altas pendientes (el diario lo hace en cada ciclo)."""
+        with self._lock:
+            self._sync()
+
+    def capture(self, marker: Callable[[], None]) -> Tuple[PackedRecords, Dict, int]:
+        """Copia consistente de registros, agregados y siguiente id.
+
+        `marker` se ejecuta dentro del lock, justo después de la copia, para
+        que el diario separe lo incluido en el snapshot de lo posterior. Con
+        el lock solo se copian las columnas; los registros se crean al leer.
+        """
+        with self._lock:
+            self._sync()
+            marker()
+            return self._columns(0, self._size), self.stats.to_state(), self._next_seq
+
+    def restore(
+        self,
+        entries: Iterable[Optional[Tuple[HistoryRecord, float]]],
+        next_seq: Optional[int] = None,
+        stats_state: Optional[Dict] = None,
+    ) -> None:
+        """Reconstruye el historial conservando los ids; None equivale a un clear.
+
+        Con `stats_state` (snapshot) los agregados se cargan de ahí en vez
+        de recalcularse registro a registro.
+        """
+        count = stats_state is None
+        with self._lock:
+            for entry in entries:
+                if entry is None:
+                    self._reset()
+                    continue
+                calculation, now = entry
+                self._next_seq = calculation.seq
+                self._append(calculation, now, count)
+            if next_seq is not None:
+                self._next_seq = max(self._next_seq, next_seq)
+            if stats_state is not None:
+                self.stats.load_state(stats_state)
+
+    def _index(self, offset: int) -> int:
+        return (self._head - self._size + offset) % self.max_size
+
+    def _timestamp_at(self, offset: int) -> str:
+        if self._unpacked:
+            unpacked = self._unpacked.get(self._next_seq - self._size + offset)
+            if unpacked is not None and unpacked[1] is not None:
+                return unpacked[1]
+        return format_timestamp(self._epochs[self._index(offset)])
+
+    def _columns(self, offset: int, count: int) -> PackedRecords:
+        start = self._index(offset)
+        end = start + count
+
+        def cut(column: array) -> array:
+            if end <= self.max_size:
+                return column[start:end]
+            return column[start:] + column[:end - self.max_size]
+
+        first_seq = self._next_seq - self._size + offset
+        if len(self._unpacked) > count:
+            unpacked = {
+                seq: self._unpacked[seq] for seq in range(first_seq, first_seq + count) if seq in self._unpacked
+            }
+        else:
+            unpacked = {seq: value for seq, value in self._unpacked.items() if first_seq <= seq < first_seq + count}
+        return PackedRecords(
+            first_seq, cut(self._results), cut(self._a), cut(self._b), cut(self._epochs), cut(self._created),
+            cut(self._types), list(self._type_names), unpacked,
+        )
+
+    def _picked(self, offsets: List[int]) -> PackedRecords:
+        # Copia de filas sueltas (páginas filtradas) para crear los registros sin el lock
+        columns = (self._results, self._a, self._b, self._epochs, self._created, self._types)
+        indexes = [self._index(offset) for offset in offsets]
+        picked = [array(column.typecode, [column[index] for index in indexes]) for column in columns]
+        oldest_seq = self._next_seq - self._size
+        seqs = array("q", [oldest_seq + offset for offset in offsets])
+        unpacked = {seq: self._unpacked[seq] for seq in seqs if seq in self._unpacked} if self._unpacked else {}
+        return PackedRecords(0, *picked, list(self._type_names), unpacked, seqs=seqs)
+
+    def _records(self, packed: PackedRecords) -> List[HistoryRecord]:
+        # Sin `_lock`: se crean los registros y los textos de los últimos se
+        # toman de la caché; los que faltan se formatean fuera de cualquier lock
+        records = list(packed)
+        formatted = self._formatted
+        missing = []
+        with self._format_lock:
+            for record in records[-self.FORMAT_CACHE_SIZE:]:
+                text = formatted.get(record.seq)
+                if text is None:
+                    missing.append(record)
+                else:
+                    formatted.move_to_end(record.seq)
+                    record._operation, record._timestamp = text
+        if missing:
+            texts = [(record.operation, record.timestamp) for record in missing]
+            with self._format_lock:
+                for record, text in zip(missing, texts):
+                    formatted[record.seq] = text
+                while len(formatted) > self.FORMAT_CACHE_SIZE:
+                    formatted.popitem(last=False)
+        return records
+
+    @staticmethod
+    def _bisect_timestamp(
+        timestamp_at, lo: int, hi: int, timestamp: str, after: bool = False, in_order=None
+    ) -> int:
+        # Los timestamps son monótonos: búsqueda binaria sobre las posiciones
+        # [lo, hi); con `in_order` se saltan las posiciones desordenadas
+        while lo < hi:
+            mid = probe = (lo + hi) // 2
+            if in_order is not None:
+                while probe < hi and not in_order(probe):
+                    probe += 1
+                if probe == hi:
+                    hi = mid
+                    continue
+            value = timestamp_at(probe)
+            if value < timestamp or (after and value == timestamp):
+                lo = probe + 1
+            else:
+                hi = mid
+        return lo
+
+    def get_history(self) -> List[HistoryRecord]:
+        with self._lock:
+            self._sync()
+            packed = self._columns(0, self._size)
+        return self._records(packed)
+
+    def get_page(
+        self,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        operation_type: Optional[str] = None,
+        min_result: Optional[float] = None,
+        max_result: Optional[float] = None,
+    ) -> List[HistoryRecord]:
+        with self._lock:
+            self._sync()
+            packed = self._page(cursor, limit, since, until, operation_type, min_result, max_result)
+        return self._records(packed)
+
+    def _page(
+        self,
+        cursor: Optional[int],
+        limit: Optional[int],
+        since: Optional[str],
+        until: Optional[str],
+        operation_type: Optional[str],
+        min_result: Optional[float],
+        max_result: Optional[float],
+    ) -> PackedRecords:
+        # Los ids del buffer son contiguos: el offset de un id se calcula en O(1)
+        oldest_seq = self._next_seq - self._size
+        first_seq = max(oldest_seq, (cursor or 0) + 1)
+        if operation_type is None:
+            def offset_at(position: int) -> int:
+                return position
+
+            lo, hi = min(first_seq - oldest_seq, self._size), self._size
+        else:
+            operation_index = self._operation_index.get(operation_type)
+            if operation_index is None:
+                return self._picked([])
+            seqs = operation_index.seqs
+
+            def offset_at(position: int) -> int:
+                return seqs[position] - oldest_seq
+
+            lo, hi = bisect_left(seqs, first_seq, operation_index.start), len(seqs)
+        # Los ids desordenados se buscan aparte y se mezclan con el rango
+        # encontrado en binario sobre los demás
+        holes = ()
+        extra = []
+        if since is not None or until is not None:
+            holes = {seq for seq in self._disordered if seq >= first_seq}
+            in_order = None
+            if holes:
+                code = None if operation_type is None else self._type_codes.get(operation_type)
+                for seq in sorted(holes):
+                    offset = seq - oldest_seq
+                    if code is not None and self._types[self._index(offset)] != code:
+                        continue
+                    timestamp = self._timestamp_at(offset)
+                    if (since is None or timestamp >= since) and (until is None or timestamp <= until):
+                        extra.append(offset)
+
+                def position_in_order(position: int) -> bool:
+                    return oldest_seq + offset_at(position) not in holes
+
+                in_order = position_in_order
+
+            def timestamp_at(position: int) -> str:
+                return self._timestamp_at(offset_at(position))
+
+            if since is not None:
+                lo = self._bisect_timestamp(timestamp_at, lo, hi, since, in_order=in_order)
+            if until is not None:
+                hi = self._bisect_timestamp(timestamp_at, lo, hi, until, after=True, in_order=in_order)
+        filtered = min_result is not None or max_result is not None or bool(holes)
+        if limit is not None and not filtered:
+            hi = min(hi, lo + limit)
+        if hi <= lo and not extra:
+            return self._picked([])
+        if operation_type is None and not filtered:
+            return self._columns(lo, hi - lo)
+
+        candidates: Iterable[int] = (offset_at(position) for position in range(lo, hi))
+        if holes:
+            candidates = heapq.merge(
+                (offset for offset in candidates if oldest_seq + offset not in holes), extra
+            )
+        # El rango de resultado se filtra sobre la columna, antes de copiar filas
+        offsets = []
+        results = self._results
+        for offset in candidates:
+            result = results[self._index(offset)]
+            if min_result is not None and result < min_result:
+                continue
+            if max_result is not None and result > max_result:
+                continue
+            offsets.append(offset)
+            if limit is not None and len(offsets) == limit:
+                break
+        return self._picked(offsets)
+
+    def clear_history(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._reset()
+            if self.journal is not None:
+                self.journal.record_clear()
+
+    def _reset(self) -> None:
+        # Las columnas se reutilizan: con `_size` a cero su contenido no se lee
+        self._unpacked = {}
+        self._formatted = OrderedDict()
+        self._head = 0
+        self._size = 0
+        self._last_timestamp = None
+        self._disordered = {}
+        # Los tipos desconocidos internados se olvidan con el historial
+        self._type_names = list(OPERATIONS)
+        self._type_codes = {name: code for code, name in enumerate(self._type_names)}
+        self._operation_index = {}
+        self.stats.clear()
+        self._version += 1
+
+    def version(self) -> int:
+        with self._lock:
+            self._sync()
+            return self._version
+
+    def get_stats(self, window_seconds: Optional[float] = None) -> Dict:
+        with self._lock:
+            self._sync()
+            return self.stats.snapshot(window_seconds)
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+
+    def memory_usage(self) -> Dict:
+        with self._lock:
+            self._sync()
+            return self._memory_usage()
+
+    def entry_count(self) -> int:
+        # Sin `_lock`: las altas aún en `_pending` se cuentan sin aplicar descartes
+        return min(self._size + len(self._pending), self.max_size)
+
+    def _memory_usage(self) -> Dict:
+        columns = (self._results, self._a, self._b, self._epochs, self._created, self._types)
+        buffer_bytes = sum(sys.getsizeof(column) for column in columns)
+        index_bytes = sum(sys.getsizeof(index.seqs) for index in self._operation_index.values())
+        # Cadenas de los registros no empaquetados, estimadas con uno de muestra
+        unpacked_bytes = sys.getsizeof(self._unpacked)
+        if self._unpacked:
+            sample = next(iter(self._unpacked.values()))
+            unpacked_bytes += len(self._unpacked) * (
+                sys.getsizeof(sample) + sum(sys.getsizeof(text) for text in sample if text is not None)
+            )
+        with self._format_lock:
+            formatted = len(self._formatted)
+            formatted_bytes = sys.getsizeof(self._formatted)
+            if formatted:
+                sample = next(iter(self._formatted.values()))
+                formatted_bytes += formatted * (sys.getsizeof(sample) + sum(sys.getsizeof(text) for text in sample))
+        return {
+            "backend": "memory",
+            "entries": self._size,
+            "capacity": self.max_size,
+            "eviction_policy": self.eviction_policy.value,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted": self.evicted,
+            "unpacked": len(self._unpacked),
+            "buffer_bytes": buffer_bytes,
+            "index_bytes": index_bytes,
+            "unpacked_bytes": unpacked_bytes,
+            "formatted": formatted,
+            "formatted_bytes": formatted_bytes,
+            "estimated_bytes": buffer_bytes + index_bytes + unpacked_bytes + formatted_bytes,
+        }
+
+
+logger = logging.getLogger(__name__)
+
+
+def worker_count() -> int:
+    """Número de procesos de uvicorn (`--workers` lee la misma variable)."""
+    return int(os.environ.get("WEB_CONCURRENCY", "1"))
+
+
+def create_history_backend() -> HistoryBackend:
+    """Crea el almacén de historial según las variables de entorno.
+
+    Con varios workers el historial por defecto es el fichero SQLite
+    compartido; el de memoria sería distinto en cada proceso.
+    """
+    workers = worker_count()
+    backend = os.environ.get("HISTORY_BACKEND") or ("sqlite" if workers > 1 else "memory")
+    if backend == "memory" and workers > 1:
+        logger.warning("HISTORY_BACKEND=memory con %d workers: cada proceso tendrá su propio historial", workers)
+    if backend == "memory":
+        ttl = os.environ.get("HISTORY_TTL_SECONDS")
+        history = CalculationHistory(
+            max_size=int(os.environ.get("HISTORY_MAX_SIZE", "10000")),
+            eviction_policy=os.environ.get("HISTORY_EVICTION_POLICY", EvictionPolicy.DROP_OLDEST.value),
+            ttl_seconds=float(ttl) if ttl else None,
+        )
+        wal_dir = os.environ.get("HISTORY_WAL_DIR")
+        if wal_dir:
+            from app.journal import journaled_history
+
+            history = journaled_history(
+                history,
+                wal_dir,
+                flush_interval_ms=float(os.environ.get("HISTORY_FLUSH_INTERVAL_MS", "50")),
+                snapshot_every=int(os.environ.get("HISTORY_SNAPSHOT_EVERY", "1000000")),
+            )
+        return history
+    if backend == "sqlite":
+        from app.sqlite_history import SQLiteHistory
+
+        max_rows = os.environ.get("HISTORY_MAX_SIZE")
+        return SQLiteHistory(
+            path=os.environ.get("HISTORY_SQLITE_PATH", "history.db"),
+            flush_interval_ms=float(os.environ.get("HISTORY_FLUSH_INTERVAL_MS", "50")),
+            max_rows=int(max_rows) if max_rows else None,
+        )
+    raise ValueError(f"Backend de historial desconocido: {backend}")
@@ -0,0 +1,407 @@
+"""Durabilidad opcional del historial en memoria: WAL binario y snapshots.
+
+Las altas se anotan en una cola al asignarles id y un hilo de fondo las
+escribe en el segmento de WAL actual y hace fsync cada
+`flush_interval_ms`; `/calculate` nunca espera al disco. Cada
+`snapshot_every` altas se toma una copia consistente del historial, se
+pasa a un segmento nuevo y otro hilo escribe el snapshot compactado; al
+terminar se borran los segmentos que ya cubre.
+
+Si escribir falla (disco lleno, permisos...) las altas siguen en memoria,
+se reintenta cada `RETRY_SECONDS` y el fallo se ve en `stats()`; un
+bloque a medio escribir se trunca antes de reintentar.
+
+Al arrancar se carga el snapshot y se reproducen los segmentos
+posteriores. Un registro truncado o con CRC incorrecto (caída a mitad de
+escritura) termina la lectura de su segmento.
+
+Formato de registro (little-endian): crc32, tipo, id, resultado, hora
+unix del alta, longitudes de operación / tipo de operación / timestamp y
+los tres textos en UTF-8. Las longitudes son de 16 bits; si algún texto no
+cabe (p.ej. la etiqueta de un operando decimal de 70k cifras) el alta usa
+el tipo KIND_ADD_WIDE, con longitudes de 32 bits. La longitud máxima
+(0xFFFF / 0xFFFFFFFF) indica que no hay tipo de operación.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from app.history import CalculationHistory, HistoryRecord
+
+logger = logging.getLogger(__name__)
+
+CRC = struct.Struct("<I")
+RECORD = struct.Struct("<BQddHHH")
+WIDE_RECORD = struct.Struct("<BQddIII")
+HEADER_SIZE = CRC.size + RECORD.size
+KIND_ADD, KIND_CLEAR, KIND_ADD_WIDE = 0, 1, 2
+NO_OPERATION_TYPE = 0xFFFF
+NO_OPERATION_TYPE_WIDE = 0xFFFFFFFF
+
+SNAPSHOT_MAGIC = b"CALCSNP1"
+SNAPSHOT_HEADER = struct.Struct("<QQI")  # primer segmento posterior, siguiente id, bytes de agregados
+SNAPSHOT_NAME = "snapshot.bin"
+RETRY_SECONDS = 1.0
+
+
+class Rotate:
+    """Marcador en la cola: cerrar el segmento actual y seguir en `segment`."""
+
+    __slots__ = ("segment",)
+
+    def __init__(self, segment: int):
+        self.segment = segment
+
+
+def encode_record(record: HistoryRecord, wall: float) -> bytes:
+    operation = record.operation.encode()
+    timestamp = record.timestamp.encode()
+    operation_type = b"" if record.operation_type is None else record.operation_type.encode()
+    # Las longitudes de 16 bits no llegan a NO_OPERATION_TYPE: si no, formato ancho
+    if max(len(operation), len(operation_type), len(timestamp)) < NO_OPERATION_TYPE:
+        kind, layout, missing = KIND_ADD, RECORD, NO_OPERATION_TYPE
+    else:
+        kind, layout, missing = KIND_ADD_WIDE, WIDE_RECORD, NO_OPERATION_TYPE_WIDE
+    type_length = missing if record.operation_type is None else len(operation_type)
+    body = layout.pack(
+        kind, record.seq, record.result, wall, len(operation), type_length, len(timestamp)
+    ) + operation + operation_type + timestamp
+    return CRC.pack(zlib.crc32(body)) + body
+
+
+def encode_clear() -> bytes:
+    body = RECORD.pack(KIND_CLEAR, 0, 0.0, time.time(), 0, 0, 0)
+    return CRC.pack(zlib.crc32(body)) + body
+
+
+def decode_records(data, offset: int = 0) -> Iterator[Optional[Tuple[HistoryRecord, float]]]:
+    """Registros de `data` desde `offset`; se detiene en el primero incompleto o corrupto."""
+    end = len(data)
+    wall_now, monotonic_now = time.time(), time.monotonic()
+    while offset + HEADER_SIZE <= end:
+        (crc,) = CRC.unpack_from(data, offset)
+        if data[offset + CRC.size] == KIND_ADD_WIDE:
+            layout, missing = WIDE_RECORD, NO_OPERATION_TYPE_WIDE
+        else:
+            layout, missing = RECORD, NO_OPERATION_TYPE
+        header_size = CRC.size + layout.size
+        record_end = offset + header_size
+        if record_end <= end:
+            kind, seq, result, wall, operation_length, type_length, timestamp_length = layout.unpack_from(
+                data, offset + CRC.size
+            )
+            record_end += operation_length + timestamp_length + (0 if type_length == missing else type_length)
+        if record_end > end or zlib.crc32(data[offset + CRC.size:record_end]) != crc:
+            logger.warning("Registro de WAL incompleto o corrupto en el byte %d; se ignora el resto", offset)
+            return
+        if kind == KIND_CLEAR:
+            yield None
+        else:
+            position = offset + header_size
+            operation = bytes(data[position:position + operation_length]).decode()
+            position += operation_length
+            operation_type = None
+            if type_length != missing:
+                operation_type = bytes(data[position:position + type_length]).decode()
+                position += type_length
+            timestamp = bytes(data[position:position + timestamp_length]).decode()
+            # `created` es monotónico: se traslada la antigüedad real del alta
+            record = HistoryRecord(
+                result, operation, timestamp, created=monotonic_now - (wall_now - wall), operation_type=operation_type
+            )
+            record.seq = seq
+            yield record, wall
+        offset = record_end
+
+
+def _read_mapped(path: str, offset: int = 0) -> Iterator[Optional[Tuple[HistoryRecord, float]]]:
+    if os.path.getsize(path) <= offset:
+        return
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield from decode_records(data, offset)
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:  # pragma: no cover - p.ej. Windows
+        return
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+class HistoryJournal:
+    """WAL + snapshots para un CalculationHistory."""
+
+    def __init__(
+        self,
+        directory: str,
+        flush_interval_ms: float = 50,
+        snapshot_every: int = 1_000_000,
+        fsync: bool = True,
+    ):
+        self.directory = directory
+        self.flush_interval = flush_interval_ms / 1000
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._pending: "deque" = deque()
+        # Registros ya codificados (bytes, altas) y rotaciones aún no escritos
+        self._backlog: "deque" = deque()
+        self._truncate_at: Optional[int] = None
+        self._history: Optional[CalculationHistory] = None
+        self._segment = 0
+        self._next_segment = 0
+        self._file = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._snapshot_thread: Optional[threading.Thread] = None
+        self._since_snapshot = 0
+        self.written = 0
+        self.snapshots = 0
+        self.recovered = 0
+        self.recovery_seconds = 0.0
+        self.failing = False
+        self.errors = 0
+        self.dropped = 0
+        self.last_error: Optional[str] = None
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"wal-{segment:08d}.log")
+
+    def _segments(self) -> List[int]:
+        return sorted(
+            int(name[4:-4]) for name in os.listdir(self.directory) if name.startswith("wal-") and name.endswith(".log")
+        )
+
+    # Llamados por CalculationHistory con su lock tomado: solo encolan
+    def record(self, record: HistoryRecord, wall: float) -> None:
+        self._pending.append((record, wall))
+
+    def record_clear(self) -> None:
+        self._pending.append(None)
+
+    def recover(self, history: CalculationHistory) -> int:
+        """Carga snapshot + WAL en `history` (aún sin diario); devuelve las altas leídas."""
+        start = time.perf_counter()
+        self.recovered = 0
+        first_segment = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_NAME)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as handle:
+                if handle.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                    raise ValueError(f"Snapshot inválido: {snapshot_path}")
+                first_segment, next_seq, stats_length = SNAPSHOT_HEADER.unpack(handle.read(SNAPSHOT_HEADER.size))
+                stats_state = json.loads(handle.read(stats_length))
+            offset = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size + stats_length
+            # Los agregados del snapshot incluyen lo ya descartado del buffer
+            history.restore(self._counted(_read_mapped(snapshot_path, offset)), next_seq, stats_state)
+        for segment in self._segments():
+            if segment < first_segment:
+                continue
+            history.restore(self._counted(_read_mapped(self._segment_path(segment))))
+            self._segment = segment + 1
+        self._segment = self._next_segment = max(self._segment, first_segment)
+        self.recovery_seconds = time.perf_counter() - start
+        return self.recovered
+
+    def _counted(self, entries: Iterator) -> Iterator:
+        # Se consume dentro de restore: el mmap sigue abierto mientras tanto
+        for entry in entries:
+            if entry is not None:
+                self.recovered += 1
+            yield entry
+
+    def start(self, history: CalculationHistory) -> None:
+        self._history = history
+        self._file = open(self._segment_path(self._segment), "ab", buffering=0)
+        history.journal = self
+        self._thread = threading.Thread(target=self._run, name="history-journal", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(RETRY_SECONDS if self.failing else self.flush_interval):
+            self._cycle()
+        self._cycle()
+        if self._backlog:
+            logger.error("Se cierra el diario con %d entradas sin escribir", len(self._backlog))
+
+    def _cycle(self) -> None:
+        # Ningún error puede parar el hilo: las altas dejarían de ser durables sin aviso
+        try:
+            self._flush()
+        except Exception as e:
+            self._failed(e)
+
+    def _failed(self, error: Exception) -> None:
+        self.errors += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if not self.failing:
+            logger.exception("No se pudo escribir el diario en %s; se reintentará", self.directory)
+        self.failing = True
+
+    def _flush(self) -> None:
+        # Las altas que siguen en la cola del historial también deben llegar al disco
+        self._history.flush_pending()
+        pending, backlog = self._pending, self._backlog
+        for _ in range(len(pending)):
+            entry = pending.popleft()
+            try:
+                if isinstance(entry, Rotate):
+                    backlog.append(entry)
+                elif entry is None:
+                    backlog.append((encode_clear(), 0))
+                else:
+                    backlog.append((encode_record(*entry), 1))
+            except Exception as e:
+                # Un alta que no se puede codificar no se podrá nunca: se descarta y se cuenta
+                self.dropped += 1
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception("Alta descartada del diario de %s", self.directory)
+        self._drain()
+        if self.failing:
+            logger.warning("El diario de %s vuelve a escribir", self.directory)
+            self.failing = False
+        if self._since_snapshot >= self.snapshot_every and not self._snapshot_running():
+            self.snapshot()
+
+    def _drain(self) -> None:
+        # Lo pendiente solo sale del backlog una vez escrito: un fallo se reintenta igual
+        backlog = self._backlog
+        if self._truncate_at is not None:
+            self._file.truncate(self._truncate_at)
+            self._truncate_at = None
+        while backlog:
+            if isinstance(backlog[0], Rotate):
+                self._rotate(backlog[0].segment)
+                backlog.popleft()
+                continue
+            size = next((i for i, entry in enumerate(backlog) if isinstance(entry, Rotate)), len(backlog))
+            entries = list(islice(backlog, size))
+            self._write([data for data, _ in entries])
+            for _ in range(size):
+                backlog.popleft()
+            count = sum(added for _, added in entries)
+            self.written += count
+            self._since_snapshot += count
+
+    def _write(self, chunks: List[bytes]) -> None:
+        if not chunks:
+            return
+        end = self._file.seek(0, os.SEEK_END)
+        try:
+            data = memoryview(b"".join(chunks))
+            while data:
+                data = data[self._file.write(data):]
+            if self.fsync:
+                os.fsync(self._file.fileno())
+        except OSError:
+            # Un registro a medias cortaría la lectura del segmento al recuperar
+            self._truncate_at = end
+            raise
+
+    def _rotate(self, segment: int) -> None:
+        file = open(self._segment_path(segment), "ab", buffering=0)
+        self._file.close()
+        self._file = file
+        self._segment = segment
+
+    def _snapshot_running(self) -> bool:
+        return self._snapshot_thread is not None and self._snapshot_thread.is_alive()
+
+    def snapshot(self, wait: bool = False) -> None:
+        """Copia el historial y escribe el snapshot en otro hilo."""
+        self._since_snapshot = 0
+        records, stats_state, next_seq = self._history.capture(self._mark_rotation)
+        first_segment = self._next_segment
+        self._snapshot_thread = threading.Thread(
+            target=self._write_snapshot,
+            args=(records, stats_state, next_seq, first_segment),
+            name="history-snapshot",
+            daemon=True,
+        )
+        self._snapshot_thread.start()
+        if wait:
+            self._snapshot_thread.join()
+
+    def _mark_rotation(self) -> None:
+        # Con el lock del historial: el marcador queda justo detrás de las
+        # altas incluidas en la copia, así que el segmento nuevo empieza
+        # exactamente donde termina el snapshot
+        self._next_segment += 1
+        self._pending.append(Rotate(self._next_segment))
+
+    def _write_snapshot(self, records: List[HistoryRecord], stats_state, next_seq: int, first_segment: int) -> None:
+        try:
+            self._save_snapshot(records, stats_state, next_seq, first_segment)
+        except Exception as e:
+            # Los segmentos anteriores se conservan: la recuperación sigue siendo completa
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            logger.exception("No se pudo escribir el snapshot en %s", self.directory)
+
+    def _save_snapshot(self, records: List[HistoryRecord], stats_state, next_seq: int, first_segment: int) -> None:
+        path = os.path.join(self.directory, SNAPSHOT_NAME)
+        temporary = path + ".tmp"
+        stats_bytes = json.dumps(stats_state).encode()
+        with open(temporary, "wb") as handle:
+            handle.write(SNAPSHOT_MAGIC + SNAPSHOT_HEADER.pack(first_segment, next_seq, len(stats_bytes)) + stats_bytes)
+            for offset in range(0, len(records), 10000):
+                # El snapshot no necesita la hora exacta del alta: basta con `created`
+                now, monotonic_now = time.time(), time.monotonic()
+                handle.write(b"".join(
+                    encode_record(record, now - (monotonic_now - record.created))
+                    for record in records[offset:offset + 10000]
+                ))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temporary, path)
+        _fsync_directory(self.directory)
+        for segment in self._segments():
+            if segment < first_segment:
+                os.remove(self._segment_path(segment))
+        self.snapshots += 1
+
+    def stats(self) -> dict:
+        return {
+            "directory": self.directory,
+            "segment": self._segment,
+            "pending": len(self._pending) + len(self._backlog),
+            "written": self.written,
+            "snapshots": self.snapshots,
+            "recovered": self.recovered,
+            "recovery_seconds": self.recovery_seconds,
+            "failing": self.failing,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "last_error": self.last_error,
+        }
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._snapshot_running():
+            self._snapshot_thread.join()
+        self._file.close()
+
+
+def journaled_history(history: CalculationHistory, directory: str, **options) -> CalculationHistory:
+    """Recupera `history` desde `directory` y empieza a registrar en él."""
+    journal = HistoryJournal(directory, **options)
+    journal.recover(history)
+    journal.start(history)
+    return history
@@ -2,16 +2,51 @@
 
 ### 3. **Backend - main.py**
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+import decimal
+import functools
+import math
+import os
+import time
+import zlib
+from contextlib import asynccontextmanager
+
+import anyio.to_thread
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.datastructures import QueryParams
+from pydantic import BaseModel, Field, ValidationError
+from typing import Callable, Dict, List, Optional, Union
 from enum import Enum
 from datetime import datetime
 
+from app import archive, engine, expressions, precision as exact
+from app.batcher import create_calculation_batcher
+from app.cache import ResultCache, create_result_cache
+from app.compression import CompressionMiddleware
+from app.decoding import CalculationDecoder, decode_json_list
+from app.expressions import CompiledExpression, ExpressionError
+from app.feed import create_history_feed
+from app.history import HistoryRecord, create_history_backend, format_timestamp, local_timestamp
+from app.metrics import EventLoopLagMonitor, MetricsMiddleware, MetricsRegistry, resident_memory_bytes
+from app.offload import Overloaded, create_offloader
+from app.operations import OPERATIONS, OperationError
+from app.ratelimit import AdmissionMiddleware, create_admission_control
+from app.responses import FastJSONResponse, dumps
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_lag.start()
+    yield
+    await loop_lag.stop()
+    offloader.shutdown()
+    history_db.close()
+
 app = FastAPI(
     title="Calculadora Empresarial API",
     description="API para cálculos empresariales con historial",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 class OperationType(str, Enum):
@@ -19,82 +54,780 @@ class OperationType(str, Enum):
     SUBTRACT = "subtract"
     MULTIPLY = "multiply"
     DIVIDE = "divide"
+    POWER = "power"
+    MODULO = "modulo"
+    PERCENTAGE = "percentage"  # `a` por ciento de `b`
+    INTEGER_DIVIDE = "integer_divide"
+
+class PrecisionMode(str, Enum):
+    FLOAT = "float"
+    DECIMAL = "decimal"
+    FRACTION = "fraction"
+
+class HistoryFormat(str, Enum):
+    JSON = "json"
+    NDJSON = "ndjson"
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    ARROW = "arrow"
 
 class CalculationRequest(BaseModel):
     a: float
     b: float
     operation: OperationType
+    precision: Optional[PrecisionMode] = None
 
 class CalculationResponse(BaseModel):
     result: float
     operation: str
     timestamp: str
+    exact_result: Optional[str] = None
+
+class HistoryEntry(CalculationResponse):
+    id: int
+
+class BatchItemResult(BaseModel):
+    index: int
+    status_code: int
+    result: Optional[float] = None
+    operation: Optional[str] = None
+    timestamp: Optional[str] = None
+    exact_result: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
+    succeeded: int
+    failed: int
+
+class EvaluationRequest(BaseModel):
+    expression: str = Field(..., min_length=1, max_length=1000)
+    variables: Dict[str, Union[float, List[float]]] = {}
+
+class EvaluationResponse(BaseModel):
+    expression: str
+    variables: List[str]
+    result: Optional[float] = None
+    results: Optional[List[Optional[float]]] = None
+
+history_db = create_history_backend()
+history_feed = create_history_feed()
+offloader = create_offloader()
+loop_lag = EventLoopLagMonitor()
+
+# Umbrales a partir de los cuales un cálculo sale del event loop
+OFFLOAD_MIN_DIGITS = int(os.environ.get("OFFLOAD_MIN_DIGITS", "100"))
+OFFLOAD_MIN_ROWS = int(os.environ.get("OFFLOAD_MIN_ROWS", "5000"))
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return FastJSONResponse(
+        {"detail": "Servidor ocupado, reintente en unos segundos"}, status_code=503, headers={"Retry-After": "1"}
+    )
+
+metrics = MetricsRegistry()
+metrics.register_gauge(
+    "calculator_history_entries",
+    "Entradas en el historial",
+    lambda: history_db.entry_count(),
+)
+metrics.register_gauge(
+    "calculator_feed_subscribers",
+    "Suscriptores conectados a /history/stream",
+    lambda: history_feed.subscribers,
+)
+metrics.register_gauge(
+    "calculator_event_loop_lag_seconds",
+    "Retraso máximo del event loop en la ventana reciente",
+    lambda: loop_lag.max,
+)
+metrics.register_gauge(
+    "calculator_offload_inflight",
+    "Operaciones en curso en el ejecutor",
+    lambda: offloader.inflight,
+)
+metrics.register_gauge("process_resident_memory_bytes", "Memoria residente del proceso", resident_memory_bytes)
+history_journal = getattr(history_db, "journal", None)
+if history_journal is not None:
+    metrics.register_gauge(
+        "calculator_journal_failing",
+        "1 si el diario del historial no consigue escribir en disco",
+        lambda: int(history_journal.failing),
+    )
+    metrics.register_gauge("calculator_journal_errors", "Errores de escritura del diario", lambda: history_journal.errors)
+    metrics.register_gauge(
+        "calculator_journal_dropped", "Altas que el diario no pudo codificar", lambda: history_journal.dropped
+    )
+    metrics.register_gauge(
+        "calculator_journal_pending", "Entradas del diario aún sin escribir", lambda: history_journal.stats()["pending"]
+    )
+
+# Registros de historial que equivalen a una petición en el límite por cliente
+HISTORY_ROWS_PER_TOKEN = 1000
+
+def history_cost(scope) -> float:
+    # Una consulta cuesta más cuantos más registros puede devolver; sin
+    # `limit` (o en /history/export) cuenta el historial completo, con un
+    # contador que no bloquea: esto corre en el middleware, en el event loop
+    limit = QueryParams(scope["query_string"]).get("limit")
+    rows = int(limit) if limit is not None and limit.isdigit() else history_db.entry_count()
+    return 1 + rows / HISTORY_ROWS_PER_TOKEN
+
+admission = create_admission_control()
+if admission is not None:
+    admission.costs.update({
+        "/history": history_cost,
+        "/history/export": history_cost,
+        "/calculate/batch": 5,
+        "/evaluate": 2,
+    })
+    metrics.register_gauge("calculator_requests_active", "Peticiones en curso", lambda: admission.active)
+    metrics.register_gauge("calculator_requests_limited", "Peticiones rechazadas con 429", lambda: admission.limited)
+    metrics.register_gauge("calculator_requests_shed", "Peticiones rechazadas con 503 por el tope global", lambda: admission.shed)
+    # Va por dentro de las métricas para que los 429/503 también se cuenten
+    app.add_middleware(AdmissionMiddleware, control=admission)
+if os.environ.get("METRICS_ENABLED", "1") != "0":
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+if os.environ.get("COMPRESSION_ENABLED", "1") != "0":
+    app.add_middleware(CompressionMiddleware, minimum_size=int(os.environ.get("COMPRESSION_MIN_SIZE", "1024")))
+
+def compute(a: float, b: float, operation: OperationType):
+    spec = OPERATIONS[operation]
+    try:
+        return spec.apply(a, b), spec.symbol
+    except (ZeroDivisionError, OperationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def invalid_detail(request) -> str:
+    # Mensaje para una operación que el motor vectorizado marcó como no definida
+    try:
+        OPERATIONS[request.operation].validate(request.a, request.b)
+    except (ZeroDivisionError, OperationError) as e:
+        return str(e)
+    return "Operación no válida"
+
+# JSON no tiene ±inf ni NaN y `result` no admite null: un desbordamiento es un 400
+FLOAT_RANGE_DETAIL = "El resultado excede el rango de un número de coma flotante"
+
+def result_error(request, value: Optional[float]) -> Optional[str]:
+    # Mensaje del 400 para un resultado del motor vectorizado; None si es válido
+    if value is None:
+        return invalid_detail(request)
+    if not math.isfinite(value):
+        return FLOAT_RANGE_DETAIL
+    return None
+
+result_cache = create_result_cache()
+
+def cache_key(request: CalculationRequest):
+    # 0.0 y -0.0 son la misma clave pero producen etiquetas distintas: no se cachean
+    if request.a == 0 or request.b == 0:
+        return None
+    return (request.a, request.b, request.operation)
+
+def lookup_cached(request: CalculationRequest):
+    if result_cache is None:
+        return None
+    key = cache_key(request)
+    return None if key is None else result_cache.get(key)
+
+def store_cached(request: CalculationRequest, value) -> None:
+    if result_cache is None:
+        return
+    key = cache_key(request)
+    if key is not None:
+        result_cache.put(key, value)
+
+calculation_decoder = CalculationDecoder(
+    CalculationRequest,
+    {op.value: op for op in OperationType},
+    {mode.value: mode for mode in PrecisionMode},
+)
+
+# Modo por defecto del despliegue; cada petición puede elegir otro con `precision`
+DEFAULT_PRECISION = PrecisionMode(os.environ.get("CALCULATION_PRECISION", PrecisionMode.FLOAT.value))
+decimal_context = exact.default_decimal_context()
+
+# El cuerpo se decodifica a mano en la ruta caliente; el esquema OpenAPI se
+# declara explícitamente para que siga siendo el de CalculationRequest
+CALCULATE_OPENAPI = {
+    "requestBody": {
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/CalculationRequest"}}},
+        "required": True,
+    },
+}
+VALIDATION_ERROR_RESPONSE = {
+    422: {
+        "description": "Validation Error",
+        "content": {"application/json": {"schema": {"$ref": "#/components/schemas/HTTPValidationError"}}},
+    },
+}
+
+def openapi_schema() -> dict:
+    # Ninguna ruta recibe CalculationRequest como parámetro tipado, así que
+    # FastAPI no lo emite: se añade (con sus enums) a components.schemas
+    if app.openapi_schema is None:
+        schema = FastAPI.openapi(app)
+        model = CalculationRequest.model_json_schema(ref_template="#/components/schemas/{model}")
+        schemas = schema.setdefault("components", {}).setdefault("schemas", {})
+        schemas.update(model.pop("$defs", {}))
+        for field in model["properties"].values():
+            # Como FastAPI en los modelos de entrada: sin `default: null`
+            if "default" in field and field["default"] is None:
+                del field["default"]
+        schemas["CalculationRequest"] = model
+        schema["components"]["schemas"] = dict(sorted(schemas.items()))
+    return app.openapi_schema
+
+app.openapi = openapi_schema
+
+def calculate_one(request) -> dict:
+    # `request` es un CalculationRequest o su equivalente ligero FastCalculationRequest
+    cached = lookup_cached(request)
+    if cached is None:
+        spec = OPERATIONS[request.operation]
+        try:
+            result = spec.apply(request.a, request.b)
+        except (ZeroDivisionError, OperationError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not math.isfinite(result):
+            raise HTTPException(status_code=400, detail=FLOAT_RANGE_DETAIL)
+        cached = (round(result, 6), spec.label(request.a, request.b))
+        store_cached(request, cached)
+
+    # En un acierto de caché se registra igualmente con timestamp nuevo. El
+    # historial guarda operandos e instante; el texto solo va en la respuesta
+    result, operation = cached
+    record = HistoryRecord(
+        result, operation, operation_type=request.operation.value, a=request.a, b=request.b, epoch_ns=time.time_ns()
+    )
+    history_db.add_calculation(record)
+    response = {"result": result, "operation": operation, "timestamp": record.timestamp}
+    history_feed.publish(response)
+    return response
+
+@app.post(
+    "/calculate",
+    response_model=CalculationResponse,
+    openapi_extra=CALCULATE_OPENAPI,
+    responses=VALIDATION_ERROR_RESPONSE,
+)
+async def calculate(raw_request: Request):
+    body = await raw_request.body()
+    request = calculation_decoder.decode(body, raw_request.headers.get("content-type"))
+    raw_request.scope["operation"] = request.operation.value
+    precision = request.precision or DEFAULT_PRECISION
+    if precision is not PrecisionMode.FLOAT:
+        return FastJSONResponse(await calculate_exact(request, precision, body))
+    if calculation_batcher is not None:
+        # Las peticiones idénticas en vuelo comparten el cálculo, no la entrada de historial
+        return FastJSONResponse(await calculation_batcher.submit(cache_key(request), request))
+    # Datos construidos aquí: se serializan sin revalidar contra response_model
+    return FastJSONResponse(calculate_one(request))
+
+async def calculate_exact(request, precision: PrecisionMode, body: bytes) -> dict:
+    # Los operandos se releen del cuerpo sin pasar por float; sin caché de resultados
+    a, b = exact.parse_operands(body)
+    arguments = (a, b, request.operation.value, precision.value, decimal_context)
+    try:
+        if exact.exact_cost(a, b, precision.value, decimal_context, request.operation.value) >= OFFLOAD_MIN_DIGITS:
+            value = await offloader.run(exact.compute_exact, *arguments)
+        else:
+            value = exact.compute_exact(*arguments)
+        result, exact_result = float(value), exact.exact_text(value)
+    except EXACT_ERRORS as e:
+        raise HTTPException(status_code=400, detail=exact_error_detail(e))
+    # La etiqueta lleva los operandos decimales tal cual: se guarda como texto
+    operation = OPERATIONS[request.operation].label(a, b)
+    record = HistoryRecord(result, operation, operation_type=request.operation.value, epoch_ns=time.time_ns())
+    history_db.add_calculation(record)
+    response = {"result": result, "operation": operation, "timestamp": record.timestamp, "exact_result": exact_result}
+    history_feed.publish(response)
+    return response
+
+MAX_BATCH_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "10000"))
+# Límites del cuerpo NDJSON, que se lee por trozos
+MAX_BATCH_BODY_BYTES = int(os.environ.get("BATCH_MAX_BODY_BYTES", str(8 * 1024 * 1024)))
+MAX_BATCH_LINE_BYTES = int(os.environ.get("BATCH_MAX_LINE_BYTES", "16384"))
+# Context.remainder/divide_int/power con un resultado que no cabe en la precisión
+INVALID_EXACT_DETAIL = "La operación no se puede calcular con la precisión configurada"
+# Errores de un cálculo exacto que son del cliente (400), no del servidor
+EXACT_ERRORS = (ZeroDivisionError, ArithmeticError, ValueError)
+
+def exact_error_detail(error: Exception) -> str:
+    if isinstance(error, (ZeroDivisionError, OperationError)):
+        return str(error)
+    if isinstance(error, decimal.Overflow):
+        return "El resultado excede la precisión configurada"
+    if isinstance(error, OverflowError):
+        # float() de una Fraction fuera del rango de float
+        return FLOAT_RANGE_DETAIL
+    return INVALID_EXACT_DETAIL
+
+def evaluate_many(requests: list) -> List[Optional[float]]:
+    # Resultados redondeados; None marca una operación no definida (p.ej. división por cero)
+    if engine.HAS_NUMPY:
+        return engine.evaluate_requests(requests)
+    values = []
+    for request in requests:
+        try:
+            result, _ = compute(request.a, request.b, request.operation)
+        except HTTPException:
+            values.append(None)
+            continue
+        values.append(round(result, 6))
+    return values
+
+def batch_item(
+    index: int, status_code: int, result=None, operation=None, timestamp=None, exact_result=None, error=None
+) -> dict:
+    # Misma forma que BatchItemResult, sin construir el modelo
+    return {
+        "index": index,
+        "status_code": status_code,
+        "result": result,
+        "operation": operation,
+        "timestamp": timestamp,
+        "exact_result": exact_result,
+        "error": error,
+    }
+
+async def compute_exact_batch(items: list) -> list:
+    # `items` son (CalculationRequest, a, b) con los operandos decimales.
+    # Como en /calculate: un lote con algún cálculo exacto costoso (o con
+    # muchos) se calcula entero en el ejecutor, no en el event loop
+    results = [None] * len(items)
+    operations = []
+    positions = []
+    costly = len(items) >= OFFLOAD_MIN_ROWS
+    for position, (item, a, b) in enumerate(items):
+        mode = (item.precision or DEFAULT_PRECISION).value
+        try:
+            cost = exact.exact_cost(a, b, mode, decimal_context, item.operation.value)
+        except OperationError as e:
+            results[position] = e
+            continue
+        costly = costly or cost >= OFFLOAD_MIN_DIGITS
+        operations.append((a, b, item.operation.value, mode))
+        positions.append(position)
+    if not operations:
+        return results
+    if costly:
+        computed = await offloader.run(exact.compute_exact_many, operations, decimal_context)
+    else:
+        computed = exact.compute_exact_many(operations, decimal_context)
+    for position, value in zip(positions, computed):
+        results[position] = value
+    return results
+
+def batch_item_exact(index: int, exact_item: tuple, computed, epoch_ns: int, timestamp: str, records: list) -> dict:
+    # `computed` es (result, exact_result) o el error de compute_exact_batch
+    if isinstance(computed, Exception):
+        return batch_item(index, 400, error=exact_error_detail(computed))
+    result, exact_result = computed
+    item, a, b = exact_item
+    record = HistoryRecord(
+        result, OPERATIONS[item.operation].label(a, b), timestamp,
+        operation_type=item.operation.value, epoch_ns=epoch_ns,
+    )
+    records.append(record)
+    return batch_item(
+        index, 200, result=record.result, operation=record.operation, timestamp=timestamp, exact_result=exact_result
+    )
+
+def check_batch_size(count: int) -> None:
+    if count > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {MAX_BATCH_SIZE} operaciones")
+
+def is_exact_item(item) -> bool:
+    return not isinstance(item, str) and (item.precision or DEFAULT_PRECISION) is not PrecisionMode.FLOAT
+
+async def run_batch(items: list, operands: Callable[[int], tuple]) -> dict:
+    # `items` contiene CalculationRequest o mensajes de error de validación;
+    # `operands(index)` da los operandos decimales de una entrada en modo exacto,
+    # releídos del cuerpo sin pasar por float como en /calculate
+    check_batch_size(len(items))
+    valid = [item for item in items if not isinstance(item, str)]
+    exact_items = [(item, *operands(index)) for index, item in enumerate(items) if is_exact_item(item)]
+    exact_iter = iter(exact_items)
+    exact_values = iter(await compute_exact_batch(exact_items))
+    epoch_ns = time.time_ns()
+    timestamp = format_timestamp(epoch_ns)
+    values = iter(evaluate_many(valid))
+    results = []
+    records = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            results.append(batch_item(index, 422, error=item))
+            continue
+        value = next(values)
+        precision = item.precision or DEFAULT_PRECISION
+        if precision is not PrecisionMode.FLOAT:
+            results.append(batch_item_exact(index, next(exact_iter), next(exact_values), epoch_ns, timestamp, records))
+            continue
+        error = result_error(item, value)
+        if error is not None:
+            results.append(batch_item(index, 400, error=error))
+            continue
+        operation = OPERATIONS[item.operation].label(item.a, item.b)
+        record = HistoryRecord(
+            value, operation, timestamp, operation_type=item.operation.value, a=item.a, b=item.b, epoch_ns=epoch_ns
+        )
+        records.append(record)
+        results.append(batch_item(index, 200, result=value, operation=record.operation, timestamp=timestamp))
+    history_db.add_many(records)
+    history_feed.publish_many(
+        {"result": record.result, "operation": record.operation, "timestamp": record.timestamp} for record in records
+    )
+    return {
+        "results": results,
+        "succeeded": len(records),
+        "failed": len(results) - len(records),
+    }
+
+def calculate_many(requests: list, counts: List[int]) -> list:
+    # Lote del micro-batcher: la caché de resultados se consulta por petición
+    # distinta, los fallos se evalúan juntos y hay una sola alta en el
+    # historial, con un registro por llamante como en /calculate sin lote;
+    # cada llamante recibe su respuesta o su HTTPException
+    cached = [lookup_cached(request) for request in requests]
+    missing = [request for request, entry in zip(requests, cached) if entry is None]
+    values = iter(evaluate_many(missing))
+    epoch_ns = time.time_ns()
+    timestamp = format_timestamp(epoch_ns)
+    responses = []
+    records = []
+    for request, count, entry in zip(requests, counts, cached):
+        if entry is None:
+            value = next(values)
+            error = result_error(request, value)
+            if error is not None:
+                responses.append(HTTPException(status_code=400, detail=error))
+                continue
+            entry = (value, OPERATIONS[request.operation].label(request.a, request.b))
+            store_cached(request, entry)
+        value, operation = entry
+        records.extend(
+            HistoryRecord(
+                value, operation, timestamp,
+                operation_type=request.operation.value, a=request.a, b=request.b, epoch_ns=epoch_ns,
+            )
+            for _ in range(count)
+        )
+        responses.append({"result": value, "operation": operation, "timestamp": timestamp})
+    history_db.add_many(records)
+    history_feed.publish_many(
+        {"result": record.result, "operation": record.operation, "timestamp": record.timestamp} for record in records
+    )
+    return responses
+
+calculation_batcher = create_calculation_batcher(calculate_many)
 
-class CalculationHistory:
-    def __init__(self):
-        self.history = []
-    
-    def add_calculation(self, calculation: CalculationResponse):
-        self.history.append(calculation)
-    
-    def get_history(self) -> List[CalculationResponse]:
-        return self.history
-    
-    def clear_history(self):
-        self.history.clear()
-
-history_db = CalculationHistory()
-
-@app.post("/calculate", response_model=CalculationResponse)
-async def calculate(request: CalculationRequest):
+@app.get("/calculate/batcher")
+async def calculation_batcher_stats():
+    if calculation_batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **calculation_batcher.stats()}
+
+BATCH_OPENAPI = {
+    "requestBody": {
+        "content": {"application/json": {"schema": {
+            "items": {"$ref": "#/components/schemas/CalculationRequest"}, "type": "array", "title": "Requests",
+        }}},
+        "required": True,
+    },
+}
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(detail["msg"] for detail in error.errors())
+
+def parse_batch_item(item):
+    try:
+        return CalculationRequest.model_validate(item)
+    except ValidationError as e:
+        return validation_message(e)
+
+@app.post(
+    "/calculate/batch",
+    response_model=BatchResponse,
+    openapi_extra=BATCH_OPENAPI,
+    responses=VALIDATION_ERROR_RESPONSE,
+)
+async def calculate_batch(raw_request: Request):
+    # Cada elemento se valida por separado: uno inválido solo falla su propia entrada
+    body = await raw_request.body()
+    items = decode_json_list(body, raw_request.headers.get("content-type"))
+    # Un lote demasiado grande se rechaza antes de validar sus elementos
+    check_batch_size(len(items))
+    requests = [parse_batch_item(item) for item in items]
+    # El cuerpo solo se relee con Decimal si alguna entrada pide un modo exacto
+    operands = exact.parse_batch_operands(body) if any(map(is_exact_item, requests)) else []
+    return FastJSONResponse(await run_batch(requests, operands.__getitem__))
+
+def parse_ndjson_line(line: bytes):
     try:
-        if request.operation == OperationType.ADD:
-            result = request.a + request.b
-            operation_symbol = "+"
-        elif request.operation == OperationType.SUBTRACT:
-            result = request.a - request.b
-            operation_symbol = "-"
-        elif request.operation == OperationType.MULTIPLY:
-            result = request.a * request.b
-            operation_symbol = "×"
-        elif request.operation == OperationType.DIVIDE:
-            if request.b == 0:
-                raise HTTPException(status_code=400, detail="No se puede dividir por cero")
-            result = request.a / request.b
-            operation_symbol = "÷"
+        return CalculationRequest.model_validate_json(line)
+    except ValidationError as e:
+        return validation_message(e)
+
+@app.post("/calculate/batch/ndjson", response_model=BatchResponse)
+async def calculate_batch_ndjson(request: Request):
+    # Cada línea es un CalculationRequest; una línea inválida solo falla su propia entrada
+    lines = await read_ndjson_lines(request)
+    items = [parse_ndjson_line(line) for line in lines]
+    return FastJSONResponse(await run_batch(items, lambda index: exact.parse_operands(lines[index])))
+
+def line_too_long() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Una línea supera el máximo de {MAX_BATCH_LINE_BYTES} bytes")
+
+async def read_ndjson_lines(request: Request) -> List[bytes]:
+    # Líneas no vacías del cuerpo; cada byte se examina una sola vez y solo
+    # se retiene la línea incompleta, con tamaño acotado como el del cuerpo
+    lines = []
+    buffer = bytearray()
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BATCH_BODY_BYTES:
+            raise HTTPException(
+                status_code=413, detail=f"El cuerpo supera el máximo de {MAX_BATCH_BODY_BYTES} bytes"
+            )
+        # Lo que ya había en el buffer no contiene saltos de línea
+        scan = len(buffer)
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", scan)
+            if end < 0:
+                break
+            if end - start > MAX_BATCH_LINE_BYTES:
+                raise line_too_long()
+            line = bytes(buffer[start:end])
+            if line.strip():
+                lines.append(line)
+            start = scan = end + 1
+        del buffer[:start]
+        if len(buffer) > MAX_BATCH_LINE_BYTES:
+            raise line_too_long()
+        if len(lines) > MAX_BATCH_SIZE:
+            # run_batch responde 413 sin esperar al resto del cuerpo
+            return lines
+    if buffer.strip():
+        lines.append(bytes(buffer))
+    return lines
+
+expression_cache = ResultCache(max_size=int(os.environ.get("EXPRESSION_CACHE_SIZE", "1024")))
+
+def compile_expression(text: str) -> CompiledExpression:
+    # Una fórmula repetida con otros valores no se vuelve a analizar
+    compiled = expression_cache.get(text)
+    if compiled is None:
+        compiled = CompiledExpression(text)
+        expression_cache.put(text, compiled)
+    return compiled
+
+@app.post("/evaluate", response_model=EvaluationResponse)
+async def evaluate(request: EvaluationRequest):
+    # Con alguna variable como lista se evalúa en bloque; no se registra en el historial
+    try:
+        compiled = compile_expression(request.expression)
+        response = {"expression": request.expression, "variables": list(compiled.variables)}
+        if any(isinstance(value, list) for value in request.variables.values()):
+            rows = max(len(value) for value in request.variables.values() if isinstance(value, list))
+            if rows > MAX_BATCH_SIZE:
+                raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {MAX_BATCH_SIZE} operaciones")
+            if rows >= OFFLOAD_MIN_ROWS:
+                response["results"] = await offloader.run(
+                    expressions.evaluate_many, request.expression, request.variables
+                )
+            else:
+                response["results"] = compiled.evaluate_many(request.variables)
         else:
-            raise HTTPException(status_code=400, detail="Operación no válida")
-        
-        response = CalculationResponse(
-            result=round(result, 6),
-            operation=f"{request.a} {operation_symbol} {request.b}",
-            timestamp=datetime.now().isoformat()
+            response["result"] = compiled.evaluate(request.variables)
+    except (ExpressionError, OperationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ZeroDivisionError:
+        raise HTTPException(status_code=400, detail="No se puede dividir por cero")
+    return FastJSONResponse(response)
+
+@app.get("/evaluate/cache")
+async def evaluate_cache_stats():
+    return expression_cache.stats()
+
+NDJSON_PAGE_SIZE = 1000
+
+def iter_history_ndjson(cursor: Optional[int], limit: Optional[int], filters: dict):
+    # Se recorre el historial por páginas para no materializar la lista completa
+    remaining = limit
+    while remaining is None or remaining > 0:
+        page_size = NDJSON_PAGE_SIZE if remaining is None else min(NDJSON_PAGE_SIZE, remaining)
+        page = history_db.get_page(cursor=cursor, limit=page_size, **filters)
+        if not page:
+            return
+        yield b"".join(dumps(record.to_dict()) + b"\n" for record in page)
+        cursor = page[-1].seq
+        if remaining is not None:
+            remaining -= len(page)
+
+async def history_call(function, *args, **kwargs):
+    # Con un backend que bloquea (SQLite) la llamada sale del event loop
+    if history_db.blocking:
+        return await anyio.to_thread.run_sync(functools.partial(function, *args, **kwargs))
+    return function(*args, **kwargs)
+
+def history_etag(version: int, query: str) -> str:
+    # Débil: la misma página puede servirse comprimida o sin comprimir
+    return f'W/"{version:x}-{zlib.crc32(query.encode()):08x}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match compara en modo débil: se ignora el prefijo W/
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+@app.get("/history", response_model=List[HistoryEntry])
+async def get_history(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[int] = Query(None, ge=0),
+    since: Optional[datetime] = None,
+    from_: Optional[datetime] = Query(None, alias="from", description="Timestamp ISO mínimo (inclusivo)"),
+    to: Optional[datetime] = Query(None, description="Timestamp ISO máximo (inclusivo)"),
+    operation: Optional[OperationType] = None,
+    min_result: Optional[float] = None,
+    max_result: Optional[float] = None,
+    format: HistoryFormat = HistoryFormat.JSON,
+    if_none_match: Optional[str] = Header(None),
+):
+    # La versión se lee antes que la página: si hay altas entre medias el
+    # ETag queda atrasado y la siguiente consulta trae la página completa
+    etag = history_etag(await history_call(history_db.version), request.url.query)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    # `from` es el nombre público; `since` se mantiene por compatibilidad. Los
+    # límites con zona horaria (Z, +02:00) se pasan a la hora local guardada
+    lower = [local_timestamp(moment) for moment in (since, from_) if moment is not None]
+    filters = {
+        "since": max(lower) if lower else None,
+        "until": local_timestamp(to) if to is not None else None,
+        "operation_type": operation.value if operation is not None else None,
+        "min_result": min_result,
+        "max_result": max_result,
+    }
+    if format == HistoryFormat.NDJSON:
+        return StreamingResponse(
+            iter_history_ndjson(cursor, limit, filters),
+            media_type="application/x-ndjson",
+            headers=headers,
         )
-        
-        history_db.add_calculation(response)
-        return response
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
-
-@app.get("/history", response_model=List[CalculationResponse])
-async def get_history():
-    return history_db.get_history()
+    page = await history_call(history_db.get_page, cursor=cursor, limit=limit, **filters)
+    if limit is not None and len(page) == limit:
+        headers["X-Next-Cursor"] = str(page[-1].seq)
+    return FastJSONResponse([record.to_dict() for record in page], headers=headers)
 
 @app.delete("/history")
 async def clear_history():
-    history_db.clear_history()
+    await history_call(history_db.clear_history)
     return {"message": "Historial limpiado correctamente"}
 
+@app.get("/history/stream")
+async def history_stream(
+    last_event_id: Optional[int] = Header(None, ge=0),
+    since_id: Optional[int] = Query(None, ge=0, description="Reanudar tras este id de evento"),
+):
+    # Server-Sent Events: un CalculationResponse por alta; `since_id` equivale a Last-Event-ID
+    return StreamingResponse(
+        history_feed.subscribe(since_id if since_id is not None else last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/history/stream/stats")
+async def history_stream_stats():
+    return history_feed.stats()
+
+@app.get("/history/export")
+async def export_history(
+    format: ExportFormat = ExportFormat.CSV,
+    accept_encoding: Optional[str] = Header(None),
+):
+    # Se lee el almacén por páginas: memoria constante para cualquier tamaño
+    encoding = archive.negotiate_encoding(accept_encoding)
+    try:
+        chunks = archive.export_history(history_db, format.value, encoding)
+    except archive.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {
+        "Content-Disposition": f'attachment; filename="history.{format.value}"',
+        "Vary": "Accept-Encoding",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return StreamingResponse(chunks, media_type=archive.MEDIA_TYPES[format.value], headers=headers)
+
+@app.post("/history/import")
+async def import_history(
+    request: Request,
+    format: ExportFormat = ExportFormat.CSV,
+    content_encoding: Optional[str] = Header(None),
+):
+    # Las filas se confirman por lotes: ante un error se conservan las ya importadas
+    try:
+        imported = await archive.import_history(history_db, request.stream(), format.value, content_encoding)
+    except archive.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"imported": imported}
+
+@app.get("/history/stats")
+async def history_stats(window: Optional[float] = Query(None, gt=0, description="Ventana en segundos")):
+    return await history_call(history_db.get_stats, window)
+
+@app.get("/history/memory")
+async def history_memory():
+    return await history_call(history_db.memory_usage)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return result_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/health")
 async def health_check():
-    return {
+    health = {
         "status": "healthy", 
         "timestamp": datetime.now().isoformat(),
-        "service": "Calculadora API"
+        "service": "Calculadora API",
+        "pid": os.getpid(),
+        "event_loop_lag_ms": round(loop_lag.last * 1000, 3),
     }
+    journal = getattr(history_db, "journal", None)
+    if journal is not None:
+        # Sin diario que escriba (o con altas descartadas) se siguen sirviendo
+        # peticiones, pero el historial no es durable
+        stats = journal.stats()
+        health["journal"] = {key: stats[key] for key in ("failing", "errors", "dropped", "last_error", "pending")}
+        if journal.failing or journal.dropped:
+            health["status"] = "degraded"
+    return health
+
+@app.get("/admission")
+async def admission_stats():
+    if admission is None:
+        return {"enabled": False}
+    return admission.stats()
+
+@app.get("/offload")
+async def offload_stats():
+    return {"executor": offloader.stats(), "event_loop": loop_lag.stats()}
 
 @app.get("/")
 async def root():
@@ -103,8 +836,17 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "calculate": "POST /calculate",
+            "calculate_batch": "POST /calculate/batch",
+            "evaluate": "POST /evaluate",
             "history": "GET /history",
             "clear_history": "DELETE /history",
+            "history_stats": "GET /history/stats",
+            "history_memory": "GET /history/memory",
+            "history_stream": "GET /history/stream",
+            "history_export": "GET /history/export",
+            "history_import": "POST /history/import",
+            "admission": "GET /admission",
+            "metrics": "GET /metrics",
             "health": "GET /health"
         }
     }
\ No newline at end of file
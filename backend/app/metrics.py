@@ -0,0 +1,203 @@
+"""Métricas en formato de texto de Prometheus.
+
+Los histogramas usan cubetas preasignadas: registrar una observación es una
+búsqueda binaria y dos sumas, sin crear objetos por petición salvo el float
+de la suma. Todas las actualizaciones ocurren en el hilo del event loop, por
+lo que no se necesitan locks.
+"""
+import asyncio
+import os
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    """Histograma acumulable con cubetas fijas (límites superiores inclusivos)."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total = 0
+        result = []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        # ru_maxrss es el pico (KB en Linux); solo como aproximación
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.route_latency: Dict[str, Histogram] = {}
+        self.operation_latency: Dict[str, Histogram] = {}
+        self.status_counts: Dict[Tuple[str, int], int] = {}
+        self.gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+        self.started = time.time()
+
+    def _histogram(self, table: Dict[str, Histogram], key: str) -> Histogram:
+        histogram = table.get(key)
+        if histogram is None:
+            histogram = table[key] = Histogram(self.buckets)
+        return histogram
+
+    def observe_request(self, route: str, status: int, seconds: float, operation: Optional[str] = None) -> None:
+        self._histogram(self.route_latency, route).observe(seconds)
+        if operation is not None:
+            self._histogram(self.operation_latency, operation).observe(seconds)
+        key = (route, status)
+        self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def register_gauge(self, name: str, help_text: str, read: Callable[[], float]) -> None:
+        """Valor calculado en el momento del scrape, no en la ruta caliente."""
+        self.gauges[name] = (help_text, read)
+
+    def _render_histograms(self, lines: List[str], name: str, label: str, table: Dict[str, Histogram]) -> None:
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(table.items()):
+            cumulative = histogram.cumulative()
+            for bound, value in zip(histogram.bounds, cumulative):
+                lines.append(f'{name}_bucket{{{_labels(**{label: key})},le="{bound}"}} {value}')
+            lines.append(f'{name}_bucket{{{_labels(**{label: key})},le="+Inf"}} {cumulative[-1]}')
+            lines.append(f"{name}_sum{{{_labels(**{label: key})}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{_labels(**{label: key})}}} {histogram.count}")
+
+    def render(self) -> str:
+        lines: List[str] = []
+        lines.append("# HELP calculator_request_duration_seconds Latencia de las peticiones por ruta")
+        self._render_histograms(lines, "calculator_request_duration_seconds", "route", self.route_latency)
+        lines.append("# HELP calculator_operation_duration_seconds Latencia de /calculate por operación")
+        self._render_histograms(lines, "calculator_operation_duration_seconds", "operation", self.operation_latency)
+
+        lines.append("# HELP calculator_responses_total Respuestas por ruta y código de estado")
+        lines.append("# TYPE calculator_responses_total counter")
+        for (route, status), value in sorted(self.status_counts.items()):
+            lines.append(f"calculator_responses_total{{{_labels(route=route, status=status)}}} {value}")
+        lines.append("# HELP calculator_errors_total Respuestas con error por ruta y código de estado")
+        lines.append("# TYPE calculator_errors_total counter")
+        for (route, status), value in sorted(self.status_counts.items()):
+            if status >= 400:
+                lines.append(f"calculator_errors_total{{{_labels(route=route, status=status)}}} {value}")
+
+        for name, (help_text, read) in sorted(self.gauges.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI que mide la latencia y el código de estado de cada petición.
+
+    La ruta se toma de la plantilla resuelta por el router (`scope["route"]`)
+    para no crear una serie por URL; los handlers pueden dejar la operación
+    en `scope["operation"]`.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.registry.observe_request(
+                route.path if route is not None else "unmatched",
+                status,
+                time.perf_counter() - start,
+                scope.get("operation"),
+            )
+
+
+class EventLoopLagMonitor:
+    """Mide cuánto tarda el event loop en atender un temporizador.
+
+    Cada `interval` segundos duerme y anota el retraso sobre lo pedido: si
+    un handler bloquea el loop, el retraso es lo que esperan /health y el
+    resto de peticiones. Guarda las últimas `window` muestras.
+    """
+
+    def __init__(self, interval: float = 0.05, window: int = 200):
+        self.interval = interval
+        self.samples: "deque" = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval))
+
+    @property
+    def last(self) -> float:
+        return self.samples[-1] if self.samples else 0.0
+
+    @property
+    def max(self) -> float:
+        return max(self.samples, default=0.0)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_ms": self.interval * 1000,
+            "samples": len(self.samples),
+            "last_ms": self.last * 1000,
+            "max_ms": self.max * 1000,
+        }
@@ -0,0 +1,110 @@
+"""Ejecución de las operaciones costosas fuera del event loop.
+
+Las operaciones triviales (float) se siguen calculando en línea; las que
+superan un umbral de coste (aritmética exacta con muchas cifras,
+expresiones sobre muchas filas) se envían al ejecutor configurado:
+
+- inline: en el propio event loop (comportamiento anterior).
+- thread: ThreadPoolExecutor; no bloquea el loop pero comparte el GIL.
+- process: ProcessPoolExecutor (contexto spawn, sin heredar los hilos del
+  historial); las funciones enviadas deben ser de nivel de módulo.
+
+Con más de `max_queue` trabajos en curso las peticiones nuevas se
+rechazan con Overloaded (503) en vez de acumular latencia. Si muere un
+worker del pool de procesos, sus trabajos también terminan en Overloaded y
+el pool roto se sustituye por uno nuevo.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+EXECUTOR_KINDS = ("inline", "thread", "process")
+
+
+class Overloaded(RuntimeError):
+    """Demasiados trabajos en curso en el ejecutor."""
+
+
+class Offloader:
+    def __init__(self, kind: str = "inline", max_workers: Optional[int] = None, max_queue: int = 64):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Ejecutor desconocido: {kind}")
+        if max_queue < 1:
+            raise ValueError("max_queue debe ser mayor que cero")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self.inflight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> Executor:
+        # Se crea al primer uso: importar la aplicación no arranca procesos
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="offload")
+        return self._executor
+
+    async def run(self, function: Callable, *args) -> Any:
+        """Resultado de `function(*args)`; lanza Overloaded si la cola está llena."""
+        if self.kind == "inline":
+            self.completed += 1
+            return function(*args)
+        if self.inflight >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(f"Hay {self.inflight} operaciones en curso")
+        self.inflight += 1
+        executor = self._get_executor()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            # Un worker murió (p.ej. por memoria): el pool no admite más
+            # trabajos: se sustituye y esta petición recibe el 503 de la carga descartada
+            self._replace_broken(executor)
+            raise Overloaded("Se ha reiniciado el pool de procesos") from None
+        finally:
+            self.inflight -= 1
+            self.completed += 1
+
+    def _replace_broken(self, executor: Executor) -> None:
+        # Los trabajos en curso del mismo pool fallan a la vez: solo el primero lo sustituye
+        if self._executor is not executor:
+            return
+        self._executor = None
+        self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+        self._get_executor()
+
+    def stats(self) -> Dict:
+        return {
+            "executor": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "inflight": self.inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+def create_offloader() -> Offloader:
+    workers = os.environ.get("OFFLOAD_WORKERS")
+    return Offloader(
+        kind=os.environ.get("OFFLOAD_EXECUTOR", "inline"),
+        max_workers=int(workers) if workers else None,
+        max_queue=int(os.environ.get("OFFLOAD_MAX_QUEUE", "64")),
+    )
@@ -0,0 +1,174 @@
+"""Registro de operaciones binarias de la calculadora.
+
+Cada operación (por valor de OperationType) reúne su función float, su
+símbolo para la etiqueta del historial, su validación y sus equivalentes
+vectorizado (NumPy) y exactos (Decimal y Fraction). `/calculate`, los
+lotes, el motor vectorizado, `/evaluate` y la aritmética exacta despachan
+por este diccionario, así que añadir una operación es añadir una entrada.
+
+Las validaciones lanzan ZeroDivisionError u OperationError con el
+mensaje que recibe el cliente; las vectorizadas devuelven la máscara de
+filas en las que la operación no está definida.
+"""
+import decimal
+import math
+import operator
+from fractions import Fraction
+from typing import Callable, Dict, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy es opcional
+    np = None
+
+# Exponente máximo (en bits del resultado) para la potencia en modo fraction
+MAX_FRACTION_POWER_BITS = 1 << 20
+
+
+class OperationError(ValueError):
+    """Operación no definida para esos operandos."""
+
+
+class Operation:
+    __slots__ = ("name", "symbol", "code", "function", "validate", "vector", "vector_invalid", "decimal", "fraction")
+
+    def __init__(
+        self,
+        name: str,
+        symbol: str,
+        function: Callable,
+        decimal: Callable,
+        fraction: Callable,
+        validate: Optional[Callable] = None,
+        vector: Optional[Callable] = None,
+        vector_invalid: Optional[Callable] = None,
+    ):
+        self.name = name
+        self.symbol = symbol
+        self.code = -1
+        self.function = function
+        self.validate = validate
+        # Por defecto la función float sirve también para arrays
+        self.vector = vector or function
+        self.vector_invalid = vector_invalid
+        self.decimal = decimal
+        self.fraction = fraction
+
+    def apply(self, a, b):
+        if self.validate is not None:
+            self.validate(a, b)
+        return self.function(a, b)
+
+    def label(self, a, b) -> str:
+        return f"{a} {self.symbol} {b}"
+
+
+def _is_integer(value) -> bool:
+    if isinstance(value, float):
+        return value.is_integer()
+    if isinstance(value, decimal.Decimal):
+        return value == value.to_integral_value()
+    return value.denominator == 1
+
+
+def _nonzero_divisor(a, b) -> None:
+    if b == 0:
+        raise ZeroDivisionError("No se puede dividir por cero")
+
+
+def _real_power(a, b) -> None:
+    if a == 0 and b < 0:
+        raise ZeroDivisionError("No se puede dividir por cero")
+    if a < 0 and not _is_integer(b):
+        raise OperationError("Una base negativa requiere un exponente entero")
+
+
+def _zero_divisor_mask(a, b):
+    return b == 0
+
+
+def _complex_power_mask(a, b):
+    return ((a == 0) & (b < 0)) | ((a < 0) & (b % 1 != 0))
+
+
+def _power(a: float, b: float) -> float:
+    try:
+        return a ** b
+    except OverflowError:
+        # Como en multiply, el desbordamiento da ±inf en vez de un error
+        return -math.inf if a < 0 and b % 2 == 1 else math.inf
+
+
+def _vector_power(a, b):
+    # np.power difiere del `**` de Python en el último bit para algunas
+    # entradas: se calcula fila a fila para que ambos motores coincidan
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64))
+    result = np.full(a.shape, np.nan)
+    valid = ~_complex_power_mask(a, b)
+    result[valid] = [_power(x, y) for x, y in zip(a[valid].tolist(), b[valid].tolist())]
+    return result
+
+
+def _percentage(a, b):
+    # `a` por ciento de `b`
+    return a * b / 100
+
+
+def _decimal_modulo(context: decimal.Context, a: decimal.Decimal, b: decimal.Decimal) -> decimal.Decimal:
+    # Context.remainder trunca; el resto lleva el signo del divisor, como en float
+    remainder = context.remainder(a, b)
+    if remainder and (remainder < 0) != (b < 0):
+        remainder = context.add(remainder, b)
+    return remainder
+
+
+def _decimal_integer_divide(context: decimal.Context, a: decimal.Decimal, b: decimal.Decimal) -> decimal.Decimal:
+    # Context.divide_int trunca hacia cero; // redondea hacia abajo
+    quotient = context.divide_int(a, b)
+    if (a < 0) != (b < 0) and context.remainder(a, b):
+        quotient = context.subtract(quotient, 1)
+    return quotient
+
+
+def _decimal_percentage(context: decimal.Context, a: decimal.Decimal, b: decimal.Decimal) -> decimal.Decimal:
+    # b / 100 desplazando el exponente es exacto: solo se redondea el producto
+    sign, digits, exponent = b.as_tuple()
+    return context.multiply(a, decimal.Decimal((sign, digits, exponent - 2)))
+
+
+def _fraction_power(a: Fraction, b: Fraction) -> Fraction:
+    if b.denominator != 1:
+        raise OperationError("En modo fraction el exponente debe ser entero")
+    if (a.numerator.bit_length() + a.denominator.bit_length()) * abs(b.numerator) > MAX_FRACTION_POWER_BITS:
+        raise OperationError("El resultado es demasiado grande para el modo fraction")
+    return a ** b.numerator
+
+
+OPERATIONS: Dict[str, Operation] = {
+    operation.name: operation
+    for operation in (
+        Operation("add", "+", operator.add, decimal.Context.add, operator.add),
+        Operation("subtract", "-", operator.sub, decimal.Context.subtract, operator.sub),
+        Operation("multiply", "×", operator.mul, decimal.Context.multiply, operator.mul),
+        Operation(
+            "divide", "÷", operator.truediv, decimal.Context.divide, operator.truediv,
+            validate=_nonzero_divisor, vector_invalid=_zero_divisor_mask,
+        ),
+        Operation(
+            "power", "^", _power, decimal.Context.power, _fraction_power,
+            validate=_real_power, vector=_vector_power, vector_invalid=_complex_power_mask,
+        ),
+        Operation(
+            "modulo", "mod", operator.mod, _decimal_modulo, operator.mod,
+            validate=_nonzero_divisor, vector_invalid=_zero_divisor_mask,
+        ),
+        Operation(
+            "integer_divide", "div", operator.floordiv, _decimal_integer_divide, operator.floordiv,
+            validate=_nonzero_divisor, vector_invalid=_zero_divisor_mask,
+        ),
+        Operation("percentage", "% de", _percentage, _decimal_percentage, _percentage),
+    )
+}
+# Códigos enteros para las columnas del motor vectorizado, en orden de registro
+for _code, _operation in enumerate(OPERATIONS.values()):
+    _operation.code = _code
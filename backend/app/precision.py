@@ -0,0 +1,162 @@
+"""Aritmética exacta para `/calculate`: decimal.Decimal o fractions.Fraction.
+
+El modo float (por defecto) no pasa por este módulo. En los modos exactos
+los operandos se vuelven a leer del cuerpo JSON sin pasar por float, de
+modo que `0.1` es exactamente 0.1.
+"""
+import decimal
+import json
+import os
+from fractions import Fraction
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+from app.operations import OPERATIONS, OperationError
+
+DECIMAL = "decimal"
+FRACTION = "fraction"
+
+# Cifras máximas de `exact_result`: el límite de Python para convertir int a texto
+MAX_EXACT_DIGITS = 4300
+# log10(2): cifras decimales por bit
+_DIGITS_PER_BIT = 0.30103
+# Cifras enteras máximas del exponente de una potencia en modo fraction: con
+# más, el resultado pasa siempre de MAX_FRACTION_POWER_BITS
+MAX_POWER_EXPONENT_DIGITS = 7
+# Cifras máximas de un operando en modo fraction, exponente incluido: 1E+30000000
+# es un entero de treinta millones de cifras antes de operar
+MAX_FRACTION_OPERAND_DIGITS = 100_000
+
+ExactNumber = Union[decimal.Decimal, Fraction]
+
+
+@lru_cache(maxsize=32)
+def decimal_context(precision: int = 28, rounding: str = decimal.ROUND_HALF_EVEN) -> decimal.Context:
+    """Contexto compartido por cada combinación de precisión y redondeo."""
+    return decimal.Context(
+        prec=precision,
+        rounding=rounding,
+        traps=[decimal.InvalidOperation, decimal.DivisionByZero, decimal.Overflow],
+    )
+
+
+def default_decimal_context() -> decimal.Context:
+    return decimal_context(
+        int(os.environ.get("DECIMAL_PRECISION", "28")),
+        os.environ.get("DECIMAL_ROUNDING", decimal.ROUND_HALF_EVEN),
+    )
+
+
+def _to_decimal(value) -> decimal.Decimal:
+    # El cuerpo ya pasó la validación: número, cadena numérica o bool
+    if isinstance(value, str):
+        value = value.strip()
+    return decimal.Decimal(value)
+
+
+def _loads(body: bytes):
+    return json.loads(body, parse_float=decimal.Decimal, parse_int=decimal.Decimal)
+
+
+def parse_operands(body: bytes) -> Tuple[decimal.Decimal, decimal.Decimal]:
+    data = _loads(body)
+    return _to_decimal(data["a"]), _to_decimal(data["b"])
+
+
+def parse_batch_operands(body: bytes) -> list:
+    """(a, b) de cada elemento de un lote JSON, leídos como en `parse_operands`.
+
+    Los elementos que no son un objeto con `a` y `b` quedan como None; el
+    lote ya pasó por la validación, así que solo son las entradas con 422.
+    """
+    operands = []
+    for item in _loads(body):
+        try:
+            operands.append((_to_decimal(item["a"]), _to_decimal(item["b"])))
+        except (TypeError, KeyError, decimal.InvalidOperation):
+            operands.append(None)
+    return operands
+
+
+def exact_cost(
+    a: decimal.Decimal, b: decimal.Decimal, mode: str, context: decimal.Context, operation: Optional[str] = None
+) -> int:
+    """Cifras aproximadas que manejará la operación (para sacarla del event loop).
+
+    En modo fraction el exponente cuenta: 1E+100000 es un entero de 100001
+    cifras, y una potencia multiplica las cifras de la base por el exponente.
+    Un exponente de potencia demasiado largo o un operando de más de
+    MAX_FRACTION_OPERAND_DIGITS cifras se rechazan aquí (OperationError) sin
+    construir la Fraction, porque eso ya bloquearía el event loop.
+    """
+    if mode == FRACTION and operation == "power" and b.is_finite() and b.adjusted() >= MAX_POWER_EXPONENT_DIGITS:
+        raise OperationError("El resultado es demasiado grande para el modo fraction")
+    if mode == FRACTION:
+        for operand in (a, b):
+            size = abs(operand.adjusted()) + len(operand.as_tuple().digits) if operand.is_finite() else 0
+            if size > MAX_FRACTION_OPERAND_DIGITS:
+                raise OperationError(
+                    f"Los operandos del modo fraction no pueden superar {MAX_FRACTION_OPERAND_DIGITS} cifras"
+                )
+    cost = 0
+    for operand in (a, b):
+        _, digits, exponent = operand.as_tuple()
+        size = len(digits)
+        if mode == FRACTION and isinstance(exponent, int):
+            size += abs(exponent)
+        cost = max(cost, size)
+    if mode == FRACTION and operation == "power" and b.is_finite() and b == b.to_integral_value():
+        cost *= max(1, int(abs(b)))
+    return cost if mode == FRACTION else max(cost, context.prec)
+
+
+def compute_exact(
+    a: decimal.Decimal,
+    b: decimal.Decimal,
+    operation: str,
+    mode: str,
+    context: decimal.Context,
+) -> ExactNumber:
+    """Resultado exacto (Fraction) o redondeado según `context` (Decimal).
+
+    Lanza ZeroDivisionError u OperationError si la operación no está
+    definida para los operandos (o alguno no es finito) y decimal.Overflow
+    si el resultado no cabe en el contexto.
+    """
+    if not (a.is_finite() and b.is_finite()):
+        raise OperationError("Los modos exactos requieren operandos finitos")
+    spec = OPERATIONS[operation]
+    if spec.validate is not None:
+        spec.validate(a, b)
+    if mode == FRACTION:
+        return spec.fraction(Fraction(a), Fraction(b))
+    # Operandos exactos; solo el resultado se redondea al contexto
+    return spec.decimal(context, a, b)
+
+
+def exact_text(value: ExactNumber) -> str:
+    """Texto de `exact_result`; OperationError si pasa de MAX_EXACT_DIGITS cifras."""
+    if isinstance(value, Fraction):
+        bits = max(value.numerator.bit_length(), value.denominator.bit_length())
+        digits = int(bits * _DIGITS_PER_BIT) + 1
+    else:
+        digits = len(value.as_tuple().digits)
+    if digits > MAX_EXACT_DIGITS:
+        raise OperationError(f"El resultado exacto supera el máximo de {MAX_EXACT_DIGITS} cifras")
+    return str(value)
+
+
+def compute_exact_many(operations: list, context: decimal.Context) -> list:
+    """(float, exact_result) de cada (a, b, operation, mode) de un lote.
+
+    Un error de la operación ocupa su lugar en la lista en vez de cortar el
+    lote; así el lote entero puede calcularse en el ejecutor de una vez.
+    """
+    results = []
+    for a, b, operation, mode in operations:
+        try:
+            value = compute_exact(a, b, operation, mode, context)
+            results.append((float(value), exact_text(value)))
+        except (ZeroDivisionError, ArithmeticError, ValueError) as e:
+            results.append(e)
+    return results
@@ -0,0 +1,192 @@
+"""Control de admisión: límites por cliente con token buckets y tope global.
+
+Cada cliente tiene un cubo de `burst` fichas que se rellena a `rate` fichas/s; cada petición gasta el
+coste de su ruta (fijo o calculado, p.ej. /history según cuántos
+registros puede devolver). Sin fichas se responde 429 con Retry-After.
+
+El cliente es la IP salvo que la cabecera X-API-Key traiga una de las
+claves configuradas (RATE_LIMIT_API_KEYS): la API no autentica claves, así
+que una clave arbitraria permitiría estrenar cubo en cada petición y
+desalojar los de otros clientes.
+
+Los cubos están en memoria de cada proceso: con WEB_CONCURRENCY > 1 cada
+worker lleva su cuenta y el límite efectivo por cliente se multiplica por
+el número de workers (según a cuál reparta las conexiones uvicorn).
+
+Los cubos viven en un OrderedDict en orden de último uso: actualizar es
+O(1) y por delante quedan los inactivos. Un cubo sin uso durante
+burst/rate segundos está lleno, igual que uno nuevo, así que se puede
+descartar sin cambiar ningún resultado; además hay un máximo de claves.
+
+Aparte, `max_concurrency` limita las peticiones en curso: por encima se
+responde 503 al momento en vez de encolar y disparar la latencia de todas.
+"""
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Union
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.responses import FastJSONResponse
+
+Cost = Union[float, Callable[[Scope], float]]
+
+
+class TokenBuckets:
+    """Cubos de fichas por clave con memoria acotada."""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100_000):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate y burst deben ser mayores que cero")
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.idle_seconds = burst / rate
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, cost: float, now: Optional[float] = None) -> float:
+        """Gasta `cost` fichas; devuelve 0 si se admite o los segundos hasta poder hacerlo."""
+        now = time.monotonic() if now is None else now
+        # Un coste mayor que el cubo nunca se cumpliría: como mucho se exige el cubo lleno
+        cost = min(cost, self.burst)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = self.burst
+            bucket = self._buckets[key] = [tokens, now]
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            self._buckets.move_to_end(key)
+        if tokens >= cost:
+            tokens -= cost
+            wait = 0.0
+        else:
+            wait = (cost - tokens) / self.rate
+        bucket[0] = tokens
+        bucket[1] = now
+        self._evict(now)
+        return wait
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if len(buckets) <= self.max_keys and now - oldest[1] < self.idle_seconds:
+                break
+            buckets.popitem(last=False)
+
+
+def client_key(scope: Scope, api_keys: FrozenSet[str] = frozenset()) -> str:
+    if api_keys:
+        for name, value in scope["headers"]:
+            if name == b"x-api-key":
+                key = value.decode("latin-1")
+                if key in api_keys:
+                    return "key:" + key
+                break
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "desconocido")
+
+
+class AdmissionControl:
+    """Estado compartido del control de admisión: cubos, costes y contadores."""
+
+    def __init__(
+        self,
+        buckets: Optional[TokenBuckets] = None,
+        max_concurrency: Optional[int] = None,
+        costs: Optional[Dict[str, Cost]] = None,
+        exempt: Iterable[str] = ("/health", "/metrics"),
+        long_lived: Iterable[str] = ("/history/stream",),
+        api_keys: Iterable[str] = (),
+    ):
+        self.buckets = buckets
+        self.max_concurrency = max_concurrency
+        self.costs = dict(costs or {})
+        self.exempt = frozenset(exempt)
+        # Conexiones abiertas durante minutos (SSE): no ocupan plaza del tope global
+        self.long_lived = frozenset(long_lived)
+        # Solo estas claves X-API-Key tienen cubo propio; el resto cuenta por IP
+        self.api_keys = frozenset(api_keys)
+        self.active = 0
+        self.limited = 0
+        self.shed = 0
+
+    def cost(self, scope: Scope) -> float:
+        cost = self.costs.get(scope["path"], 1.0)
+        return cost(scope) if callable(cost) else cost
+
+    def stats(self) -> Dict:
+        return {
+            "rate": self.buckets.rate if self.buckets is not None else None,
+            "burst": self.buckets.burst if self.buckets is not None else None,
+            "clients": len(self.buckets) if self.buckets is not None else 0,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "limited": self.limited,
+            "shed": self.shed,
+        }
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica un AdmissionControl antes de enrutar."""
+
+    def __init__(self, app: ASGIApp, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        control = self.control
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in control.exempt:
+            await self.app(scope, receive, send)
+            return
+        if control.buckets is not None:
+            wait = control.buckets.take(client_key(scope, control.api_keys), control.cost(scope))
+            if wait > 0:
+                control.limited += 1
+                response = FastJSONResponse(
+                    {"detail": "Demasiadas peticiones, espere antes de reintentar"},
+                    status_code=429,
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+                await response(scope, receive, send)
+                return
+        if control.max_concurrency is None or path in control.long_lived:
+            await self.app(scope, receive, send)
+            return
+        if control.active >= control.max_concurrency:
+            control.shed += 1
+            response = FastJSONResponse(
+                {"detail": "Servidor ocupado, reintente en unos segundos"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        control.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            control.active -= 1
+
+
+def create_admission_control() -> Optional[AdmissionControl]:
+    """AdmissionControl según el entorno; None si no hay límite configurado."""
+    rate = float(os.environ.get("RATE_LIMIT_RATE", "0"))
+    max_concurrency = int(os.environ.get("MAX_CONCURRENT_REQUESTS", "0"))
+    if rate <= 0 and max_concurrency <= 0:
+        return None
+    buckets = None
+    if rate > 0:
+        buckets = TokenBuckets(
+            rate,
+            float(os.environ.get("RATE_LIMIT_BURST", str(rate * 2))),
+            max_keys=int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "100000")),
+        )
+    api_keys = [key.strip() for key in os.environ.get("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()]
+    return AdmissionControl(buckets, max_concurrency if max_concurrency > 0 else None, api_keys=api_keys)
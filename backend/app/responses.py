@@ -0,0 +1,52 @@
+"""Serialización JSON rápida con orjson (opcional, con respaldo en json).
+
+JSON no tiene ±inf ni NaN: orjson los escribe como null y el respaldo hace
+lo mismo en vez de emitir `Infinity`. Los endpoints de cálculo no los
+devuelven (un resultado fuera del rango de float es un 400); solo pueden
+aparecer en entradas importadas al historial.
+"""
+import json
+import math
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+def _finite(content: Any) -> Any:
+    if isinstance(content, float):
+        return content if math.isfinite(content) else None
+    if isinstance(content, dict):
+        return {key: _finite(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [_finite(value) for value in content]
+    return content
+
+
+def _json_dumps(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    try:
+        return _json_dumps(content)
+    except ValueError:
+        # Hay algún valor no finito: null, igual que orjson
+        return _json_dumps(_finite(content))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa con orjson cuando está instalado.
+
+    Los endpoints que devuelven datos internos ya validados la usan
+    directamente para evitar la revalidación contra `response_model`.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
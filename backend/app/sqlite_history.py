@@ -0,0 +1,392 @@
+"""Historial persistente en SQLite (modo WAL) con escrituras agrupadas.
+
+Las altas se encolan y un único hilo escritor las confirma en bloque cada
+`flush_interval_ms`, de modo que `/calculate` no espera al fsync. Las
+lecturas usan una conexión por hilo y ven todo lo confirmado por cualquier
+proceso que comparta el fichero.
+
+Un lote que no se puede confirmar se registra en el log y se descarta: el
+escritor sigue vivo y las esperas de `flush` se liberan igualmente. Las
+operaciones que esperan al escritor o leen el fichero bloquean, así que la
+API las ejecuta fuera del event loop (ver `HistoryBackend.blocking`).
+"""
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from app.history import HistoryBackend, HistoryRecord
+from app.stats import HistoryStats, RunningStats
+
+logger = logging.getLogger(__name__)
+
+# `result` admite NULL: SQLite guarda NaN como NULL (±inf sí se conserva)
+HISTORY_TABLE = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    result REAL,
+    operation TEXT NOT NULL,
+    operation_type TEXT,
+    timestamp TEXT NOT NULL
+);
+"""
+SCHEMA = HISTORY_TABLE + """
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp);
+CREATE INDEX IF NOT EXISTS idx_history_operation_type ON history(operation_type, id);
+CREATE TABLE IF NOT EXISTS history_rollups (
+    bucket INTEGER NOT NULL,
+    operation_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    minimum REAL NOT NULL,
+    maximum REAL NOT NULL,
+    total REAL NOT NULL,
+    non_finite INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, operation_type)
+);
+CREATE TABLE IF NOT EXISTS history_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Cubeta reservada en history_rollups para los totales desde el último clear
+TOTALS_BUCKET = -1
+UPSERT_ROLLUP_SQL = (
+    "INSERT OR REPLACE INTO history_rollups "
+    "(bucket, operation_type, count, mean, m2, minimum, maximum, total, non_finite) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+
+
+def _migrate(connection: sqlite3.Connection) -> None:
+    """Actualiza ficheros creados con un esquema anterior."""
+    connection.execute("BEGIN IMMEDIATE")
+    columns = {row[1]: row for row in connection.execute("PRAGMA table_info(history)")}
+    if columns["result"][3]:
+        # `result REAL NOT NULL`: se reconstruye la tabla conservando ids y la
+        # secuencia de AUTOINCREMENT, que RENAME traslada a history_legacy
+        connection.execute("ALTER TABLE history RENAME TO history_legacy")
+        connection.execute(HISTORY_TABLE)
+        connection.execute(
+            "INSERT INTO history (id, result, operation, operation_type, timestamp) "
+            "SELECT id, result, operation, operation_type, timestamp FROM history_legacy"
+        )
+        connection.execute("DELETE FROM sqlite_sequence WHERE name = 'history'")
+        connection.execute("UPDATE sqlite_sequence SET name = 'history' WHERE name = 'history_legacy'")
+        connection.execute("DROP TABLE history_legacy")
+    rollup_columns = {row[1] for row in connection.execute("PRAGMA table_info(history_rollups)")}
+    if "non_finite" not in rollup_columns:
+        connection.execute("ALTER TABLE history_rollups ADD COLUMN non_finite INTEGER NOT NULL DEFAULT 0")
+    connection.commit()
+
+
+INSERT_SQL = "INSERT INTO history (result, operation, operation_type, timestamp) VALUES (?, ?, ?, ?)"
+BUMP_VERSION_SQL = "UPDATE history_meta SET value = value + ? WHERE key = 'version'"
+
+
+class SQLiteHistory(HistoryBackend):
+    """Implementación de HistoryBackend sobre un fichero SQLite compartido."""
+
+    blocking = True
+
+    def __init__(
+        self,
+        path: str = "history.db",
+        flush_interval_ms: float = 50,
+        max_batch: int = 5000,
+        max_rows: Optional[int] = None,
+        bucket_seconds: int = 60,
+        max_buckets: int = 1440,
+        flush_timeout: float = 10,
+    ):
+        self.path = path
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_rows = max_rows
+        self.flush_timeout = flush_timeout
+        self._local = threading.local()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self.written = 0
+        self.flushes = 0
+        self.failed_batches = 0
+        self.dropped = 0
+
+        connection = self._connect()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(SCHEMA)
+        _migrate(connection)
+        # Los índices de una tabla reconstruida se crean de nuevo
+        connection.executescript(SCHEMA)
+        # Versión compartida por todos los procesos; empieza en la hora de
+        # creación (µs) para no repetir versiones si se borra el fichero
+        connection.execute(
+            "INSERT OR IGNORE INTO history_meta (key, value) VALUES ('version', ?)", (time.time_ns() // 1000,)
+        )
+        connection.commit()
+        # Registros según el último lote confirmado; lo mantiene el escritor
+        self._entries = self._count(connection)
+        connection.close()
+
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-history-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("PRAGMA busy_timeout=30000")
+        return connection
+
+    @property
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+        return connection
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            # Agrupa todo lo que llegue durante la ventana en una sola transacción;
+            # una petición de flush cierra la ventana antes de tiempo
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch and isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            rows = []
+            events = []
+            for entry in batch:
+                if entry is None:
+                    stop = True
+                elif isinstance(entry, threading.Event):
+                    events.append(entry)
+                else:
+                    rows.append(entry)
+            try:
+                if rows:
+                    self._write(connection, rows)
+            finally:
+                for event in events:
+                    event.set()
+            if stop:
+                break
+        connection.close()
+
+    def _write(self, connection: sqlite3.Connection, rows: list) -> None:
+        try:
+            self._commit(connection, rows)
+        except Exception as e:
+            try:
+                connection.rollback()
+            except sqlite3.Error:
+                pass
+            if isinstance(e, sqlite3.IntegrityError) and len(rows) > 1:
+                # Una fila inválida no arrastra al resto del lote: se reintentan de una en una
+                for row in rows:
+                    self._write(connection, [row])
+                return
+            # Un lote fallido no para el escritor: se descarta y se sigue
+            self.failed_batches += 1
+            self.dropped += len(rows)
+            logger.exception("No se pudo confirmar un lote de %d altas en %s", len(rows), self.path)
+
+    def _commit(self, connection: sqlite3.Connection, rows: list) -> None:
+        # BEGIN IMMEDIATE: la lectura y actualización de los rollups es
+        # atómica aunque otros procesos escriban en el mismo fichero
+        connection.execute("BEGIN IMMEDIATE")
+        connection.executemany(INSERT_SQL, [row[:4] for row in rows])
+        self._update_rollups(connection, rows)
+        connection.execute(BUMP_VERSION_SQL, (len(rows),))
+        if self.max_rows:
+            connection.execute(
+                "DELETE FROM history WHERE id <= (SELECT MAX(id) FROM history) - ?",
+                (self.max_rows,),
+            )
+        connection.commit()
+        self._entries = self._count(connection)
+        self.written += len(rows)
+        self.flushes += 1
+
+    @staticmethod
+    def _count(connection: sqlite3.Connection) -> int:
+        # Los ids son contiguos: solo se borra por el principio o todo a la vez
+        low, high = connection.execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+        return 0 if low is None else high - low + 1
+
+    def _update_rollups(self, connection: sqlite3.Connection, rows: list) -> None:
+        deltas: Dict[tuple, RunningStats] = {}
+        for result, _, operation_type, _, now in rows:
+            operation = operation_type or "unknown"
+            bucket = int(now // self.bucket_seconds) * self.bucket_seconds
+            for key in ((TOTALS_BUCKET, operation), (bucket, operation)):
+                stats = deltas.get(key)
+                if stats is None:
+                    stats = deltas[key] = RunningStats()
+                stats.add(result)
+        for (bucket, operation), delta in deltas.items():
+            current = connection.execute(
+                "SELECT count, mean, m2, minimum, maximum, total, non_finite FROM history_rollups "
+                "WHERE bucket = ? AND operation_type = ?",
+                (bucket, operation),
+            ).fetchone()
+            stats = RunningStats.from_values(*current) if current else RunningStats()
+            stats.merge(delta)
+            connection.execute(UPSERT_ROLLUP_SQL, (bucket, operation, *stats.values()))
+        oldest = max(bucket for bucket, _ in deltas) - self.max_buckets * self.bucket_seconds
+        connection.execute("DELETE FROM history_rollups WHERE bucket >= 0 AND bucket < ?", (oldest,))
+
+    @staticmethod
+    def _row(record: HistoryRecord, now: float):
+        return (record.result, record.operation, record.operation_type, record.timestamp, now)
+
+    def add_calculation(self, calculation) -> None:
+        if not isinstance(calculation, HistoryRecord):
+            calculation = HistoryRecord(calculation.result, calculation.operation, calculation.timestamp)
+        self._queue.put(self._row(calculation, time.time()))
+
+    def add_many(self, calculations: List[HistoryRecord]) -> None:
+        now = time.time()
+        for calculation in calculations:
+            self._queue.put(self._row(calculation, now))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que el escritor procese todo lo encolado hasta ahora.
+
+        Como mucho `timeout` segundos (por defecto `flush_timeout`); devuelve
+        False si no terminó a tiempo y se sigue con lo ya confirmado.
+        """
+        if self._closed:
+            return True
+        if not self._writer.is_alive():
+            return False
+        event = threading.Event()
+        self._queue.put(event)
+        if event.wait(self.flush_timeout if timeout is None else timeout):
+            return True
+        logger.warning("El escritor de %s no confirmó las altas pendientes a tiempo", self.path)
+        return False
+
+    @staticmethod
+    def _to_record(row) -> HistoryRecord:
+        record = HistoryRecord(math.nan if row[1] is None else row[1], row[2], row[4], operation_type=row[3])
+        record.seq = row[0]
+        return record
+
+    def get_history(self) -> List[HistoryRecord]:
+        return self.get_page()
+
+    def get_page(
+        self,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        operation_type: Optional[str] = None,
+        min_result: Optional[float] = None,
+        max_result: Optional[float] = None,
+    ) -> List[HistoryRecord]:
+        self.flush()
+        connection = self._reader
+        # Los límites de tiempo se filtran sobre la columna: con varios procesos
+        # el orden de los ids no sigue al de los timestamps
+        conditions = ["id > ?"]
+        params: list = [cursor or 0]
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("timestamp <= ?")
+            params.append(until)
+        if operation_type is not None:
+            conditions.append("operation_type = ?")
+            params.append(operation_type)
+        if min_result is not None:
+            conditions.append("result >= ?")
+            params.append(min_result)
+        if max_result is not None:
+            conditions.append("result <= ?")
+            params.append(max_result)
+        sql = (
+            "SELECT id, result, operation, operation_type, timestamp FROM history WHERE "
+            + " AND ".join(conditions)
+            + " ORDER BY id"
+        )
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._to_record(row) for row in connection.execute(sql, params)]
+
+    def clear_history(self) -> None:
+        self.flush()
+        connection = self._reader
+        connection.execute("DELETE FROM history")
+        connection.execute("DELETE FROM history_rollups")
+        connection.execute(BUMP_VERSION_SQL, (1,))
+        connection.commit()
+        self._entries = 0
+
+    def version(self) -> int:
+        self.flush()
+        return self._reader.execute("SELECT value FROM history_meta WHERE key = 'version'").fetchone()[0]
+
+    def get_stats(self, window_seconds: Optional[float] = None) -> Dict:
+        self.flush()
+        stats = HistoryStats(self.bucket_seconds, self.max_buckets)
+        sql = (
+            "SELECT bucket, operation_type, count, mean, m2, minimum, maximum, total, non_finite FROM history_rollups"
+        )
+        if window_seconds is None:
+            rows = self._reader.execute(sql + " WHERE bucket = ?", (TOTALS_BUCKET,))
+        else:
+            first = int((time.time() - window_seconds) // self.bucket_seconds) * self.bucket_seconds
+            rows = self._reader.execute(sql + " WHERE bucket >= ? ORDER BY bucket", (first,))
+        for bucket, operation, *values in rows:
+            stats.merge(operation, RunningStats.from_values(*values), None if window_seconds is None else bucket)
+        return stats.snapshot(window_seconds)
+
+    def memory_usage(self) -> Dict:
+        connection = self._reader
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        wal_path = self.path + "-wal"
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": self._count(connection),
+            "pending_writes": self._queue.qsize(),
+            "written": self.written,
+            "flushes": self.flushes,
+            "failed_batches": self.failed_batches,
+            "dropped_writes": self.dropped,
+            "database_bytes": page_count * page_size,
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        }
+
+    def entry_count(self) -> int:
+        # Sin consultar el fichero: lo que vio el escritor en su último lote
+        # (las altas de otros procesos llegan con el siguiente)
+        return self._entries
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
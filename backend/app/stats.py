@@ -0,0 +1,192 @@
+"""Agregados incrementales del historial (conteos, suma, min/max y Welford).
+
+Se actualizan en cada alta, así que consultarlos no recorre el historial.
+Además de los totales se mantienen cubetas temporales (rollups) para poder
+responder sobre ventanas de tiempo recientes.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class RunningStats:
+    """Media y varianza en línea (Welford) con mínimo, máximo y suma.
+
+    Los valores no finitos (±inf de un desbordamiento, NaN) cuentan en
+    `count` y en `non_finite`, pero no entran en los demás agregados: un
+    solo inf dejaría la media y la varianza en NaN hasta el siguiente clear.
+    """
+
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum", "total", "non_finite")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.total = 0.0
+        self.non_finite = 0
+
+    @classmethod
+    def from_values(cls, count, mean, m2, minimum, maximum, total, non_finite=0) -> "RunningStats":
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = count, mean, m2
+        stats.minimum, stats.maximum, stats.total = minimum, maximum, total
+        stats.non_finite = non_finite
+        return stats
+
+    def values(self):
+        return (self.count, self.mean, self.m2, self.minimum, self.maximum, self.total, self.non_finite)
+
+    @property
+    def finite(self) -> int:
+        return self.count - self.non_finite
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if not math.isfinite(value):
+            self.non_finite += 1
+            return
+        delta = value - self.mean
+        self.mean += delta / self.finite
+        self.m2 += delta * (value - self.mean)
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other: "RunningStats") -> None:
+        """Combina otro acumulado (algoritmo paralelo de Chan et al.)."""
+        finite, other_finite = self.finite, other.finite
+        self.count += other.count
+        self.non_finite += other.non_finite
+        if not other_finite:
+            return
+        if not finite:
+            self.mean, self.m2 = other.mean, other.m2
+            self.minimum, self.maximum, self.total = other.minimum, other.maximum, other.total
+            return
+        count = finite + other_finite
+        delta = other.mean - self.mean
+        self.mean += delta * other_finite / count
+        self.m2 += other.m2 + delta * delta * finite * other_finite / count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.finite - 1) if self.finite > 1 else 0.0
+
+    def to_dict(self) -> Dict:
+        if not self.finite:
+            return {
+                "count": self.count, "non_finite": self.non_finite, "sum": 0.0,
+                "mean": None, "variance": None, "stddev": None, "min": None, "max": None,
+            }
+        return {
+            "count": self.count,
+            "non_finite": self.non_finite,
+            "sum": self.total,
+            "mean": self.mean,
+            "variance": self.variance,
+            "stddev": math.sqrt(self.variance),
+            "min": self.minimum,
+            "max": self.maximum,
+        }
+
+
+class HistoryStats:
+    """Agregados por operación, totales y por cubeta de `bucket_seconds`.
+
+    Cubren todos los cálculos registrados desde el último `clear`, incluidos
+    los que el buffer circular ya haya descartado.
+    """
+
+    def __init__(self, bucket_seconds: int = 60, max_buckets: int = 1440):
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.clear()
+
+    def clear(self) -> None:
+        self.total = RunningStats()
+        self.by_operation: Dict[str, RunningStats] = {}
+        self.buckets: "OrderedDict[int, Dict[str, RunningStats]]" = OrderedDict()
+
+    def _stats_for(self, table: Dict[str, RunningStats], operation: str) -> RunningStats:
+        stats = table.get(operation)
+        if stats is None:
+            stats = table[operation] = RunningStats()
+        return stats
+
+    def _bucket(self, now: float) -> Dict[str, RunningStats]:
+        start = int(now // self.bucket_seconds) * self.bucket_seconds
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = {}
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+        return bucket
+
+    def add(self, result: float, operation_type: Optional[str], now: Optional[float] = None) -> None:
+        operation = operation_type or "unknown"
+        self.total.add(result)
+        self._stats_for(self.by_operation, operation).add(result)
+        bucket = self._bucket(time.time() if now is None else now)
+        self._stats_for(bucket, operation).add(result)
+
+    def merge(self, operation: str, stats: RunningStats, bucket_start: Optional[int] = None) -> None:
+        """Incorpora un acumulado ya calculado (p.ej. leído de SQLite)."""
+        self.total.merge(stats)
+        self._stats_for(self.by_operation, operation).merge(stats)
+        if bucket_start is not None:
+            self._stats_for(self._bucket(bucket_start), operation).merge(stats)
+
+    def to_state(self) -> Dict:
+        """Estado serializable en JSON (para los snapshots del historial)."""
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "total": self.total.values(),
+            "by_operation": {operation: stats.values() for operation, stats in self.by_operation.items()},
+            "buckets": [
+                [start, {operation: stats.values() for operation, stats in bucket.items()}]
+                for start, bucket in self.buckets.items()
+            ],
+        }
+
+    def load_state(self, state: Dict) -> None:
+        self.clear()
+        self.total = RunningStats.from_values(*state["total"])
+        self.by_operation = {
+            operation: RunningStats.from_values(*values) for operation, values in state["by_operation"].items()
+        }
+        if state["bucket_seconds"] == self.bucket_seconds:
+            for start, bucket in state["buckets"][-self.max_buckets:]:
+                self.buckets[start] = {
+                    operation: RunningStats.from_values(*values) for operation, values in bucket.items()
+                }
+
+    def snapshot(self, window_seconds: Optional[float] = None, now: Optional[float] = None) -> Dict:
+        if window_seconds is None:
+            total, by_operation = self.total, self.by_operation
+        else:
+            # Granularidad de cubeta: se incluye completa la cubeta que contiene el inicio
+            cutoff = (time.time() if now is None else now) - window_seconds
+            first = int(cutoff // self.bucket_seconds) * self.bucket_seconds
+            total = RunningStats()
+            by_operation = {}
+            for start in reversed(self.buckets):
+                if start < first:
+                    break
+                for operation, stats in self.buckets[start].items():
+                    total.merge(stats)
+                    self._stats_for(by_operation, operation).merge(stats)
+        return {
+            "window_seconds": window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "total": total.to_dict(),
+            "operations": {operation: stats.to_dict() for operation, stats in sorted(by_operation.items())},
+        }
@@ -0,0 +1,182 @@
+import asyncio
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import archive, main
+from app.history import CalculationHistory, HistoryRecord, local_timestamp
+
+client = TestClient(main.app)
+
+
+def fill(backend, count):
+    backend.add_many([
+        HistoryRecord(i / 3, f"{i} ÷ 3", f"2025-01-01T00:00:{i % 60:02d}", operation_type="divide" if i % 2 else None)
+        for i in range(count)
+    ])
+
+
+async def body(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+class TestArchive:
+    """Pruebas de exportación e importación del historial"""
+
+    @pytest.mark.parametrize("fmt", ["csv", "ndjson", "arrow"])
+    @pytest.mark.parametrize("encoding", [None, "gzip", "zstd"])
+    def test_round_trip(self, fmt, encoding):
+        """Prueba que exportar e importar conserva valores y tipos"""
+        if fmt == "arrow" and archive.pa is None:
+            pytest.skip("pyarrow no instalado")
+        if encoding == "zstd" and archive.zstandard is None:
+            pytest.skip("zstandard no instalado")
+        source = CalculationHistory(max_size=100)
+        fill(source, 25)
+        exported = list(archive.export_history(source, fmt, encoding, chunk_rows=10))
+        # Partido en trozos pequeños para probar las líneas cortadas entre bloques
+        data = b"".join(exported)
+        pieces = [data[i:i + 7] for i in range(0, len(data), 7)]
+
+        target = CalculationHistory(max_size=100)
+        imported = asyncio.run(archive.import_history(target, body(*pieces), fmt, encoding, chunk_rows=10))
+        assert imported == 25
+        fields = ("result", "operation", "operation_type", "timestamp")
+        original = [tuple(getattr(r, f) for f in fields) for r in source.get_history()]
+        assert [tuple(getattr(r, f) for f in fields) for r in target.get_history()] == original
+
+    def test_ndjson_non_finite_results(self):
+        """Prueba que inf, -inf y NaN sobreviven a exportar e importar en NDJSON"""
+        source = CalculationHistory(max_size=10)
+        source.add_many([
+            HistoryRecord(value, "1e308 × 10", f"2025-01-01T00:00:0{i}", operation_type="multiply")
+            for i, value in enumerate((float("inf"), float("-inf"), float("nan"), 1.5))
+        ])
+        data = b"".join(archive.export_history(source, "ndjson", None))
+        assert json.loads(data.splitlines()[0])["result"] == "inf"
+
+        target = CalculationHistory(max_size=10)
+        assert asyncio.run(archive.import_history(target, body(data), "ndjson", None)) == 4
+        assert [repr(r.result) for r in target.get_history()] == ["inf", "-inf", "nan", "1.5"]
+
+    def test_negotiate_encoding(self):
+        """Prueba la negociación de Accept-Encoding"""
+        assert archive.negotiate_encoding(None) is None
+        assert archive.negotiate_encoding("gzip, deflate") == "gzip"
+        assert archive.negotiate_encoding("gzip;q=0.5, zstd") in ("zstd", "gzip")
+        assert archive.negotiate_encoding("br, gzip;q=0") is None
+
+    def test_invalid_rows(self):
+        """Prueba el error por fila inválida"""
+        with pytest.raises(archive.ArchiveError):
+            asyncio.run(archive.import_history(
+                CalculationHistory(), body(b"id,result\n1,x\n"), "csv"
+            ))
+
+    @pytest.mark.parametrize("timestamp", ["garbage", "", "2025-13-01T00:00:00"])
+    def test_invalid_timestamp(self, timestamp):
+        """Prueba que un timestamp que no es ISO 8601 rechaza la fila"""
+        line = json.dumps({"result": 1, "operation": "1 + 0", "timestamp": timestamp}).encode()
+        with pytest.raises(archive.ArchiveError, match="Fila 1"):
+            asyncio.run(archive.import_history(CalculationHistory(), body(line), "ndjson"))
+
+    def test_unknown_operation_type(self):
+        """Prueba que un operation_type fuera de OPERATIONS rechaza la fila"""
+        target = CalculationHistory()
+        line = json.dumps({"result": 1, "operation": "x", "timestamp": "2025-01-01T00:00:00", "operation_type": "op0"})
+        with pytest.raises(archive.ArchiveError, match="Fila 1.*op0"):
+            asyncio.run(archive.import_history(target, body(line.encode()), "ndjson"))
+        assert target.get_stats()["operations"] == {}
+
+    def test_normalized_timestamps(self):
+        """Prueba que los timestamps con zona se guardan en hora local sin zona"""
+        target = CalculationHistory()
+        lines = [
+            {"result": 1, "operation": "a", "timestamp": "2025-01-01T00:00:00Z"},
+            {"result": 2, "operation": "b", "timestamp": "2025-01-01T03:00:00+02:00"},
+        ]
+        data = b"\n".join(json.dumps(line).encode() for line in lines)
+        assert asyncio.run(archive.import_history(target, body(data), "ndjson")) == 2
+        expected = [
+            local_timestamp(datetime(2025, 1, 1, tzinfo=timezone.utc)),
+            local_timestamp(datetime(2025, 1, 1, 1, tzinfo=timezone.utc)),
+        ]
+        assert [r.timestamp for r in target.get_history()] == expected
+
+    def test_out_of_order_rows(self):
+        """Prueba que se importan filas desordenadas y anteriores al historial, y se filtran por tiempo"""
+        target = CalculationHistory()
+        target.add_calculation(HistoryRecord(0.0, "x", "2026-01-01T00:00:00"))
+        data = b"result,operation,timestamp\n1,a,2025-01-01T00:00:02\n2,b,2025-01-01T00:00:01\n"
+        assert asyncio.run(archive.import_history(target, body(data), "csv")) == 2
+        assert [r.result for r in target.get_page(until="2025-12-31")] == [1, 2]
+        assert [r.result for r in target.get_page(since="2025-01-01T00:00:02")] == [0.0, 1]
+
+    def test_invalid_row_imports_nothing(self):
+        """Prueba que una fila inválida tras varios lotes no deja filas importadas"""
+        target = CalculationHistory()
+        rows = "".join(f"{i},a,2025-01-01T00:00:{i:02d}\n" for i in range(5))
+        data = f"result,operation,timestamp\n{rows}x,b,2025-01-01T00:01:00\n".encode()
+        with pytest.raises(archive.ArchiveError, match="Fila 7"):
+            asyncio.run(archive.import_history(target, body(data), "csv", chunk_rows=2))
+        assert target.get_history() == []
+
+
+class TestArchiveEndpoints:
+    """Pruebas de /history/export y /history/import"""
+
+    def setup_method(self):
+        client.delete("/history")
+        for a in (1, 2, 3):
+            client.post("/calculate", json={"a": a, "b": 4, "operation": "divide"})
+
+    def test_export_csv_gzip(self):
+        """Prueba la exportación CSV comprimida con gzip"""
+        response = client.get("/history/export", params={"format": "csv"}, headers={"Accept-Encoding": "gzip"})
+        assert response.status_code == 200
+        assert response.headers["content-encoding"] == "gzip"
+        lines = response.text.strip().split("\n")
+        assert lines[0] == "id,result,operation,operation_type,timestamp"
+        assert lines[1].split(",")[1:4] == ["0.25", "1.0 ÷ 4.0", "divide"]
+
+    def test_export_then_import(self):
+        """Prueba que un archivo exportado se vuelve a cargar"""
+        exported = client.get("/history/export", params={"format": "ndjson"}, headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in exported.headers
+        client.delete("/history")
+        response = client.post(
+            "/history/import",
+            params={"format": "ndjson"},
+            content=gzip.compress(exported.content),
+            headers={"Content-Encoding": "gzip"},
+        )
+        assert response.json() == {"imported": 3}
+        assert [item["result"] for item in client.get("/history").json()] == [0.25, 0.5, 0.75]
+        assert json.loads(exported.text.split("\n")[0])["operation_type"] == "divide"
+
+    def test_import_errors(self):
+        """Prueba los 400 de la importación"""
+        response = client.post("/history/import", params={"format": "ndjson"}, content=b"[1, 2]\n")
+        assert response.status_code == 400
+        response = client.post("/history/import", content=b"x", headers={"Content-Encoding": "br"})
+        assert response.status_code == 400
+        response = client.post("/history/import", content=b"result,operation,timestamp\n1,\xff,2030-01-01\n")
+        assert response.status_code == 400
+        assert "Fila 2" in response.json()["detail"]
+        response = client.post(
+            "/history/import", content=b"result,operation,timestamp,operation_type\n1,a,2030-01-01,op0\n"
+        )
+        assert response.status_code == 400
+        assert "op0" in response.json()["detail"]
+
+    def test_restore_into_running_history(self):
+        """Prueba que un archivo se restaura aunque el historial tenga entradas más recientes"""
+        exported = client.get("/history/export", params={"format": "ndjson"}, headers={"Accept-Encoding": "identity"})
+        client.post("/calculate", json={"a": 1, "b": 1, "operation": "add"})
+        response = client.post("/history/import", params={"format": "ndjson"}, content=exported.content)
+        assert response.json() == {"imported": 3}
+        assert len(client.get("/history").json()) == 7
@@ -0,0 +1,119 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import app
+
+client = TestClient(app)
+
+
+class TestBatchCalculation:
+    """Pruebas del endpoint de cálculo por lotes"""
+
+    def setup_method(self):
+        client.delete("/history")
+
+    def test_batch_results_in_order(self):
+        """Prueba que el lote devuelve un resultado por operación, en orden"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 1, "b": 2, "operation": "add"},
+            {"a": 6, "b": 7, "operation": "multiply"},
+            {"a": 20, "b": 4, "operation": "divide"},
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["result"] for item in data["results"]] == [3, 42, 5]
+        assert data["succeeded"] == 3
+        assert data["failed"] == 0
+
+    def test_division_by_zero_fails_only_its_item(self):
+        """Prueba que la división por cero solo falla su propia entrada"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 10, "b": 0, "operation": "divide"},
+            {"a": 15, "b": 7, "operation": "subtract"},
+        ])
+        data = response.json()
+        assert data["results"][0]["status_code"] == 400
+        assert "No se puede dividir por cero" in data["results"][0]["error"]
+        assert data["results"][1]["result"] == 8
+        assert data["failed"] == 1
+
+    def test_batch_appends_to_history(self):
+        """Prueba que los resultados exitosos se guardan en el historial"""
+        client.post("/calculate/batch", json=[
+            {"a": 1, "b": 1, "operation": "add"},
+            {"a": 1, "b": 0, "operation": "divide"},
+            {"a": 2, "b": 2, "operation": "add"},
+        ])
+        history = client.get("/history").json()
+        assert [item["result"] for item in history] == [2, 4]
+
+    def test_ndjson_batch(self):
+        """Prueba el lote en formato NDJSON con una línea inválida"""
+        body = "\n".join([
+            json.dumps({"a": 1, "b": 2, "operation": "add"}),
+            json.dumps({"a": 1, "operation": "add"}),
+            json.dumps({"a": 3, "b": 4, "operation": "multiply"}),
+        ])
+        response = client.post(
+            "/calculate/batch/ndjson",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        data = response.json()
+        assert [item["status_code"] for item in data["results"]] == [200, 422, 200]
+        assert data["results"][2]["result"] == 12
+
+    def test_invalid_item_fails_only_its_entry(self):
+        """Prueba que un elemento inválido da 422 solo en su propia entrada"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 1, "b": 2, "operation": "sqrt"},
+            {"a": 3, "b": 4, "operation": "add"},
+            {"a": 1},
+            "x",
+        ])
+        assert response.status_code == 200
+        data = response.json()
+        assert [item["status_code"] for item in data["results"]] == [422, 200, 422, 422]
+        assert data["results"][1]["result"] == 7
+        assert data["succeeded"] == 1 and data["failed"] == 3
+
+    def test_body_must_be_json_array(self):
+        """Prueba los 422 de un cuerpo que no es un array JSON"""
+        assert client.post("/calculate/batch", json={"a": 1}).json()["detail"][0]["type"] == "list_type"
+        response = client.post("/calculate/batch", content=b"[1,", headers={"content-type": "application/json"})
+        assert response.json()["detail"][0]["type"] == "json_invalid"
+        response = client.post("/calculate/batch", content=b"[]", headers={"content-type": "text/plain"})
+        assert response.status_code == 422
+
+    def test_oversized_batch_skips_validation(self, monkeypatch):
+        """Prueba que un lote demasiado grande da 413 sin validar sus elementos"""
+        validated = []
+        monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+        monkeypatch.setattr(main, "parse_batch_item", validated.append)
+        response = client.post("/calculate/batch", json=[{"a": 1, "b": 2, "operation": "add"}] * 3)
+        assert response.status_code == 413
+        assert validated == []
+
+    def test_ndjson_limits(self, monkeypatch):
+        """Prueba los 413 por línea NDJSON o cuerpo demasiado grandes"""
+        line = json.dumps({"a": 1, "b": 2, "operation": "add"}).encode()
+        monkeypatch.setattr(main, "MAX_BATCH_LINE_BYTES", len(line))
+        monkeypatch.setattr(main, "MAX_BATCH_BODY_BYTES", 10 * (len(line) + 1))
+
+        def chunks(*parts):
+            yield from parts
+
+        # Líneas partidas entre trozos, sin salto de línea final
+        body = chunks(line[:5], line[5:] + b"\n" + line[:3], line[3:])
+        response = client.post("/calculate/batch/ndjson", content=body)
+        assert [item["status_code"] for item in response.json()["results"]] == [200, 200]
+        response = client.post("/calculate/batch/ndjson", content=chunks(b"1" * (len(line) + 1)))
+        assert response.status_code == 413
+        assert "línea" in response.json()["detail"]
+        response = client.post("/calculate/batch/ndjson", content=chunks(b" " * len(line) + b"1\n"))
+        assert response.status_code == 413
+        response = client.post("/calculate/batch/ndjson", content=chunks(*[line + b"\n"] * 11))
+        assert response.status_code == 413
+        assert "cuerpo" in response.json()["detail"]
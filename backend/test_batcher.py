@@ -0,0 +1,199 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.batcher import MicroBatcher
+from app.cache import ResultCache
+
+client = TestClient(main.app)
+
+
+def recording_handler(calls, counts=None):
+    def handler(items, item_counts):
+        calls.append(list(items))
+        if counts is not None:
+            counts.append(list(item_counts))
+        return [item * 2 for item in items]
+    return handler
+
+
+class TestMicroBatcher:
+    """Pruebas del micro-batcher asyncio"""
+
+    def test_groups_concurrent_calls(self):
+        """Prueba que las llamadas dentro de la ventana forman un solo lote"""
+        calls = []
+        batcher = MicroBatcher(recording_handler(calls), window_ms=5)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(None, i) for i in range(10)))
+
+        assert asyncio.run(run()) == [i * 2 for i in range(10)]
+        assert calls == [list(range(10))]
+        assert batcher.stats()["batches"] == 1
+
+    def test_max_items(self):
+        """Prueba que el lote se procesa al llegar a max_items"""
+        calls = []
+        batcher = MicroBatcher(recording_handler(calls), window_ms=1000, max_items=4)
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(*(batcher.submit(None, i) for i in range(8))), 0.5)
+
+        assert asyncio.run(run()) == [i * 2 for i in range(8)]
+        assert calls == [[0, 1, 2, 3], [4, 5, 6, 7]]
+
+    def test_zero_window(self):
+        """Prueba que con ventana 0 se agrupa lo llegado en la misma vuelta del loop"""
+        calls = []
+        batcher = MicroBatcher(recording_handler(calls), window_ms=0)
+
+        async def run():
+            first = await asyncio.gather(*(batcher.submit(None, i) for i in range(3)))
+            second = await batcher.submit(None, 7)
+            return first, second
+
+        assert asyncio.run(run()) == ([0, 2, 4], 14)
+        assert calls == [[0, 1, 2], [7]]
+
+    def test_coalescing(self):
+        """Prueba que las claves repetidas comparten un único elemento del lote"""
+        calls, counts = [], []
+        batcher = MicroBatcher(recording_handler(calls, counts), window_ms=5)
+
+        async def run():
+            return await asyncio.gather(
+                batcher.submit("x", 1), batcher.submit("x", 1), batcher.submit(None, 1), batcher.submit("y", 3)
+            )
+
+        assert asyncio.run(run()) == [2, 2, 2, 6]
+        assert calls == [[1, 1, 3]]
+        assert counts == [[2, 1, 1]]
+        assert batcher.stats()["coalesced"] == 1
+
+    def test_errors_per_item(self):
+        """Prueba que una excepción solo llega a su llamante"""
+        def handler(items, counts):
+            return [ValueError("malo") if item < 0 else item for item in items]
+
+        batcher = MicroBatcher(handler, window_ms=1)
+
+        async def run():
+            return await asyncio.gather(batcher.submit(None, 1), batcher.submit(None, -1), return_exceptions=True)
+
+        ok, error = asyncio.run(run())
+        assert ok == 1
+        assert isinstance(error, ValueError)
+
+    def test_handler_failure(self):
+        """Prueba que un fallo del handler llega a todo el lote"""
+        def handler(items, counts):
+            raise RuntimeError("caído")
+
+        batcher = MicroBatcher(handler, window_ms=1)
+
+        async def run():
+            return await asyncio.gather(batcher.submit(None, 1), batcher.submit(None, 2), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+    def test_cancelled_caller_does_not_cancel_peers(self):
+        """Prueba que cancelar un llamante no cancela a quien comparte su resultado"""
+        counts = []
+        batcher = MicroBatcher(recording_handler([], counts), window_ms=20)
+
+        async def run():
+            first = asyncio.ensure_future(batcher.submit("k", 5))
+            second = asyncio.ensure_future(batcher.submit("k", 5))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(run()) == 10
+        # El llamante cancelado antes del lote ya no cuenta
+        assert counts == [[1]]
+
+    def test_invalid_max_items(self):
+        """Prueba que max_items debe ser positivo"""
+        with pytest.raises(ValueError):
+            MicroBatcher(lambda items, counts: items, max_items=0)
+
+
+class TestBatchedCalculate:
+    """Pruebas de /calculate con el micro-batcher activado"""
+
+    def setup_method(self):
+        client.delete("/history")
+
+    @pytest.fixture(autouse=True)
+    def batcher(self, monkeypatch):
+        batcher = MicroBatcher(main.calculate_many, window_ms=50)
+        monkeypatch.setattr(main, "calculation_batcher", batcher)
+        return batcher
+
+    def post_concurrently(self, payloads):
+        async def run():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*(async_client.post("/calculate", json=payload) for payload in payloads))
+
+        return asyncio.run(run())
+
+    def test_concurrent_requests(self, batcher):
+        """Prueba que las peticiones concurrentes se resuelven en un lote"""
+        payloads = [{"a": i, "b": 2, "operation": "multiply"} for i in range(1, 21)]
+        responses = self.post_concurrently(payloads)
+        assert [response.json()["result"] for response in responses] == [i * 2 for i in range(1, 21)]
+        assert responses[0].json()["operation"] == "1.0 × 2.0"
+        assert batcher.stats()["batches"] == 1
+        history = client.get("/history").json()
+        assert [item["result"] for item in history] == [i * 2 for i in range(1, 21)]
+
+    def test_identical_requests_coalesce(self, batcher):
+        """Prueba que peticiones idénticas en vuelo comparten el cálculo pero no la entrada de historial"""
+        responses = self.post_concurrently([{"a": 1, "b": 3, "operation": "divide"}] * 5)
+        assert {response.json()["result"] for response in responses} == {0.333333}
+        assert len({response.json()["timestamp"] for response in responses}) == 1
+        assert batcher.stats()["coalesced"] == 4
+        assert len(client.get("/history").json()) == 5
+        assert client.get("/history/stats").json()["total"]["count"] == 5
+
+    def test_division_by_zero(self):
+        """Prueba el 400 de una división por cero dentro del lote"""
+        responses = self.post_concurrently([
+            {"a": 1, "b": 0, "operation": "divide"},
+            {"a": 1, "b": 1, "operation": "add"},
+        ])
+        assert responses[0].status_code == 400
+        assert responses[0].json()["detail"] == "No se puede dividir por cero"
+        assert responses[1].json()["result"] == 2
+
+    def test_uses_result_cache(self, monkeypatch):
+        """Prueba que los lotes consultan y llenan la caché de resultados"""
+        monkeypatch.setattr(main, "result_cache", ResultCache(max_size=16))
+        payloads = [{"a": 1, "b": 3, "operation": "divide"}] * 3 + [{"a": 2, "b": 3, "operation": "add"}]
+        self.post_concurrently(payloads)
+        stats = client.get("/cache/stats").json()
+        assert (stats["hits"], stats["misses"], stats["size"]) == (0, 2, 2)
+        responses = self.post_concurrently(payloads)
+        assert [response.json()["result"] for response in responses] == [0.333333] * 3 + [5]
+        assert responses[0].json()["operation"] == "1.0 ÷ 3.0"
+        stats = client.get("/cache/stats").json()
+        assert (stats["hits"], stats["misses"]) == (2, 2)
+        assert len(client.get("/history").json()) == 8
+
+    def test_exact_precision_bypasses_batcher(self, batcher):
+        """Prueba que los modos exactos no pasan por el batcher"""
+        response = client.post("/calculate", json={"a": 0.1, "b": 0.2, "operation": "add", "precision": "decimal"})
+        assert response.json()["exact_result"] == "0.3"
+        assert batcher.stats()["submitted"] == 0
+
+    def test_stats_endpoint(self):
+        """Prueba GET /calculate/batcher"""
+        client.post("/calculate", json={"a": 1, "b": 1, "operation": "add"})
+        data = client.get("/calculate/batcher").json()
+        assert data["enabled"] is True
+        assert data["submitted"] == 1
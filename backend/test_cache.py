@@ -0,0 +1,75 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.cache import ResultCache
+
+client = TestClient(main.app)
+
+
+class TestResultCache:
+    """Pruebas de la caché LRU de resultados"""
+
+    def test_lru_eviction(self):
+        """Prueba que se desaloja la entrada usada hace más tiempo"""
+        cache = ResultCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.evictions == 1
+
+    def test_ttl_expiration(self):
+        """Prueba que una entrada vencida cuenta como fallo"""
+        cache = ResultCache(max_size=2, ttl_seconds=0.01)
+        cache.put("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+
+    def test_hit_rate(self):
+        """Prueba los contadores de aciertos y fallos"""
+        cache = ResultCache(max_size=4)
+        cache.get("a")
+        cache.put("a", 1)
+        cache.get("a")
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+class TestCalculateWithCache:
+    """Pruebas de /calculate con la caché activada"""
+
+    def setup_method(self):
+        self.previous = main.result_cache
+        main.result_cache = ResultCache(max_size=16)
+        client.delete("/history")
+
+    def teardown_method(self):
+        main.result_cache = self.previous
+
+    def test_hit_records_history_with_fresh_timestamp(self):
+        """Prueba que un acierto registra historial con timestamp nuevo"""
+        payload = {"a": 15.5, "b": 10.2, "operation": "add"}
+        first = client.post("/calculate", json=payload).json()
+        time.sleep(0.001)
+        second = client.post("/calculate", json=payload).json()
+        assert first["result"] == second["result"] == 25.7
+        assert second["timestamp"] > first["timestamp"]
+        assert len(client.get("/history").json()) == 2
+        stats = client.get("/cache/stats").json()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_division_by_zero_not_cached(self):
+        """Prueba que los errores no se guardan en caché"""
+        response = client.post("/calculate", json={"a": 1, "b": 0, "operation": "divide"})
+        assert response.status_code == 400
+        assert client.get("/cache/stats").json()["size"] == 0
+
+    def test_disabled_by_default(self):
+        """Prueba que sin configuración la caché está desactivada"""
+        main.result_cache = None
+        assert client.get("/cache/stats").json() == {"enabled": False}
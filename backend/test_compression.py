@@ -0,0 +1,68 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import compression
+from app.main import app
+
+client = TestClient(app)
+
+
+class TestNegotiation:
+    """Pruebas de la negociación de Accept-Encoding"""
+
+    def test_quality_values(self):
+        """Prueba que se respeta q y el orden de preferencia"""
+        assert compression.negotiate("gzip, br", ["br", "gzip"]) == "br"
+        assert compression.negotiate("br;q=0.5, gzip", ["br", "gzip"]) == "gzip"
+        assert compression.negotiate("gzip;q=0", ["gzip"]) is None
+        assert compression.negotiate("*", ["gzip"]) == "gzip"
+        assert compression.negotiate(None, ["gzip"]) is None
+
+
+class TestCompressionMiddleware:
+    """Pruebas de la compresión de respuestas"""
+
+    def setup_method(self):
+        client.delete("/history")
+        client.post("/calculate/batch", json=[{"a": i, "b": 1, "operation": "add"} for i in range(200)])
+
+    def test_large_response_gzip(self):
+        """Prueba que /history grande se comprime con gzip"""
+        response = client.get("/history", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()) == 200
+
+    def test_small_response_not_compressed(self):
+        """Prueba que las respuestas por debajo del umbral no se comprimen"""
+        response = client.get("/history", params={"limit": 1}, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in response.headers
+
+    def test_identity(self):
+        """Prueba que sin Accept-Encoding no se comprime"""
+        response = client.get("/history", headers={"Accept-Encoding": "identity"})
+        assert "content-encoding" not in response.headers
+
+    def test_encoded_export_untouched(self):
+        """Prueba que la exportación ya comprimida no se comprime dos veces"""
+        response = client.get(
+            "/history/export", params={"format": "csv"}, headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.text.startswith("id,result")
+
+    def test_brotli(self):
+        """Prueba la compresión Brotli cuando el paquete está instalado"""
+        brotli = pytest.importorskip("brotli")
+        response = client.get("/history", headers={"Accept-Encoding": "br"})
+        assert response.headers["content-encoding"] == "br"
+        assert len(response.json()) == 200
+        assert brotli is compression.brotli
+
+    def test_gzip_body(self):
+        """Prueba que el cuerpo comprimido es gzip válido"""
+        with client.stream("GET", "/history", headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join(response.iter_raw())
+        assert gzip.decompress(raw).startswith(b"[")
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from fastapi.exceptions import RequestValidationError
+from fastapi.testclient import TestClient
+
+from app.decoding import CalculationDecoder, FastCalculationRequest
+from app.main import CalculationRequest, OperationType, PrecisionMode, app
+
+client = TestClient(app)
+
+BODIES = [
+    {"a": 10.5, "b": 5.2, "operation": "add"},
+    {"a": 15, "b": 7, "operation": "subtract"},
+    {"a": -1e-9, "b": 3, "operation": "divide", "extra": True},
+    {"a": "5", "b": 2, "operation": "multiply"},
+    {"a": True, "b": 2, "operation": "add"},
+]
+
+
+@pytest.fixture(params=["msgspec", "json"])
+def decoder(request):
+    decoder = CalculationDecoder(
+        CalculationRequest, {op.value: op for op in OperationType}, {mode.value: mode for mode in PrecisionMode}
+    )
+    if request.param == "json":
+        decoder._msgspec_decoder = None
+    return decoder
+
+
+class TestCalculationDecoder:
+    """Pruebas del decodificador ligero de peticiones"""
+
+    @pytest.mark.parametrize("body", BODIES)
+    def test_matches_pydantic(self, decoder, body):
+        """Prueba que el resultado coincide con la validación pydantic"""
+        raw = json.dumps(body).encode()
+        decoded = decoder.decode(raw)
+        expected = CalculationRequest.model_validate_json(raw)
+        assert (decoded.a, decoded.b, decoded.operation) == (expected.a, expected.b, expected.operation)
+        assert type(decoded.a) is float
+        assert isinstance(decoded.operation, OperationType)
+
+    def test_valid_body_skips_pydantic(self, decoder):
+        """Prueba que una petición válida usa el objeto ligero"""
+        decoded = decoder.decode(b'{"a": 1, "b": 2, "operation": "add"}')
+        assert isinstance(decoded, FastCalculationRequest)
+
+    def test_precision_field(self, decoder):
+        """Prueba que el modo de precisión se decodifica en la ruta rápida"""
+        decoded = decoder.decode(b'{"a": 1, "b": 2, "operation": "add", "precision": "decimal"}')
+        assert isinstance(decoded, FastCalculationRequest)
+        assert decoded.precision is PrecisionMode.DECIMAL
+        assert decoder.decode(b'{"a": 1, "b": 2, "operation": "add"}').precision is None
+
+    def test_invalid_body_raises_validation_error(self, decoder):
+        """Prueba que los errores son los de pydantic con loc en body"""
+        with pytest.raises(RequestValidationError) as info:
+            decoder.decode(b'{"a": 1, "operation": "add"}')
+        assert info.value.errors()[0]["loc"] == ("body", "b")
+
+
+class TestCalculateValidationErrors:
+    """Pruebas de los errores 422 de /calculate"""
+
+    def test_missing_field_detail(self):
+        """Prueba la forma del detalle de validación"""
+        response = client.post("/calculate", json={"a": 10, "operation": "add"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "b"]
+
+    def test_invalid_operation_detail(self):
+        """Prueba una operación fuera del enum"""
+        response = client.post("/calculate", json={"a": 10, "b": 1, "operation": "sqrt"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "operation"]
+
+    @pytest.mark.parametrize("content_type", ["text/plain", "application/x-www-form-urlencoded", None])
+    def test_requires_json_content_type(self, content_type):
+        """Prueba que un cuerpo sin Content-Type JSON da el mismo 422 que FastAPI"""
+        body = b'{"a": 1, "b": 2, "operation": "add"}'
+        headers = {} if content_type is None else {"content-type": content_type}
+        response = client.post("/calculate", content=body, headers=headers)
+        assert response.status_code == 422
+        assert response.json()["detail"] == [{
+            "type": "model_attributes_type",
+            "loc": ["body"],
+            "msg": "Input should be a valid dictionary or object to extract fields from",
+            "input": body.decode(),
+        }]
+
+    @pytest.mark.parametrize("content_type", ["application/json; charset=utf-8", "application/vnd.api+json"])
+    def test_json_content_types(self, content_type):
+        """Prueba que se aceptan los Content-Type JSON con parámetros o sufijo +json"""
+        response = client.post(
+            "/calculate", content=b'{"a": 1, "b": 2, "operation": "add"}', headers={"content-type": content_type}
+        )
+        assert response.status_code == 200
+
+    def test_empty_body(self):
+        """Prueba el 422 de campo requerido con el cuerpo vacío"""
+        response = client.post("/calculate", content=b"", headers={"content-type": "application/json"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == "missing"
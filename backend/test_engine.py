@@ -0,0 +1,62 @@
+import random
+import struct
+
+import pytest
+from fastapi import HTTPException
+
+from app import engine
+from app.main import CalculationRequest, OperationType, compute
+
+pytestmark = pytest.mark.skipif(not engine.HAS_NUMPY, reason="NumPy no disponible")
+
+
+def bits(value):
+    return struct.pack("<d", value)
+
+
+def scalar(a, b, operation):
+    try:
+        result, _ = compute(a, b, operation)
+    except HTTPException:
+        return None
+    return round(result, 6)
+
+
+class TestVectorizedEngine:
+    """Pruebas del motor vectorizado frente a la ruta escalar"""
+
+    def test_matches_scalar_path_bit_for_bit(self):
+        """Prueba que los resultados coinciden bit a bit con la ruta escalar"""
+        rng = random.Random(7)
+        operations = list(OperationType)
+        requests = []
+        for _ in range(20000):
+            scale = 10 ** rng.randint(-8, 12)
+            requests.append(CalculationRequest(
+                a=rng.uniform(-1, 1) * scale,
+                b=rng.choice([0.0, rng.uniform(-1, 1) * scale]),
+                operation=rng.choice(operations),
+            ))
+        vectorized = engine.evaluate_requests(requests)
+        for request, value in zip(requests, vectorized):
+            expected = scalar(request.a, request.b, request.operation)
+            if expected is None:
+                assert value is None
+            else:
+                assert bits(value) == bits(expected), (request, value, expected)
+
+    def test_rounding_ties_and_extremes(self):
+        """Prueba empates de redondeo, valores enormes y signo de cero"""
+        values = [0.0078125, 2.5e-7, -2.5e-7, 1.0000005, 0.1 + 0.2, 1e300, -1e-9, 4503599627.3708]
+        rounded = engine.round6(engine.np.array(values)).tolist()
+        assert [bits(v) for v in rounded] == [bits(round(v, 6)) for v in values]
+
+    def test_division_by_zero_mask(self):
+        """Prueba que la división por cero queda marcada sin afectar al resto"""
+        result, division_by_zero = engine.evaluate_columns(
+            [1.0, 4.0, 3.0],
+            [0.0, 2.0, 0.0],
+            [engine.OP_DIVIDE, engine.OP_DIVIDE, engine.OP_ADD],
+        )
+        assert division_by_zero.tolist() == [True, False, False]
+        assert result[1:].tolist() == [2.0, 3.0]
@@ -0,0 +1,89 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import engine, main
+from app.expressions import CompiledExpression, ExpressionError
+
+client = TestClient(main.app)
+
+
+class TestCompiledExpression:
+    """Pruebas del compilador de expresiones"""
+
+    def test_evaluate(self):
+        """Prueba precedencia, paréntesis, signo y símbolos × ÷"""
+        expression = CompiledExpression("a * (b + 2) ÷ c - -(1 + 2) × 3")
+        assert expression.variables == ("a", "b", "c")
+        assert expression.evaluate({"a": 2, "b": 1, "c": 4}) == 10.5
+
+    def test_rounding_matches_calculate(self):
+        """Prueba el mismo redondeo a 6 decimales que /calculate"""
+        assert CompiledExpression("a / b").evaluate({"a": 1, "b": 3}) == round(1 / 3, 6)
+
+    @pytest.mark.parametrize("source", [
+        "__import__('os')", "a.b", "a(1)", "2 << 3", "a if b else c", "True + 1", "'x'", "[1]", "a; b", "1e400", "",
+    ])
+    def test_rejects_unsafe_or_invalid(self, source):
+        """Prueba que solo se aceptan números, variables y las cuatro operaciones"""
+        with pytest.raises(ExpressionError):
+            CompiledExpression(source)
+
+    def test_constant_folding(self):
+        """Prueba que las subexpresiones constantes se pliegan al compilar"""
+        with pytest.raises(ExpressionError):
+            CompiledExpression("a + 1 / (2 - 2)")
+        assert CompiledExpression("(1 + 2) * 3").evaluate({}) == 9
+
+    def test_missing_variable(self):
+        """Prueba el error por variable sin valor"""
+        with pytest.raises(ExpressionError):
+            CompiledExpression("a + b").evaluate({"a": 1})
+
+    def test_evaluate_many(self):
+        """Prueba la evaluación por columnas con escalares repetidos"""
+        expression = CompiledExpression("a / b + c")
+        values = expression.evaluate_many({"a": [1, 2, 3], "b": [4, 0, 3], "c": 0.5})
+        assert values == [0.75, None, 1.5]
+
+    def test_evaluate_many_without_numpy(self, monkeypatch):
+        """Prueba la ruta escalar cuando NumPy no está disponible"""
+        monkeypatch.setattr(engine, "HAS_NUMPY", False)
+        values = CompiledExpression("a / b").evaluate_many({"a": [1, 2], "b": [4, 0]})
+        assert values == [0.25, None]
+
+    def test_length_mismatch(self):
+        """Prueba que las columnas deben tener la misma longitud"""
+        with pytest.raises(ExpressionError):
+            CompiledExpression("a + b").evaluate_many({"a": [1, 2], "b": [1]})
+
+
+class TestEvaluateEndpoint:
+    """Pruebas del endpoint /evaluate"""
+
+    def test_scalar(self):
+        """Prueba una evaluación escalar"""
+        response = client.post("/evaluate", json={"expression": "x * (y + 1)", "variables": {"x": 2, "y": 3}})
+        assert response.status_code == 200
+        assert response.json() == {"expression": "x * (y + 1)", "variables": ["x", "y"], "result": 8.0}
+
+    def test_vector(self):
+        """Prueba la evaluación con variables en listas"""
+        response = client.post("/evaluate", json={"expression": "x / y", "variables": {"x": [1, 2], "y": [2, 0]}})
+        assert response.json()["results"] == [0.5, None]
+
+    def test_cache_skips_parsing(self):
+        """Prueba que una fórmula repetida sale de la caché"""
+        main.expression_cache.clear()
+        hits = main.expression_cache.hits
+        for x in range(3):
+            client.post("/evaluate", json={"expression": "x + 0.5", "variables": {"x": x}})
+        assert main.expression_cache.hits == hits + 2
+        assert client.get("/evaluate/cache").json()["size"] == 1
+
+    def test_errors(self):
+        """Prueba los 400 por expresión inválida y división por cero"""
+        assert client.post("/evaluate", json={"expression": "os.system('x')"}).status_code == 400
+        response = client.post("/evaluate", json={"expression": "1 / x", "variables": {"x": 0}})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "No se puede dividir por cero"
+        assert client.post("/evaluate", json={"expression": "x" * 1001}).status_code == 422
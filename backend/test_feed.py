@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.feed import HistoryFeed
+
+client = TestClient(main.app)
+
+
+def parse_events(chunk: bytes):
+    events = []
+    for block in chunk.decode().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n") if ": " in line and not line.startswith(":"))
+        if fields:
+            events.append(fields)
+    return events
+
+
+async def take(stream, count):
+    events = []
+    while len(events) < count:
+        events.extend(parse_events(await asyncio.wait_for(stream.__anext__(), 1)))
+    return events
+
+
+class TestHistoryFeed:
+    """Pruebas del canal en vivo del historial"""
+
+    def test_fan_out_shares_payload(self):
+        """Prueba que todos los suscriptores reciben el mismo evento codificado una vez"""
+        async def scenario():
+            feed = HistoryFeed()
+            first, second = feed.subscribe(), feed.subscribe()
+            pending = [asyncio.ensure_future(take(stream, 1)) for stream in (first, second)]
+            await asyncio.sleep(0.01)
+            feed.publish({"result": 3.0, "operation": "1 + 2", "timestamp": "t"})
+            received = await asyncio.gather(*pending)
+            assert feed.subscribers == 2
+            await first.aclose()
+            await second.aclose()
+            assert feed.subscribers == 0
+            return received
+
+        first, second = asyncio.run(scenario())
+        assert first == second == [{"id": "1", "data": '{"result":3.0,"operation":"1 + 2","timestamp":"t"}'}]
+
+    def test_resume_from_event_id(self):
+        """Prueba que se reanuda tras el último id recibido"""
+        async def scenario():
+            feed = HistoryFeed()
+            feed.publish_many({"result": float(i)} for i in range(5))
+            stream = feed.subscribe(last_event_id=2)
+            events = await take(stream, 3)
+            await stream.aclose()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [event["id"] for event in events] == ["3", "4", "5"]
+
+    def test_reset_when_behind_replay_buffer(self):
+        """Prueba que un suscriptor fuera del anillo recibe reset y continúa"""
+        async def scenario():
+            feed = HistoryFeed(replay_size=3)
+            feed.publish_many({"result": float(i)} for i in range(10))
+            stream = feed.subscribe(last_event_id=1)
+            events = await take(stream, 4)
+            await stream.aclose()
+            return feed, events
+
+        feed, events = asyncio.run(scenario())
+        assert json.loads(events[0]["data"]) == {"first_id": 8, "last_id": 10}
+        assert [event["id"] for event in events[1:]] == ["8", "9", "10"]
+        assert feed.resets == 1
+
+    def test_heartbeat(self):
+        """Prueba que sin altas se envían comentarios keepalive"""
+        async def scenario():
+            feed = HistoryFeed(heartbeat_seconds=0.01)
+            stream = feed.subscribe()
+            chunk = await asyncio.wait_for(stream.__anext__(), 1)
+            await stream.aclose()
+            return chunk
+
+        assert asyncio.run(scenario()) == b": keepalive\n\n"
+
+    def test_stream_endpoint(self):
+        """Prueba que /history/stream emite las altas de /calculate"""
+        start = main.history_feed.last_id
+        client.post("/calculate", json={"a": 2, "b": 3, "operation": "multiply"})
+        client.post("/calculate/batch", json=[{"a": 1, "b": 1, "operation": "add"}])
+
+        async def scenario():
+            response = await main.history_stream(last_event_id=None, since_id=start)
+            assert response.media_type == "text/event-stream"
+            events = await take(response.body_iterator, 2)
+            await response.body_iterator.aclose()
+            return events
+
+        events = asyncio.run(scenario())
+        assert [json.loads(event["data"])["result"] for event in events] == [6, 2]
+        assert client.get("/history/stream/stats").json()["last_id"] == start + 2
@@ -0,0 +1,487 @@
+import json
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.history import CalculationHistory, EvictionPolicy, HistoryRecord, format_timestamp, parse_timestamp
+from app.main import app
+
+client = TestClient(app)
+
+
+def make_record(i):
+    return HistoryRecord(float(i), f"{i} + 0", "2025-01-01T00:00:00")
+
+
+class TestRingBufferHistory:
+    """Pruebas del historial en buffer circular"""
+
+    def test_keeps_insertion_order(self):
+        """Prueba que el historial conserva el orden de inserción"""
+        history = CalculationHistory(max_size=5)
+        for i in range(3):
+            history.add_calculation(make_record(i))
+        assert [r.result for r in history.get_history()] == [0, 1, 2]
+
+    def test_drop_oldest_when_full(self):
+        """Prueba que al llenarse se descarta el registro más antiguo"""
+        history = CalculationHistory(max_size=3)
+        for i in range(7):
+            history.add_calculation(make_record(i))
+        assert [r.result for r in history.get_history()] == [4, 5, 6]
+        assert history.memory_usage()["evicted"] == 4
+        assert len(history) == 3
+
+    def test_ttl_eviction(self):
+        """Prueba que la política TTL descarta registros vencidos"""
+        history = CalculationHistory(max_size=10, eviction_policy=EvictionPolicy.TTL, ttl_seconds=60)
+        history.add_calculation(HistoryRecord(1.0, "1 + 0", "t", created=time.monotonic() - 120))
+        history.add_calculation(make_record(2))
+        assert [r.result for r in history.get_history()] == [2]
+
+    def test_ttl_requires_seconds(self):
+        """Prueba que TTL sin segundos es inválido"""
+        with pytest.raises(ValueError):
+            CalculationHistory(eviction_policy="ttl")
+
+    def test_clear_history(self):
+        """Prueba la limpieza del buffer"""
+        history = CalculationHistory(max_size=3)
+        for i in range(5):
+            history.add_calculation(make_record(i))
+        history.clear_history()
+        assert history.get_history() == []
+        history.add_calculation(make_record(9))
+        assert [r.result for r in history.get_history()] == [9]
+
+    def test_entry_count(self):
+        """Prueba el contador de registros sin lock, acotado a la capacidad"""
+        history = CalculationHistory(max_size=3)
+        for i in range(2):
+            history.add_calculation(make_record(i))
+        assert history.entry_count() == 2
+        for i in range(5):
+            history.add_calculation(make_record(i))
+        assert history.entry_count() == 3
+
+    def test_clear_forgets_unknown_types(self):
+        """Prueba que limpiar olvida los tipos de operación desconocidos"""
+        history = CalculationHistory(max_size=10)
+        for i in range(5):
+            history.add_calculation(HistoryRecord(1.0, "x", "2025-01-01T00:00:00", operation_type=f"op{i}"))
+        history.clear_history()
+        assert history._type_names == list(history._type_codes)
+        assert "op0" not in history._type_codes
+        history.add_calculation(HistoryRecord(2.0, "2 + 0", "2025-01-01T00:00:00", operation_type="add"))
+        history.add_calculation(HistoryRecord(3.0, "y", "2025-01-01T00:00:00", operation_type="op9"))
+        assert [r.operation_type for r in history.get_history()] == ["add", "op9"]
+        assert [r.result for r in history.get_page(operation_type="op9")] == [3.0]
+
+
+class TestHistoryMemoryEndpoint:
+    """Pruebas del endpoint de uso de memoria"""
+
+    def setup_method(self):
+        client.delete("/history")
+
+    def test_memory_usage_endpoint(self):
+        """Prueba que el endpoint reporta entradas y capacidad"""
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+        response = client.get("/history/memory")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["entries"] == 1
+        assert data["capacity"] > 0
+        assert data["estimated_bytes"] > 0
+
+
+class TestHistoryPagination:
+    """Pruebas de paginación por cursor del historial"""
+
+    def setup_method(self):
+        client.delete("/history")
+        for i in range(5):
+            client.post("/calculate", json={"a": i, "b": 1, "operation": "add"})
+
+    def test_limit_and_cursor(self):
+        """Prueba que el cursor recorre el historial sin repetir entradas"""
+        first = client.get("/history", params={"limit": 2})
+        assert first.status_code == 200
+        ids = [item["id"] for item in first.json()]
+        assert len(ids) == 2
+        cursor = first.headers["X-Next-Cursor"]
+        assert cursor == str(ids[-1])
+
+        second = client.get("/history", params={"limit": 10, "cursor": cursor})
+        results = [item["result"] for item in second.json()]
+        assert results == [3, 4, 5]
+        assert "X-Next-Cursor" not in second.headers
+
+    def test_ids_are_stable_after_eviction(self):
+        """Prueba que los ids se mantienen al descartar entradas"""
+        history = CalculationHistory(max_size=3)
+        for i in range(6):
+            history.add_calculation(make_record(i))
+        assert [r.seq for r in history.get_page(cursor=4)] == [5, 6]
+        assert [r.seq for r in history.get_page(cursor=1)] == [4, 5, 6]
+
+    def test_since_filter(self):
+        """Prueba el filtro por timestamp"""
+        history = CalculationHistory(max_size=10)
+        for i, ts in enumerate(["2025-01-01", "2025-01-02", "2025-01-03"]):
+            history.add_calculation(HistoryRecord(float(i), "op", ts))
+        assert [r.result for r in history.get_page(since="2025-01-02")] == [1, 2]
+
+    def test_ndjson_stream(self):
+        """Prueba la exportación en streaming NDJSON"""
+        response = client.get("/history", params={"format": "ndjson"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = response.text.strip().split("\n")
+        assert len(lines) == 5
+        assert json.loads(lines[0])["result"] == 1
+
+
+class TestHistoryConditionalGet:
+    """Pruebas del ETag y las respuestas 304 de /history"""
+
+    def setup_method(self):
+        client.delete("/history")
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+
+    def test_not_modified(self):
+        """Prueba que If-None-Match con el ETag vigente devuelve 304 sin cuerpo"""
+        first = client.get("/history")
+        etag = first.headers["etag"]
+        assert etag.startswith('W/"')
+        second = client.get("/history", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == etag
+
+    def test_etag_changes_with_history(self):
+        """Prueba que altas y clear cambian el ETag"""
+        etag = client.get("/history").headers["etag"]
+        client.post("/calculate", json={"a": 3, "b": 4, "operation": "add"})
+        response = client.get("/history", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        client.delete("/history")
+        assert client.get("/history", headers={"If-None-Match": response.headers["etag"]}).status_code == 200
+
+    def test_etag_depends_on_query(self):
+        """Prueba que cada combinación de parámetros tiene su propio ETag"""
+        etag = client.get("/history").headers["etag"]
+        assert client.get("/history", params={"limit": 1}).headers["etag"] != etag
+        assert client.get("/history", params={"limit": 1}, headers={"If-None-Match": etag}).status_code == 200
+
+    def test_version_counter(self):
+        """Prueba que la versión cambia con altas, descartes por TTL y clear"""
+        history = CalculationHistory(max_size=10, eviction_policy=EvictionPolicy.TTL, ttl_seconds=60)
+        initial = history.version()
+        # El alta ya había vencido: cuentan el alta y su descarte
+        history.add_calculation(HistoryRecord(1.0, "op", "ts", created=time.monotonic() - 120))
+        assert history.version() == initial + 2
+        assert len(history) == 0
+        history.clear_history()
+        assert history.version() == initial + 3
+
+
+class TestHistoryFilters:
+    """Pruebas de los filtros indexados del historial"""
+
+    OPERATIONS = ["add", "divide", "multiply"]
+
+    def make_history(self, count=30, max_size=100):
+        history = CalculationHistory(max_size=max_size)
+        for i in range(count):
+            history.add_calculation(HistoryRecord(
+                float(i), f"{i} op 1", f"2025-01-01T00:00:{i:02d}",
+                operation_type=self.OPERATIONS[i % 3],
+            ))
+        return history
+
+    def test_operation_filter(self):
+        """Prueba el filtro por operación con cursor y límite"""
+        history = self.make_history()
+        divides = history.get_page(operation_type="divide")
+        assert [r.result for r in divides] == list(range(1, 30, 3))
+        page = history.get_page(operation_type="divide", cursor=divides[1].seq, limit=2)
+        assert [r.result for r in page] == [7, 10]
+        assert history.get_page(operation_type="subtract") == []
+
+    def test_time_range(self):
+        """Prueba los límites inclusivos de timestamp"""
+        history = self.make_history()
+        records = history.get_page(since="2025-01-01T00:00:05", until="2025-01-01T00:00:09")
+        assert [r.result for r in records] == [5, 6, 7, 8, 9]
+        records = history.get_page(operation_type="add", since="2025-01-01T00:00:05", until="2025-01-01T00:00:12")
+        assert [r.result for r in records] == [6, 9, 12]
+        assert history.get_page(since="2025-01-01T00:00:09", until="2025-01-01T00:00:05") == []
+
+    def test_result_range(self):
+        """Prueba el filtro por rango de resultado"""
+        history = self.make_history()
+        records = history.get_page(min_result=10, max_result=20, operation_type="multiply", limit=3)
+        assert [r.result for r in records] == [11, 14, 17]
+
+    def test_index_follows_eviction(self):
+        """Prueba que el índice por operación descarta las entradas desalojadas"""
+        history = self.make_history(count=9000, max_size=10)
+        assert [r.seq for r in history.get_page(operation_type="add")] == [8992, 8995, 8998]
+        assert len(history._operation_index["add"].seqs) < 9000 // 3
+        history.clear_history()
+        assert history.get_page(operation_type="add") == []
+
+    def test_out_of_order_timestamps(self):
+        """Prueba los filtros de tiempo cuando un timestamp llega antes que otro posterior"""
+        history = CalculationHistory(max_size=4)
+        history.add_calculation(HistoryRecord(2.0, "b", "2025-01-01T00:00:00.200000"))
+        history.add_calculation(HistoryRecord(1.0, "a", "2025-01-01T00:00:00.100000"))
+        assert [r.result for r in history.get_page(since="2025-01-01T00:00:00.050000")] == [2, 1]
+        assert [r.result for r in history.get_page(until="2025-01-01T00:00:00.250000", limit=1)] == [2]
+        assert [r.result for r in history.get_page(until="2025-01-01T00:00:00.150000")] == [1]
+        # Cuando el registro desordenado sale del buffer vuelve la búsqueda binaria
+        for i in range(4):
+            history.add_calculation(HistoryRecord(float(i), "c", f"2025-01-01T00:00:0{i + 1}"))
+        assert len(history) == 4
+        assert not history._disordered
+        assert [r.result for r in history.get_page(since="2025-01-01T00:00:03")] == [2, 3]
+
+    def test_out_of_order_keeps_binary_search(self):
+        """Prueba que con algún timestamp desordenado los filtros coinciden con un recorrido completo"""
+        rng = random.Random(7)
+        history = CalculationHistory(max_size=300)
+        operations = ["add", "divide", None]
+        second = 0
+        for i in range(500):
+            second += rng.choice([1, 1, 1, 0, -40])
+            record = HistoryRecord(
+                float(i % 13), "x", f"2025-01-01T{second // 3600 % 24:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+                operation_type=operations[i % 3],
+            )
+            history.add_calculation(record)
+        records = history.get_history()
+        assert history._disordered
+        for _ in range(200):
+            since, until = sorted(rng.choice(records).timestamp for _ in range(2))
+            cursor = rng.choice([None, records[rng.randrange(len(records))].seq])
+            operation_type = rng.choice(operations)
+            min_result = rng.choice([None, 6.0])
+            limit = rng.choice([None, 1, 5, 50])
+            expected = [
+                r.seq for r in records
+                if (cursor is None or r.seq > cursor) and since <= r.timestamp <= until
+                and (operation_type is None or r.operation_type == operation_type)
+                and (min_result is None or r.result >= min_result)
+            ][:limit]
+            page = history.get_page(
+                cursor=cursor, since=since, until=until, operation_type=operation_type,
+                min_result=min_result, limit=limit,
+            )
+            assert [r.seq for r in page] == expected
+
+    def test_time_bounds_are_normalized(self):
+        """Prueba `from`/`to` con zona horaria o solo fecha, y el 422 si no son fechas"""
+        client.delete("/history")
+        client.post("/calculate", json={"a": 1, "b": 1, "operation": "add"})
+        now = datetime.now(timezone.utc)
+        after = (now + timedelta(minutes=1)).isoformat().replace("+00:00", "Z")
+        before = (now - timedelta(hours=1)).isoformat()
+        assert len(client.get("/history", params={"to": after}).json()) == 1
+        assert client.get("/history", params={"to": before}).json() == []
+        assert len(client.get("/history", params={"from": before, "to": after}).json()) == 1
+        assert client.get("/history", params={"from": "2999-01-01"}).json() == []
+        for bound in ("from", "to", "since"):
+            assert client.get("/history", params={bound: "garbage"}).status_code == 422
+
+    def test_endpoint_filters(self):
+        """Prueba los filtros en GET /history"""
+        client.delete("/history")
+        for a, operation in [(1, "add"), (8, "divide"), (3, "add"), (9, "divide")]:
+            client.post("/calculate", json={"a": a, "b": 1, "operation": operation})
+        response = client.get("/history", params={"operation": "divide", "min_result": 9})
+        assert [item["result"] for item in response.json()] == [9]
+        timestamps = [item["timestamp"] for item in client.get("/history").json()]
+        response = client.get("/history", params={"from": timestamps[1], "to": timestamps[2], "format": "ndjson"})
+        assert [json.loads(line)["result"] for line in response.text.strip().split("\n")] == [8, 4]
+        assert client.get("/history", params={"operation": "sqrt"}).status_code == 422
+
+
+class TestPackedHistory:
+    """Pruebas del historial guardado por columnas"""
+
+    def test_timestamp_round_trip(self):
+        """Prueba que parse_timestamp invierte format_timestamp"""
+        for epoch_ns in (1_700_000_000_123_456_000, 1_700_000_000_000_000_000, 1_700_000_001_000_001_000):
+            timestamp = format_timestamp(epoch_ns)
+            assert timestamp == datetime.fromtimestamp(epoch_ns / 1e9).isoformat()
+            assert parse_timestamp(timestamp) == epoch_ns
+        for text in ("t", "2025-01-01T00:00:00.5", "2025-01-01T00:00:00.000000", "2025-01-01T00:00:00+00:00"):
+            assert parse_timestamp(text) is None
+
+    def test_lazy_strings(self):
+        """Prueba que la etiqueta y el timestamp se construyen al leer"""
+        history = CalculationHistory(max_size=5)
+        epoch_ns = 1_700_000_000_250_000_000
+        history.add_calculation(HistoryRecord(0.5, operation_type="divide", a=1.0, b=2.0, epoch_ns=epoch_ns))
+        record = history.get_history()[0]
+        assert record.to_dict() == {
+            "id": 1, "result": 0.5, "operation": "1.0 ÷ 2.0", "timestamp": format_timestamp(epoch_ns),
+        }
+        assert history.memory_usage()["unpacked"] == 0
+
+    def test_unpacked_strings(self):
+        """Prueba que los textos que no se pueden reconstruir se conservan tal cual"""
+        history = CalculationHistory(max_size=3)
+        history.add_calculation(HistoryRecord(3.0, "1 + 2", "2025-01-01T00:00:00", operation_type="add"))
+        history.add_calculation(HistoryRecord(3.0, "1.0 + 2.0", "t", operation_type="add"))
+        history.add_calculation(HistoryRecord(1.0, "x", "2025-01-01T00:00:01"))
+        assert [(r.operation, r.timestamp) for r in history.get_history()] == [
+            ("1 + 2", "2025-01-01T00:00:00"), ("1.0 + 2.0", "t"), ("x", "2025-01-01T00:00:01"),
+        ]
+        assert history.memory_usage()["unpacked"] == 3
+        history.add_calculation(make_record(4))
+        history.add_calculation(make_record(5))
+        assert history.memory_usage()["unpacked"] == 3
+        assert [r.operation for r in history.get_history()] == ["x", "4 + 0", "5 + 0"]
+
+    def test_capture_wraps_buffer(self):
+        """Prueba la copia por columnas cuando el buffer ha dado la vuelta"""
+        history = CalculationHistory(max_size=4)
+        for i in range(6):
+            history.add_calculation(HistoryRecord(float(i), operation_type="add", a=float(i), b=0.0, epoch_ns=10 ** 18))
+        records, _, next_seq = history.capture(lambda: None)
+        assert len(records) == 4 and next_seq == 7
+        assert [r.seq for r in records] == [3, 4, 5, 6]
+        assert records[-1].operation == "5.0 + 0.0"
+        assert [r.result for r in records[1:3]] == [3.0, 4.0]
+
+    def test_formatted_cache(self, monkeypatch):
+        """Prueba que los textos de las filas leídas se reutilizan entre lecturas"""
+        monkeypatch.setattr(CalculationHistory, "FORMAT_CACHE_SIZE", 3)
+        history = CalculationHistory(max_size=10)
+        for i in range(5):
+            history.add_calculation(HistoryRecord(float(i), operation_type="add", a=float(i), b=0.0, epoch_ns=10 ** 18))
+        first = history.get_history()
+        second = history.get_history()
+        assert [r.operation for r in second] == [f"{i}.0 + 0.0" for i in range(5)]
+        # Solo las tres últimas filas leídas quedan en la caché
+        assert [a.operation is b.operation for a, b in zip(first, second)] == [False, False, True, True, True]
+        assert history.memory_usage()["formatted"] == 3
+        filtered = history.get_page(min_result=4)
+        assert filtered[0].timestamp is second[4].timestamp
+        history.clear_history()
+        assert history.memory_usage()["formatted"] == 0
+
+    def test_records_built_without_lock(self, monkeypatch):
+        """Prueba que los registros se crean con el lock del historial ya libre"""
+        history = CalculationHistory(max_size=10)
+        history.add_many([make_record(i) for i in range(3)])
+        records = CalculationHistory._records
+        held = []
+
+        def recording(self, packed):
+            held.append(self._lock.locked())
+            return records(self, packed)
+
+        monkeypatch.setattr(CalculationHistory, "_records", recording)
+        history.get_history()
+        history.get_page(min_result=1)
+        assert held == [False, False]
+
+
+class TestHistoryConcurrency:
+    """Pruebas de estrés del historial con muchos hilos"""
+
+    WRITERS = 8
+    PER_WRITER = 5000
+
+    def setup_method(self):
+        # Cambios de hilo más frecuentes para provocar intercalados
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+
+    def teardown_method(self):
+        sys.setswitchinterval(self.switch_interval)
+
+    def run_threads(self, targets):
+        barrier = threading.Barrier(len(targets))
+        errors = []
+
+        def wrap(target):
+            barrier.wait()
+            try:
+                target()
+            except Exception as e:  # noqa: BLE001 - se relanza en el hilo principal
+                errors.append(e)
+
+        threads = [threading.Thread(target=wrap, args=(target,)) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+
+    @staticmethod
+    def check_page(records, max_size):
+        assert len(records) <= max_size
+        assert None not in records
+        if records:
+            first = records[0].seq
+            assert [r.seq for r in records] == list(range(first, first + len(records)))
+
+    def test_concurrent_appends_and_reads(self):
+        """Prueba que no se pierden altas y los lectores ven ids contiguos"""
+        history = CalculationHistory(max_size=1000)
+        done = threading.Event()
+
+        def writer(n):
+            def run():
+                for i in range(self.PER_WRITER):
+                    history.add_calculation(HistoryRecord(float(i), "op", "t", operation_type=f"w{n}"))
+            return run
+
+        def reader():
+            while not done.is_set():
+                self.check_page(history.get_history(), history.max_size)
+                self.check_page(history.get_page(cursor=history._next_seq - 50, limit=20), history.max_size)
+                history.get_page(operation_type="w0", limit=10)
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        for thread in readers:
+            thread.start()
+        self.run_threads([writer(n) for n in range(self.WRITERS)])
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        total = self.WRITERS * self.PER_WRITER
+        assert len(history) == history.max_size
+        assert history.evicted == total - history.max_size
+        assert history.get_stats()["total"]["count"] == total
+        assert history.get_history()[-1].seq == total
+
+    def test_concurrent_clear(self):
+        """Prueba que limpiar mientras se escribe deja un estado consistente"""
+        history = CalculationHistory(max_size=500)
+
+        def writer():
+            for i in range(self.PER_WRITER):
+                history.add_many([HistoryRecord(float(i), "op", "t", operation_type="add")])
+
+        def clearer():
+            for _ in range(50):
+                history.clear_history()
+                self.check_page(history.get_history(), history.max_size)
+
+        self.run_threads([writer for _ in range(4)] + [clearer])
+        records = history.get_history()
+        self.check_page(records, history.max_size)
+        assert history.get_stats()["total"]["count"] >= len(records)
+        assert [r.seq for r in history.get_page(operation_type="add")] == [r.seq for r in records]
@@ -0,0 +1,246 @@
+import errno
+import os
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.history import CalculationHistory, HistoryRecord, create_history_backend
+from app.journal import HistoryJournal, journaled_history
+
+
+def make_record(i, operation_type="add"):
+    return HistoryRecord(float(i), f"{i} + 0", "2025-01-01T00:00:00", operation_type=operation_type)
+
+
+def open_history(directory, max_size=100, **options):
+    options.setdefault("flush_interval_ms", 5)
+    return journaled_history(CalculationHistory(max_size=max_size), str(directory), **options)
+
+
+def segment_paths(directory):
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith("wal-"))
+
+
+class TestHistoryJournal:
+    """Pruebas del WAL y los snapshots del historial en memoria"""
+
+    def test_round_trip(self, tmp_path):
+        """Prueba que el historial se recupera con sus ids y campos"""
+        history = open_history(tmp_path)
+        for i in range(5):
+            history.add_calculation(make_record(i, None if i == 2 else "add"))
+        history.close()
+
+        restored = open_history(tmp_path)
+        records = restored.get_history()
+        assert [r.result for r in records] == [0, 1, 2, 3, 4]
+        assert [r.seq for r in records] == [1, 2, 3, 4, 5]
+        assert records[2].operation_type is None
+        assert records[0].operation == "0 + 0"
+        restored.add_calculation(make_record(9))
+        assert restored.get_history()[-1].seq == 6
+        restored.close()
+
+    def test_clear_is_replayed(self, tmp_path):
+        """Prueba que un clear del WAL vacía el historial recuperado"""
+        history = open_history(tmp_path)
+        for i in range(3):
+            history.add_calculation(make_record(i))
+        history.clear_history()
+        history.add_calculation(make_record(7))
+        history.close()
+
+        restored = open_history(tmp_path)
+        assert [r.result for r in restored.get_history()] == [7]
+        assert restored.get_stats()["total"]["count"] == 1
+        restored.close()
+
+    def test_torn_tail(self, tmp_path):
+        """Prueba que un registro a medio escribir se descarta"""
+        history = open_history(tmp_path)
+        for i in range(4):
+            history.add_calculation(make_record(i))
+        history.close()
+        (path,) = segment_paths(tmp_path)
+        with open(path, "r+b") as handle:
+            handle.truncate(os.path.getsize(path) - 3)
+
+        restored = open_history(tmp_path)
+        assert [r.result for r in restored.get_history()] == [0, 1, 2]
+        restored.close()
+
+    def test_corrupt_record(self, tmp_path):
+        """Prueba que un CRC incorrecto detiene la lectura del segmento"""
+        history = open_history(tmp_path)
+        for i in range(4):
+            history.add_calculation(make_record(i))
+        history.close()
+        (path,) = segment_paths(tmp_path)
+        size = os.path.getsize(path)
+        with open(path, "r+b") as handle:
+            handle.seek(size // 2)
+            byte = handle.read(1)
+            handle.seek(size // 2)
+            handle.write(bytes([byte[0] ^ 0xFF]))
+
+        restored = open_history(tmp_path)
+        assert [r.result for r in restored.get_history()] == [0, 1]
+        restored.close()
+
+    def test_snapshot_and_tail(self, tmp_path):
+        """Prueba la recuperación desde snapshot más el WAL posterior"""
+        history = open_history(tmp_path, max_size=10)
+        journal = history.journal
+        for i in range(15):
+            history.add_calculation(make_record(i))
+        history.flush_pending()
+        journal.snapshot(wait=True)
+        for i in range(15, 18):
+            history.add_calculation(make_record(i))
+        history.close()
+        assert os.path.exists(tmp_path / "snapshot.bin")
+        assert [os.path.basename(path) for path in segment_paths(tmp_path)] == ["wal-00000001.log"]
+
+        restored = open_history(tmp_path, max_size=10)
+        records = restored.get_history()
+        assert [r.result for r in records] == list(range(8, 18))
+        assert records[-1].seq == 18
+        # Los agregados incluyen también los registros ya descartados
+        stats = restored.get_stats()
+        assert stats["total"]["count"] == 18
+        assert stats["total"]["max"] == 17
+        assert restored.journal.recovered == 13
+        restored.close()
+
+    def test_automatic_snapshot(self, tmp_path):
+        """Prueba que el diario toma snapshots cada `snapshot_every` altas"""
+        history = open_history(tmp_path, snapshot_every=50)
+        history.add_many([make_record(i) for i in range(120)])
+        history.close()
+        assert history.journal.snapshots >= 1
+
+        restored = open_history(tmp_path)
+        assert [r.seq for r in restored.get_history()] == list(range(21, 121))
+        assert restored.get_stats()["total"]["count"] == 120
+        restored.close()
+
+    def test_journal_stats(self, tmp_path):
+        """Prueba los contadores del diario"""
+        history = open_history(tmp_path)
+        history.add_calculation(make_record(1))
+        history.flush_pending()
+        history.journal.close()
+        stats = history.journal.stats()
+        assert stats["written"] == 1
+        assert stats["pending"] == 0
+
+    def test_write_failure_is_retried(self, tmp_path, monkeypatch):
+        """Prueba que un error de disco no para el diario y las altas se escriben al reintentar"""
+        history = open_history(tmp_path, flush_interval_ms=60000)
+        journal = history.journal
+        history.add_calculation(make_record(1))
+        journal._flush()
+
+        def disk_full(descriptor):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        monkeypatch.setattr(os, "fsync", disk_full)
+        history.add_many([make_record(2), make_record(3)])
+        journal._cycle()
+        journal._cycle()
+        stats = journal.stats()
+        assert (stats["failing"], stats["errors"], stats["pending"], stats["written"]) == (True, 2, 2, 1)
+        assert "No space left" in stats["last_error"]
+
+        monkeypatch.undo()
+        journal._cycle()
+        assert (journal.failing, journal.written) == (False, 3)
+        history.close()
+        # El bloque escrito antes del fallo de fsync se truncó: no queda duplicado
+        restored = open_history(tmp_path)
+        assert [r.result for r in restored.get_history()] == [1, 2, 3]
+        restored.close()
+
+    def test_long_texts(self, tmp_path):
+        """Prueba los registros con textos de más de 65535 bytes y un tipo de 0xFFFF bytes"""
+        history = open_history(tmp_path)
+        long_type = "t" * 0xFFFF
+        history.add_many([
+            HistoryRecord(1.0, "1" * 70000 + " + 1", "2025-01-01T00:00:00", operation_type="add"),
+            HistoryRecord(2.0, "x", "2025-01-01T00:00:01", operation_type=long_type),
+            HistoryRecord(3.0, "y" * 70000, "2025-01-01T00:00:02"),
+            make_record(4),
+        ])
+        history.close()
+        assert history.journal.stats()["errors"] == 0
+
+        restored = open_history(tmp_path)
+        records = restored.get_history()
+        assert [r.result for r in records] == [1, 2, 3, 4]
+        assert len(records[0].operation) == 70004
+        assert records[1].operation_type == long_type
+        assert records[2].operation_type is None and len(records[2].operation) == 70000
+        restored.close()
+
+    def test_unencodable_record_is_counted(self, tmp_path):
+        """Prueba que un alta que no se puede codificar se descarta sin parar el diario"""
+        history = open_history(tmp_path, flush_interval_ms=60000)
+        journal = history.journal
+        history.add_many([make_record(1), HistoryRecord(2.0, "\ud800", "2025-01-01T00:00:00"), make_record(3)])
+        journal._flush()
+        stats = journal.stats()
+        assert (stats["dropped"], stats["errors"], stats["written"]) == (1, 1, 2)
+        assert "UnicodeEncodeError" in stats["last_error"]
+        assert journal._thread.is_alive()
+        history.close()
+
+        restored = open_history(tmp_path)
+        assert [r.result for r in restored.get_history()] == [1, 3]
+        restored.close()
+
+    def test_unexpected_error_keeps_thread(self, tmp_path, monkeypatch):
+        """Prueba que cualquier error del ciclo marca el diario como fallido y el hilo sigue"""
+        history = open_history(tmp_path, flush_interval_ms=60000)
+        journal = history.journal
+
+        def broken():
+            raise RuntimeError("roto")
+
+        monkeypatch.setattr(journal, "_drain", broken)
+        journal._cycle()
+        assert journal.failing and journal.errors == 1
+        assert journal.last_error == "RuntimeError: roto"
+        monkeypatch.undo()
+        journal._cycle()
+        assert not journal.failing
+        history.close()
+
+    def test_failure_in_health(self, tmp_path, monkeypatch):
+        """Prueba que /health muestra el diario que no consigue escribir"""
+        history = open_history(tmp_path, flush_interval_ms=60000)
+        monkeypatch.setattr(main, "history_db", history)
+        client = TestClient(main.app)
+        assert client.get("/health").json()["journal"]["failing"] is False
+        history.journal.failing = True
+        data = client.get("/health").json()
+        assert data["status"] == "degraded"
+        assert data["journal"]["failing"] is True
+        history.journal.failing = False
+        history.journal.dropped = 1
+        assert client.get("/health").json()["status"] == "degraded"
+        history.journal.dropped = 0
+        history.close()
+
+    def test_backend_from_environment(self, tmp_path, monkeypatch):
+        """Prueba que HISTORY_WAL_DIR activa el diario en el backend de memoria"""
+        monkeypatch.setenv("HISTORY_BACKEND", "memory")
+        monkeypatch.setenv("HISTORY_WAL_DIR", str(tmp_path))
+        monkeypatch.setenv("HISTORY_FLUSH_INTERVAL_MS", "5")
+        history = create_history_backend()
+        assert isinstance(history.journal, HistoryJournal)
+        history.add_calculation(make_record(3))
+        history.close()
+
+        restored = create_history_backend()
+        assert [r.result for r in restored.get_history()] == [3]
+        restored.close()
@@ -0,0 +1,73 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import Histogram, MetricsRegistry
+
+client = TestClient(app)
+
+
+def sample(text, line_prefix):
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class TestHistogram:
+    """Pruebas del histograma de cubetas fijas"""
+
+    def test_bucket_assignment(self):
+        """Prueba que cada valor cae en su cubeta y el acumulado es correcto"""
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.cumulative() == [2, 3, 4]
+        assert histogram.count == 4
+
+    def test_render_format(self):
+        """Prueba el formato de texto de Prometheus"""
+        registry = MetricsRegistry(buckets=(0.1,))
+        registry.observe_request("/calculate", 400, 0.05, "divide")
+        text = registry.render()
+        assert 'calculator_request_duration_seconds_bucket{route="/calculate",le="0.1"} 1' in text
+        assert 'calculator_operation_duration_seconds_count{operation="divide"} 1' in text
+        assert 'calculator_errors_total{route="/calculate",status="400"} 1' in text
+
+
+class TestMetricsEndpoint:
+    """Pruebas del endpoint /metrics"""
+
+    def setup_method(self):
+        client.delete("/history")
+
+    def test_records_routes_operations_and_errors(self):
+        """Prueba que se registran latencias por ruta y operación y errores 400"""
+        before = client.get("/metrics").text
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+        client.post("/calculate", json={"a": 1, "b": 0, "operation": "divide"})
+        client.get("/history/memory")
+        text = client.get("/metrics").text
+
+        route = 'calculator_request_duration_seconds_count{route="/calculate"}'
+        assert sample(text, route) - sample(before, route) == 2
+        add = 'calculator_operation_duration_seconds_count{operation="add"}'
+        assert sample(text, add) - sample(before, add) == 1
+        errors = 'calculator_errors_total{route="/calculate",status="400"}'
+        assert sample(text, errors) - sample(before, errors) == 1
+        assert 'route="/history/memory"' in text
+
+    def test_gauges(self):
+        """Prueba los indicadores de tamaño de historial y memoria"""
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+        text = client.get("/metrics").text
+        assert sample(text, "calculator_history_entries ") == 1
+        assert sample(text, "process_resident_memory_bytes ") > 0
+
+    def test_unmatched_routes_share_one_series(self):
+        """Prueba que las URLs desconocidas no crean series nuevas"""
+        client.get("/no-existe-1")
+        client.get("/no-existe-2")
+        text = client.get("/metrics").text
+        assert 'calculator_errors_total{route="unmatched",status="404"}' in text
+        assert "no-existe" not in text
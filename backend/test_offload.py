@@ -0,0 +1,194 @@
+import asyncio
+import decimal
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import expressions, main
+from app.metrics import EventLoopLagMonitor
+from app.offload import Offloader, Overloaded
+from app.precision import compute_exact, decimal_context, exact_cost
+
+client = TestClient(main.app)
+
+
+class TestOffloader:
+    """Pruebas del ejecutor de operaciones costosas"""
+
+    @pytest.mark.parametrize("kind", ["inline", "thread", "process"])
+    def test_run(self, kind):
+        """Prueba que cada ejecutor devuelve el resultado y las excepciones"""
+        offloader = Offloader(kind, max_workers=1)
+        one, three = decimal.Decimal(1), decimal.Decimal(3)
+
+        async def run():
+            value = await offloader.run(compute_exact, one, three, "divide", "decimal", decimal_context(5))
+            with pytest.raises(ZeroDivisionError):
+                await offloader.run(compute_exact, one, decimal.Decimal(0), "divide", "decimal", decimal_context())
+            return value
+
+        try:
+            assert asyncio.run(run()) == decimal.Decimal("0.33333")
+        finally:
+            offloader.shutdown()
+        assert offloader.stats()["completed"] == 2
+        assert offloader.inflight == 0
+
+    def test_expression_in_process(self):
+        """Prueba que las expresiones se compilan y evalúan dentro del proceso"""
+        offloader = Offloader("process", max_workers=1)
+
+        async def run():
+            return await offloader.run(expressions.evaluate_many, "x * 2 + y", {"x": [1, 2], "y": 1})
+
+        try:
+            assert asyncio.run(run()) == [3.0, 5.0]
+        finally:
+            offloader.shutdown()
+
+    def test_load_shedding(self):
+        """Prueba que con la cola llena se rechaza en vez de esperar"""
+        offloader = Offloader("thread", max_workers=1, max_queue=2)
+
+        async def run():
+            return await asyncio.gather(
+                *(offloader.run(time.sleep, 0.05) for _ in range(3)), return_exceptions=True
+            )
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            offloader.shutdown()
+        assert sum(isinstance(result, Overloaded) for result in results) == 1
+        assert offloader.stats()["rejected"] == 1
+
+    def test_broken_pool_is_replaced(self):
+        """Prueba que si muere un worker se responde Overloaded y el pool se recrea"""
+        offloader = Offloader("process", max_workers=1)
+
+        async def run():
+            assert await offloader.run(abs, -3) == 3
+            with pytest.raises(Overloaded):
+                # os._exit mata el worker sin devolver nada
+                await offloader.run(os._exit, 1)
+            return await offloader.run(abs, -4)
+
+        try:
+            assert asyncio.run(run()) == 4
+        finally:
+            offloader.shutdown()
+        assert offloader.stats()["restarts"] == 1
+        assert offloader.inflight == 0
+
+    def test_invalid_kind(self):
+        """Prueba que un ejecutor desconocido es un error"""
+        with pytest.raises(ValueError):
+            Offloader("gpu")
+
+    def test_exact_cost(self):
+        """Prueba la estimación de coste de la aritmética exacta"""
+        context = decimal_context(28)
+        small, large = decimal.Decimal("1.5"), decimal.Decimal("1E+5000")
+        assert exact_cost(small, small, "decimal", context) == 28
+        assert exact_cost(small, large, "fraction", context) == 5001
+        assert exact_cost(small, small, "fraction", context) == 3
+
+
+class TestEventLoopLag:
+    """Pruebas de la medida del retraso del event loop"""
+
+    def test_detects_blocking(self):
+        """Prueba que un bloqueo del loop aparece como retraso"""
+        monitor = EventLoopLagMonitor(interval=0.01)
+
+        async def run():
+            monitor.start()
+            await asyncio.sleep(0.03)
+            time.sleep(0.1)
+            await asyncio.sleep(0.03)
+            await monitor.stop()
+
+        asyncio.run(run())
+        assert monitor.max >= 0.08
+        assert monitor.stats()["running"] is False
+
+
+class TestOffloadEndpoints:
+    """Pruebas del envío de cálculos costosos al ejecutor"""
+
+    @pytest.fixture
+    def offloader(self, monkeypatch):
+        offloader = Offloader("thread", max_workers=2, max_queue=4)
+        monkeypatch.setattr(main, "offloader", offloader)
+        yield offloader
+        offloader.shutdown()
+
+    def test_exact_offloaded_above_threshold(self, offloader, monkeypatch):
+        """Prueba que solo los cálculos exactos costosos salen del event loop"""
+        client.post("/calculate", json={"a": 1, "b": 3, "operation": "divide", "precision": "decimal"})
+        assert offloader.completed == 0
+        monkeypatch.setattr(main, "OFFLOAD_MIN_DIGITS", 1)
+        response = client.post("/calculate", json={"a": 1, "b": 3, "operation": "divide", "precision": "fraction"})
+        assert response.json()["exact_result"] == "1/3"
+        assert offloader.completed == 1
+        client.post("/calculate", json={"a": 1, "b": 3, "operation": "divide"})
+        assert offloader.completed == 1
+
+    def test_division_by_zero_from_executor(self, offloader, monkeypatch):
+        """Prueba que los errores del ejecutor conservan su respuesta"""
+        monkeypatch.setattr(main, "OFFLOAD_MIN_DIGITS", 1)
+        response = client.post("/calculate", json={"a": 1, "b": 0, "operation": "divide", "precision": "decimal"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "No se puede dividir por cero"
+
+    def test_batch_exact_offloaded(self, offloader, monkeypatch):
+        """Prueba que un lote con cálculos exactos costosos sale del event loop"""
+        batch = [
+            {"a": 1, "b": 3, "operation": "divide", "precision": "fraction"},
+            {"a": 1, "b": 0, "operation": "divide", "precision": "decimal"},
+            {"a": 2, "b": 3, "operation": "add"},
+        ]
+        client.post("/calculate/batch", json=batch)
+        assert offloader.completed == 0
+        monkeypatch.setattr(main, "OFFLOAD_MIN_DIGITS", 1)
+        results = client.post("/calculate/batch", json=batch).json()["results"]
+        assert offloader.completed == 1
+        assert results[0]["exact_result"] == "1/3"
+        assert results[1]["error"] == "No se puede dividir por cero"
+        assert results[2]["result"] == 5
+
+    def test_batch_huge_power_rejected_before_executor(self, offloader):
+        """Prueba que un exponente demasiado largo falla su elemento sin calcularse"""
+        batch = [
+            {"a": 2, "b": 1e9, "operation": "power", "precision": "fraction"},
+            {"a": 2, "b": 10, "operation": "power", "precision": "fraction"},
+        ]
+        results = client.post("/calculate/batch", json=batch).json()["results"]
+        assert results[0]["error"] == "El resultado es demasiado grande para el modo fraction"
+        assert results[1]["exact_result"] == "1024"
+        assert offloader.completed == 0
+
+    def test_evaluate_offloaded(self, offloader, monkeypatch):
+        """Prueba /evaluate en bloque a través del ejecutor"""
+        monkeypatch.setattr(main, "OFFLOAD_MIN_ROWS", 2)
+        response = client.post("/evaluate", json={"expression": "x / y", "variables": {"x": [1, 2, 3], "y": [2, 0, 4]}})
+        assert response.json()["results"] == [0.5, None, 0.75]
+        assert offloader.completed == 1
+
+    def test_overloaded_is_503(self, offloader, monkeypatch):
+        """Prueba el 503 con Retry-After cuando el ejecutor está saturado"""
+        monkeypatch.setattr(main, "OFFLOAD_MIN_DIGITS", 1)
+        offloader.inflight = offloader.max_queue
+        response = client.post("/calculate", json={"a": 1, "b": 3, "operation": "divide", "precision": "decimal"})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        offloader.inflight = 0
+
+    def test_health_and_stats(self, offloader):
+        """Prueba el retraso del loop en /health y GET /offload"""
+        assert "event_loop_lag_ms" in client.get("/health").json()
+        data = client.get("/offload").json()
+        assert data["executor"]["executor"] == "thread"
+        assert "max_ms" in data["event_loop"]
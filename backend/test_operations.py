@@ -0,0 +1,129 @@
+import decimal
+import math
+from fractions import Fraction
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import engine, main
+from app.expressions import CompiledExpression, ExpressionError
+from app.operations import OPERATIONS, OperationError
+from app.precision import compute_exact, decimal_context
+
+client = TestClient(main.app)
+
+
+class TestOperationRegistry:
+    """Pruebas del registro de operaciones"""
+
+    def test_matches_enum(self):
+        """Prueba que cada OperationType tiene una entrada con código propio"""
+        assert set(OPERATIONS) == {operation.value for operation in main.OperationType}
+        assert sorted(operation.code for operation in OPERATIONS.values()) == list(range(len(OPERATIONS)))
+
+    @pytest.mark.parametrize("name, a, b, expected", [
+        ("power", 2.0, 10.0, 1024.0),
+        ("power", -2.0, 3.0, -8.0),
+        ("power", 10.0, 400.0, math.inf),
+        ("power", -10.0, 401.0, -math.inf),
+        ("modulo", -7.0, 3.0, 2.0),
+        ("modulo", 7.0, -3.0, -2.0),
+        ("integer_divide", -7.0, 2.0, -4.0),
+        ("percentage", 15.0, 200.0, 30.0),
+    ])
+    def test_float(self, name, a, b, expected):
+        """Prueba el resultado float de las operaciones nuevas"""
+        assert OPERATIONS[name].apply(a, b) == expected
+
+    @pytest.mark.parametrize("name, a, b, error", [
+        ("modulo", 1.0, 0.0, ZeroDivisionError),
+        ("integer_divide", 1.0, 0.0, ZeroDivisionError),
+        ("power", 0.0, -1.0, ZeroDivisionError),
+        ("power", -8.0, 1 / 3, OperationError),
+    ])
+    def test_validation(self, name, a, b, error):
+        """Prueba que las validaciones rechazan los operandos no definidos"""
+        with pytest.raises(error):
+            OPERATIONS[name].apply(a, b)
+
+    @pytest.mark.parametrize("name", ["modulo", "integer_divide"])
+    def test_exact_rounds_like_float(self, name):
+        """Prueba que en modo exacto el resto y el cociente siguen el signo de float"""
+        context = decimal_context()
+        for a, b in [(-7, 3), (7, -3), (-7, -3), (7, 3), (-6, 3)]:
+            expected = OPERATIONS[name].function(float(a), float(b))
+            for mode in ("decimal", "fraction"):
+                value = compute_exact(decimal.Decimal(a), decimal.Decimal(b), name, mode, context)
+                assert value == expected, (name, a, b, mode)
+
+    def test_exact_power_and_percentage(self):
+        """Prueba la potencia y el porcentaje exactos"""
+        context = decimal_context()
+        two, minus_two = decimal.Decimal(2), decimal.Decimal(-2)
+        assert compute_exact(two, minus_two, "power", "fraction", context) == Fraction(1, 4)
+        assert compute_exact(decimal.Decimal("0.1"), decimal.Decimal("0.3"), "percentage", "decimal", context) == (
+            decimal.Decimal("0.0003")
+        )
+        with pytest.raises(OperationError):
+            compute_exact(two, decimal.Decimal("0.5"), "power", "fraction", context)
+        with pytest.raises(OperationError):
+            compute_exact(two, decimal.Decimal(10 ** 7), "power", "fraction", context)
+
+    def test_vectorized(self):
+        """Prueba el motor vectorizado con las operaciones nuevas"""
+        if not engine.HAS_NUMPY:
+            pytest.skip("NumPy no disponible")
+        codes = [OPERATIONS[name].code for name in ("power", "power", "modulo", "integer_divide", "percentage")]
+        result, invalid = engine.evaluate_columns([-8.0, 3.0, 5.0, 5.0, 50.0], [0.5, 2.0, 0.0, 2.0, 3.0], codes)
+        assert invalid.tolist() == [True, False, True, False, False]
+        assert [result[1], result[3], result[4]] == [9.0, 2.0, 1.5]
+
+
+class TestOperationEndpoints:
+    """Pruebas de las operaciones nuevas en la API"""
+
+    def test_calculate(self):
+        """Prueba /calculate con etiqueta y tipo de operación"""
+        response = client.post("/calculate", json={"a": 15, "b": 200, "operation": "percentage"})
+        assert response.json()["result"] == 30
+        assert response.json()["operation"] == "15.0 % de 200.0"
+        response = client.post("/calculate", json={"a": 2, "b": 10, "operation": "power"})
+        assert response.json()["operation"] == "2.0 ^ 10.0"
+
+    def test_calculate_errors(self):
+        """Prueba el 400 con el mensaje de cada validación"""
+        response = client.post("/calculate", json={"a": 1, "b": 0, "operation": "modulo"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "No se puede dividir por cero"
+        response = client.post("/calculate", json={"a": -8, "b": 0.5, "operation": "power", "precision": "decimal"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Una base negativa requiere un exponente entero"
+
+    def test_batch(self):
+        """Prueba los mensajes de error por elemento en /calculate/batch"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 7, "b": 2, "operation": "integer_divide"},
+            {"a": -8, "b": 0.5, "operation": "power"},
+            {"a": 7, "b": 0, "operation": "modulo"},
+        ])
+        results = response.json()["results"]
+        assert results[0]["result"] == 3
+        assert results[1]["error"] == "Una base negativa requiere un exponente entero"
+        assert results[2]["error"] == "No se puede dividir por cero"
+
+
+class TestExpressionOperators:
+    """Pruebas de los operadores nuevos en las expresiones"""
+
+    def test_operators(self):
+        """Prueba **, ^, % y // con la misma semántica que /calculate"""
+        expression = CompiledExpression("x ** 2 + x ^ 2 - x % 3 + x // 2")
+        assert expression.evaluate({"x": -5}) == 25 + 25 - 1 - 3
+        assert expression.evaluate_many({"x": [-5, 4]}) == [46, 33]
+
+    def test_undefined_rows(self):
+        """Prueba None en las filas donde la operación no está definida"""
+        expression = CompiledExpression("x ** y + x % y")
+        assert expression.evaluate_many({"x": [-8, 4, 1], "y": [0.5, 2, 0]}) == [None, 16, None]
+        with pytest.raises(ExpressionError):
+            CompiledExpression("(-8) ** 0.5")
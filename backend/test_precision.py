@@ -0,0 +1,160 @@
+import decimal
+import time
+from fractions import Fraction
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.precision import compute_exact, decimal_context, parse_batch_operands, parse_operands
+
+client = TestClient(main.app)
+
+
+class TestExactArithmetic:
+    """Pruebas de la aritmética Decimal/Fraction"""
+
+    def test_operands_skip_float(self):
+        """Prueba que los operandos se leen del JSON sin pasar por float"""
+        a, b = parse_operands(b'{"a": 0.1, "b": 12345678901234567890.12, "operation": "add"}')
+        assert a == decimal.Decimal("0.1")
+        assert b == decimal.Decimal("12345678901234567890.12")
+
+    def test_decimal_context(self):
+        """Prueba que el contexto se reutiliza y limita la precisión"""
+        context = decimal_context(5)
+        assert decimal_context(5) is context
+        one, three = decimal.Decimal(1), decimal.Decimal(3)
+        assert compute_exact(one, three, "divide", "decimal", context) == decimal.Decimal("0.33333")
+
+    def test_fraction(self):
+        """Prueba que el modo fraction es exacto"""
+        result = compute_exact(decimal.Decimal(1), decimal.Decimal(3), "divide", "fraction", decimal_context())
+        assert result == Fraction(1, 3)
+
+    def test_division_by_zero(self):
+        """Prueba que ambos modos rechazan la división por cero"""
+        for mode in ("decimal", "fraction"):
+            with pytest.raises(ZeroDivisionError):
+                compute_exact(decimal.Decimal(1), decimal.Decimal(0), "divide", mode, decimal_context())
+
+    def test_batch_operands_skip_float(self):
+        """Prueba que los operandos de un lote se leen sin pasar por float"""
+        operands = parse_batch_operands(b'[{"a": 1, "b": 0.12345678901234567890123}, 7, {"a": 1}]')
+        assert operands == [(decimal.Decimal(1), decimal.Decimal("0.12345678901234567890123")), None, None]
+
+
+class TestPrecisionEndpoint:
+    """Pruebas de los modos de precisión en /calculate"""
+
+    def test_float_is_default(self):
+        """Prueba que el modo float no cambia la respuesta"""
+        data = client.post("/calculate", json={"a": 0.1, "b": 0.2, "operation": "add"}).json()
+        assert data["result"] == 0.3
+        assert "exact_result" not in data
+
+    def test_decimal_request(self):
+        """Prueba el modo decimal por petición"""
+        response = client.post("/calculate", json={"a": 0.1, "b": 0.2, "operation": "add", "precision": "decimal"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["exact_result"] == "0.3"
+        assert data["operation"] == "0.1 + 0.2"
+        assert data["result"] == 0.3
+
+    def test_fraction_request(self):
+        """Prueba el modo fraction por petición"""
+        data = client.post("/calculate", json={"a": 1, "b": 3, "operation": "divide", "precision": "fraction"}).json()
+        assert data["exact_result"] == "1/3"
+
+    def test_exact_division_by_zero(self):
+        """Prueba el 400 por división por cero en modo exacto"""
+        response = client.post("/calculate", json={"a": 1, "b": 0, "operation": "divide", "precision": "decimal"})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "No se puede dividir por cero"
+
+    def test_invalid_precision(self):
+        """Prueba que un modo desconocido es un error de validación"""
+        response = client.post("/calculate", json={"a": 1, "b": 2, "operation": "add", "precision": "double"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "precision"]
+
+    def test_deployment_default(self, monkeypatch):
+        """Prueba el modo por defecto del despliegue"""
+        monkeypatch.setattr(main, "DEFAULT_PRECISION", main.PrecisionMode.DECIMAL)
+        data = client.post("/calculate", json={"a": 1.1, "b": 2.2, "operation": "multiply"}).json()
+        assert data["exact_result"] == "2.42"
+        data = client.post("/calculate", json={"a": 1.1, "b": 2.2, "operation": "multiply", "precision": "float"}).json()
+        assert "exact_result" not in data
+
+    def test_batch_precision(self):
+        """Prueba los modos exactos dentro de un lote"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 0.1, "b": 0.2, "operation": "add", "precision": "decimal"},
+            {"a": 0.1, "b": 0.2, "operation": "add"},
+            {"a": 2, "b": 0, "operation": "divide", "precision": "fraction"},
+        ])
+        results = response.json()["results"]
+        assert results[0]["exact_result"] == "0.3"
+        assert results[1]["exact_result"] is None
+        assert results[1]["result"] == 0.3
+        assert results[2]["status_code"] == 400
+
+    @pytest.mark.parametrize("body, detail", [
+        (b'{"a": 1e300, "b": 1e300, "operation": "multiply", "precision": "fraction"}', "rango"),
+        (b'{"a": 10, "b": 400, "operation": "power", "precision": "fraction"}', "rango"),
+        (b'{"a": Infinity, "b": 1, "operation": "add", "precision": "fraction"}', "finitos"),
+        (b'{"a": NaN, "b": 1, "operation": "add", "precision": "decimal"}', "finitos"),
+        (b'{"a": 1e-5000, "b": 1, "operation": "add", "precision": "fraction"}', "4300 cifras"),
+    ])
+    def test_unrepresentable_results(self, body, detail):
+        """Prueba el 400 cuando el resultado exacto no cabe en float o en el texto"""
+        response = client.post("/calculate", content=body, headers={"content-type": "application/json"})
+        assert response.status_code == 400
+        assert detail in response.json()["detail"]
+
+    def test_huge_power_exponent_is_cheap(self):
+        """Prueba que un exponente enorme se rechaza sin convertirlo a entero en el event loop"""
+        for exponent in ("1e999990", "1e6", "1e99999999"):
+            body = f'{{"a": 2, "b": {exponent}, "operation": "power", "precision": "fraction"}}'.encode()
+            start = time.perf_counter()
+            response = client.post("/calculate", content=body, headers={"content-type": "application/json"})
+            assert time.perf_counter() - start < 0.5
+            assert response.status_code == 400
+            assert "demasiado grande" in response.json()["detail"]
+
+    def test_huge_fraction_operand_is_cheap(self):
+        """Prueba que un operando con un exponente enorme se rechaza antes de construir la Fraction"""
+        for operand in ("1e30000000", "1e-30000000", "1e100001"):
+            body = f'{{"a": {operand}, "b": 1, "operation": "add", "precision": "fraction"}}'.encode()
+            start = time.perf_counter()
+            response = client.post("/calculate", content=body, headers={"content-type": "application/json"})
+            assert time.perf_counter() - start < 0.5
+            assert response.status_code == 400
+            assert "no pueden superar 100000 cifras" in response.json()["detail"]
+
+    @pytest.mark.parametrize("body", [
+        b'{"a": 1, "b": 2, "operation": "add", "precision": "decimal"}',
+        b'{"a": 1, "b": 3, "operation": "divide", "precision": "fraction"}',
+        b'{"a": 0.12345678901234567890123, "b": 1, "operation": "add", "precision": "decimal"}',
+        b'{"a": 0.12345678901234567890123, "b": 1, "operation": "multiply", "precision": "fraction"}',
+    ])
+    def test_batch_matches_single(self, body):
+        """Prueba que un lote da la misma etiqueta y resultado exacto que /calculate"""
+        headers = {"content-type": "application/json"}
+        single = client.post("/calculate", content=body, headers=headers).json()
+        batch = client.post("/calculate/batch", content=b"[" + body + b"]", headers=headers).json()["results"][0]
+        ndjson = client.post("/calculate/batch/ndjson", content=body + b"\n").json()["results"][0]
+        for item in (batch, ndjson):
+            assert (item["operation"], item["exact_result"], item["result"]) == (
+                single["operation"], single["exact_result"], single["result"]
+            )
+
+    def test_batch_unrepresentable_item(self):
+        """Prueba que un resultado exacto no representable solo falla su entrada del lote"""
+        response = client.post("/calculate/batch", json=[
+            {"a": 1e300, "b": 1e300, "operation": "multiply", "precision": "fraction"},
+            {"a": 1, "b": 1, "operation": "add"},
+        ])
+        assert response.status_code == 200
+        assert [item["status_code"] for item in response.json()["results"]] == [400, 200]
@@ -0,0 +1,139 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.ratelimit import AdmissionControl, AdmissionMiddleware, TokenBuckets, create_admission_control
+
+
+def admission_client(control: AdmissionControl) -> TestClient:
+    return TestClient(AdmissionMiddleware(main.app, control))
+
+
+class TestTokenBuckets:
+    """Pruebas de los cubos de fichas"""
+
+    def test_burst_then_refill(self):
+        """Prueba que se admite la ráfaga y luego se recupera al ritmo configurado"""
+        buckets = TokenBuckets(rate=2, burst=3)
+        assert [buckets.take("a", 1, now=0) for _ in range(3)] == [0, 0, 0]
+        assert buckets.take("a", 1, now=0) == pytest.approx(0.5)
+        assert buckets.take("a", 1, now=0.5) == 0
+        assert buckets.take("b", 1, now=0.5) == 0
+
+    def test_cost_capped_at_burst(self):
+        """Prueba que un coste mayor que el cubo se admite con el cubo lleno"""
+        buckets = TokenBuckets(rate=1, burst=5)
+        assert buckets.take("a", 50, now=0) == 0
+        assert buckets.take("a", 50, now=1) == pytest.approx(4)
+
+    def test_idle_keys_evicted(self):
+        """Prueba que las claves inactivas (cubo ya lleno) se descartan"""
+        buckets = TokenBuckets(rate=1, burst=2)
+        buckets.take("a", 1, now=0)
+        buckets.take("b", 1, now=1)
+        buckets.take("c", 1, now=2.5)
+        assert len(buckets) == 2
+        buckets.take("d", 1, now=10)
+        assert len(buckets) == 1
+
+    def test_max_keys(self):
+        """Prueba que nunca hay más claves que el máximo"""
+        buckets = TokenBuckets(rate=1, burst=1000, max_keys=3)
+        for number in range(10):
+            buckets.take(str(number), 1, now=0)
+        assert len(buckets) == 3
+
+    def test_invalid(self):
+        """Prueba que rate y burst deben ser positivos"""
+        with pytest.raises(ValueError):
+            TokenBuckets(rate=0, burst=1)
+
+
+class TestAdmissionMiddleware:
+    """Pruebas del control de admisión sobre la API"""
+
+    @pytest.fixture(autouse=True)
+    def clean_history(self):
+        main.history_db.clear_history()
+        yield
+        main.history_db.clear_history()
+
+    def test_rate_limit_per_client(self):
+        """Prueba el 429 con Retry-After y que cada clave configurada tiene su propio cubo"""
+        client = admission_client(AdmissionControl(TokenBuckets(rate=0.5, burst=2), api_keys=["otra"]))
+        payload = {"a": 1, "b": 2, "operation": "add"}
+        assert client.post("/calculate", json=payload).status_code == 200
+        assert client.post("/calculate", json=payload).status_code == 200
+        response = client.post("/calculate", json=payload)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "2"
+        assert client.post("/calculate", json=payload, headers={"X-API-Key": "otra"}).status_code == 200
+        assert client.get("/health").status_code == 200
+
+    def test_unknown_api_keys_share_ip_bucket(self):
+        """Prueba que una X-API-Key no configurada no da un cubo nuevo"""
+        control = AdmissionControl(TokenBuckets(rate=0.5, burst=2), api_keys=["buena"])
+        client = admission_client(control)
+        payload = {"a": 1, "b": 2, "operation": "add"}
+        statuses = [
+            client.post("/calculate", json=payload, headers={"X-API-Key": f"k{number}"}).status_code
+            for number in range(5)
+        ]
+        assert statuses == [200, 200, 429, 429, 429]
+        assert list(control.buckets._buckets) == ["ip:testclient"]
+
+    def test_history_cost_by_size(self, monkeypatch):
+        """Prueba que /history cuesta según los registros que puede devolver"""
+        monkeypatch.setattr(main, "HISTORY_ROWS_PER_TOKEN", 1)
+        control = AdmissionControl(TokenBuckets(rate=1, burst=100), costs={"/history": main.history_cost})
+        client = admission_client(control)
+        for number in range(10):
+            TestClient(main.app).post("/calculate", json={"a": number, "b": 0, "operation": "add"})
+        assert client.get("/history", params={"limit": 2}).status_code == 200
+        assert control.buckets._buckets["ip:testclient"][0] == pytest.approx(97, abs=0.5)
+        client.get("/history")
+        assert control.buckets._buckets["ip:testclient"][0] == pytest.approx(86, abs=0.5)
+
+    def test_concurrency_cap(self):
+        """Prueba que por encima del tope global se responde 503 al momento"""
+        control = AdmissionControl(max_concurrency=1)
+        middleware = AdmissionMiddleware(main.app, control)
+
+        async def run():
+            transport = httpx.ASGITransport(app=middleware)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                control.active = 1
+                busy = await client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+                health = await client.get("/health")
+                control.active = 0
+                ok = await client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+                return busy, health, ok
+
+        busy, health, ok = asyncio.run(run())
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "1"
+        assert health.status_code == 200
+        assert ok.status_code == 200
+        assert control.active == 0
+        assert control.stats()["shed"] == 1
+
+    def test_factory(self, monkeypatch):
+        """Prueba la configuración por entorno"""
+        monkeypatch.delenv("RATE_LIMIT_RATE", raising=False)
+        monkeypatch.delenv("MAX_CONCURRENT_REQUESTS", raising=False)
+        monkeypatch.delenv("RATE_LIMIT_API_KEYS", raising=False)
+        assert create_admission_control() is None
+        monkeypatch.setenv("RATE_LIMIT_RATE", "10")
+        control = create_admission_control()
+        assert control.buckets.burst == 20
+        assert control.max_concurrency is None
+        assert control.api_keys == frozenset()
+        monkeypatch.setenv("RATE_LIMIT_API_KEYS", "uno, dos,,")
+        assert create_admission_control().api_keys == {"uno", "dos"}
+
+    def test_stats_endpoint(self):
+        """Prueba GET /admission sin control configurado"""
+        assert TestClient(main.app).get("/admission").json() == {"enabled": False}
@@ -0,0 +1,78 @@
+import json
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import responses
+from app.main import app
+from app.responses import FastJSONResponse
+
+client = TestClient(app)
+
+
+class TestFastJSONResponse:
+    """Pruebas de la serialización rápida de respuestas"""
+
+    def test_render_matches_stdlib_json(self):
+        """Prueba que el cuerpo equivale al JSON estándar"""
+        content = {"result": 25.7, "operation": "6.0 × 7.0", "timestamp": "2025-01-01T00:00:00"}
+        body = FastJSONResponse(content).body
+        assert json.loads(body) == content
+        assert "×".encode("utf-8") in body
+
+    def test_calculate_returns_json(self):
+        """Prueba que /calculate mantiene tipo de contenido y forma"""
+        response = client.post("/calculate", json={"a": 6, "b": 7, "operation": "multiply"})
+        assert response.headers["content-type"] == "application/json"
+        assert set(response.json()) == {"result", "operation", "timestamp"}
+
+    @pytest.mark.parametrize("body", [
+        {"a": 1e308, "b": 10, "operation": "multiply"},
+        {"a": 10, "b": 400, "operation": "power"},
+        {"a": -10, "b": 401, "operation": "power"},
+    ])
+    def test_overflow_is_400(self, body):
+        """Prueba que un resultado fuera del rango de float es un 400 y no un null"""
+        response = client.post("/calculate", json=body)
+        assert response.status_code == 400
+        assert "rango" in response.json()["detail"]
+        results = client.post("/calculate/batch", json=[body, {"a": 1, "b": 2, "operation": "add"}]).json()["results"]
+        assert [item["status_code"] for item in results] == [400, 200]
+        assert "rango" in results[0]["error"]
+
+    def test_stdlib_fallback_non_finite(self, monkeypatch):
+        """Prueba que sin orjson los valores no finitos también se escriben como null"""
+        content = {"result": math.inf, "results": [1.5, -math.inf, math.nan], "operation": "÷"}
+        expected = responses.dumps(content)
+        monkeypatch.setattr(responses, "orjson", None)
+        assert json.loads(responses.dumps(content)) == json.loads(expected)
+        assert json.loads(responses.dumps(content)) == {"result": None, "results": [1.5, None, None], "operation": "÷"}
+
+    def test_openapi_refs_resolve(self):
+        """Prueba que todas las referencias $ref del esquema OpenAPI existen"""
+        schema = app.openapi()
+
+        def refs(node):
+            if isinstance(node, dict):
+                if "$ref" in node:
+                    yield node["$ref"]
+                for value in node.values():
+                    yield from refs(value)
+            elif isinstance(node, list):
+                for value in node:
+                    yield from refs(value)
+
+        found = set(refs(schema))
+        assert "#/components/schemas/CalculationRequest" in found
+        components = schema["components"]["schemas"]
+        assert {ref for ref in found if ref.rsplit("/", 1)[-1] not in components} == set()
+        assert components["CalculationRequest"]["properties"]["precision"] == {
+            "anyOf": [{"$ref": "#/components/schemas/PrecisionMode"}, {"type": "null"}],
+        }
+
+    def test_openapi_keeps_response_models(self):
+        """Prueba que el esquema OpenAPI sigue documentando los modelos"""
+        schema = client.get("/openapi.json").json()
+        calculate = schema["paths"]["/calculate"]["post"]["responses"]["200"]
+        assert calculate["content"]["application/json"]["schema"]["$ref"].endswith("/CalculationResponse")
@@ -0,0 +1,275 @@
+import math
+import sqlite3
+import threading
+
+import pytest
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.history import CalculationHistory, HistoryRecord, create_history_backend
+from app.sqlite_history import SQLiteHistory
+
+
+def make_record(i, operation_type="add"):
+    return HistoryRecord(float(i), f"{i} + 0", f"2025-01-01T00:00:{i:02d}", operation_type=operation_type)
+
+
+@pytest.fixture
+def history(tmp_path):
+    backend = SQLiteHistory(path=str(tmp_path / "history.db"), flush_interval_ms=5)
+    yield backend
+    backend.close()
+
+
+class TestSQLiteHistory:
+    """Pruebas del historial persistente en SQLite"""
+
+    def test_add_and_read(self, history):
+        """Prueba que las altas encoladas se leen en orden"""
+        for i in range(5):
+            history.add_calculation(make_record(i))
+        records = history.get_history()
+        assert [r.result for r in records] == [0, 1, 2, 3, 4]
+        assert [r.seq for r in records] == [1, 2, 3, 4, 5]
+        assert records[0].operation_type == "add"
+
+    def test_wal_mode(self, history):
+        """Prueba que la base de datos está en modo WAL"""
+        assert history._reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_group_commit(self, history):
+        """Prueba que un lote se confirma en una sola transacción"""
+        history.add_many([make_record(i) for i in range(100)])
+        history.flush()
+        assert history.written == 100
+        assert history.flushes == 1
+
+    def test_pagination_and_since(self, history):
+        """Prueba cursor, límite y filtro por timestamp"""
+        history.add_many([make_record(i) for i in range(10)])
+        assert [r.seq for r in history.get_page(cursor=3, limit=2)] == [4, 5]
+        assert [r.result for r in history.get_page(since="2025-01-01T00:00:08")] == [8, 9]
+
+    def test_filters(self, history):
+        """Prueba los filtros por operación, rango de tiempo y resultado"""
+        history.add_many([make_record(i, ["add", "divide"][i % 2]) for i in range(10)])
+        assert [r.result for r in history.get_page(operation_type="divide")] == [1, 3, 5, 7, 9]
+        records = history.get_page(since="2025-01-01T00:00:02", until="2025-01-01T00:00:06", operation_type="add")
+        assert [r.result for r in records] == [2, 4, 6]
+        assert [r.result for r in history.get_page(min_result=4, max_result=7, limit=3)] == [4, 5, 6]
+        assert history.get_page(until="2024-12-31") == []
+
+    def test_time_filters_ignore_id_order(self, history):
+        """Prueba los filtros de tiempo con ids que no siguen el orden de los timestamps"""
+        # Otro proceso confirma antes una alta con timestamp posterior
+        history.add_many([
+            HistoryRecord(2.0, "b", "2025-01-01T00:00:00.200000"),
+            HistoryRecord(1.0, "a", "2025-01-01T00:00:00.100000"),
+        ])
+        assert [r.result for r in history.get_page(since="2025-01-01T00:00:00.050000")] == [2, 1]
+        assert [r.result for r in history.get_page(until="2025-01-01T00:00:00.250000")] == [2, 1]
+        assert [r.result for r in history.get_page(since="2025-01-01T00:00:00.150000")] == [2]
+        assert [r.result for r in history.get_page(until="2025-01-01T00:00:00.150000")] == [1]
+
+    def test_entry_count(self, history, tmp_path):
+        """Prueba el contador de registros que no consulta el fichero"""
+        assert history.entry_count() == 0
+        history.add_many([make_record(i) for i in range(3)])
+        history.flush()
+        assert history.entry_count() == 3
+        history.clear_history()
+        assert history.entry_count() == 0
+        history.add_many([make_record(i) for i in range(2)])
+        history.flush()
+        reopened = SQLiteHistory(path=str(tmp_path / "history.db"))
+        try:
+            assert reopened.entry_count() == 2
+        finally:
+            reopened.close()
+
+    def test_clear_keeps_ids_monotonic(self, history):
+        """Prueba que tras limpiar los ids no se reutilizan"""
+        history.add_many([make_record(i) for i in range(3)])
+        history.clear_history()
+        assert history.get_history() == []
+        history.add_calculation(make_record(7))
+        assert [r.seq for r in history.get_history()] == [4]
+
+    def test_version(self, history):
+        """Prueba que la versión compartida cambia con altas y clear"""
+        initial = history.version()
+        history.add_many([make_record(i) for i in range(3)])
+        added = history.version()
+        assert added == initial + 3
+        history.clear_history()
+        assert history.version() == added + 1
+
+    def test_persists_across_instances(self, tmp_path):
+        """Prueba que el historial sobrevive a un reinicio"""
+        path = str(tmp_path / "history.db")
+        first = SQLiteHistory(path=path)
+        first.add_calculation(make_record(1))
+        first.close()
+        second = SQLiteHistory(path=path)
+        assert [r.result for r in second.get_history()] == [1]
+        assert second.memory_usage()["entries"] == 1
+        second.close()
+
+    def test_max_rows(self, tmp_path):
+        """Prueba la poda de filas antiguas"""
+        backend = SQLiteHistory(path=str(tmp_path / "history.db"), max_rows=3)
+        backend.add_many([make_record(i) for i in range(6)])
+        assert [r.result for r in backend.get_history()] == [3, 4, 5]
+        backend.close()
+
+
+class TestSQLiteWriterFailures:
+    """Pruebas de los errores del hilo escritor"""
+
+    def test_failed_batch_keeps_writer_alive(self, history, monkeypatch):
+        """Prueba que un lote fallido se descarta sin parar el escritor ni bloquear flush"""
+        update_rollups = history._update_rollups
+        calls = []
+
+        def fail_once(connection, rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise sqlite3.IntegrityError("NOT NULL constraint failed")
+            update_rollups(connection, rows)
+
+        monkeypatch.setattr(history, "_update_rollups", fail_once)
+        history.add_calculation(make_record(1))
+        assert history.flush(timeout=5)
+        history.add_calculation(make_record(2))
+        assert [r.result for r in history.get_history()] == [2]
+        usage = history.memory_usage()
+        assert (usage["failed_batches"], usage["dropped_writes"]) == (1, 1)
+
+    def test_invalid_row_spares_its_batch(self, history, monkeypatch):
+        """Prueba que una fila rechazada no descarta las demás del mismo lote"""
+        update_rollups = history._update_rollups
+
+        def reject_negative(connection, rows):
+            if any(row[0] < 0 for row in rows):
+                raise sqlite3.IntegrityError("CHECK constraint failed")
+            update_rollups(connection, rows)
+
+        monkeypatch.setattr(history, "_update_rollups", reject_negative)
+        history.add_many([make_record(1), make_record(-1), make_record(2)])
+        assert [r.result for r in history.get_history()] == [1, 2]
+        assert history.memory_usage()["dropped_writes"] == 1
+
+    def test_flush_without_writer(self, history):
+        """Prueba que flush no espera si el escritor ya no está vivo"""
+        history._queue.put(None)
+        history._writer.join()
+        assert history.flush() is False
+        assert history.get_history() == []
+
+    def test_non_finite_storage(self, history):
+        """Prueba que ±inf se conserva y NaN se guarda como NULL"""
+        history.add_many([make_record(0), HistoryRecord(math.inf, "x", "t"), HistoryRecord(math.nan, "y", "t")])
+        results = [r.result for r in history.get_history()]
+        assert results[:2] == [0, math.inf] and math.isnan(results[2])
+        assert [r.result for r in history.get_page(min_result=-1)] == [0, math.inf]
+
+    def test_migrates_not_null_result(self, tmp_path):
+        """Prueba la migración de un fichero con `result REAL NOT NULL`"""
+        path = str(tmp_path / "history.db")
+        connection = sqlite3.connect(path)
+        connection.executescript("""
+            CREATE TABLE history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, result REAL NOT NULL,
+                operation TEXT NOT NULL, operation_type TEXT, timestamp TEXT NOT NULL
+            );
+            CREATE TABLE history_rollups (
+                bucket INTEGER NOT NULL, operation_type TEXT NOT NULL, count INTEGER NOT NULL,
+                mean REAL NOT NULL, m2 REAL NOT NULL, minimum REAL NOT NULL, maximum REAL NOT NULL,
+                total REAL NOT NULL, PRIMARY KEY (bucket, operation_type)
+            );
+            INSERT INTO history_rollups VALUES (-1, 'add', 1, 1.0, 0.0, 1.0, 1.0, 1.0);
+            INSERT INTO history (result, operation, timestamp) VALUES (1, '1 + 0', 't'), (2, '2 + 0', 't');
+            DELETE FROM history WHERE id = 2;
+        """)
+        connection.commit()
+        connection.close()
+        backend = SQLiteHistory(path=path)
+        backend.add_calculation(HistoryRecord(math.nan, "x", "t", operation_type="add"))
+        assert [r.seq for r in backend.get_history()] == [1, 3]
+        assert backend.get_stats()["total"]["count"] == 2
+        columns = {row[1]: row[3] for row in backend._reader.execute("PRAGMA table_info(history)")}
+        assert columns["result"] == 0
+        assert backend._reader.execute("PRAGMA index_list(history)").fetchall()
+        backend.close()
+
+
+    def test_endpoints_leave_event_loop(self, history, monkeypatch):
+        """Prueba que las lecturas de SQLite se hacen fuera del hilo del event loop"""
+        threads = {}
+
+        def recording(name, function):
+            def wrapper(*args, **kwargs):
+                threads[name] = threading.current_thread()
+                return function(*args, **kwargs)
+            return wrapper
+
+        # history_etag se ejecuta en el event loop de la misma petición
+        monkeypatch.setattr(main, "history_etag", recording("loop", main.history_etag))
+        monkeypatch.setattr(history, "get_page", recording("read", history.get_page))
+        monkeypatch.setattr(main, "history_db", history)
+        client = TestClient(main.app)
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+        assert [item["result"] for item in client.get("/history").json()] == [3]
+        assert client.get("/history/stats").json()["total"]["count"] == 1
+        assert client.delete("/history").status_code == 200
+        assert threads["read"] is not threads["loop"]
+
+
+class TestBackendSelection:
+    """Pruebas de la selección de backend según los workers"""
+
+    def test_multiple_workers_default_to_sqlite(self, tmp_path, monkeypatch):
+        """Prueba que con varios workers el historial por defecto es compartido"""
+        monkeypatch.delenv("HISTORY_BACKEND", raising=False)
+        monkeypatch.setenv("WEB_CONCURRENCY", "4")
+        monkeypatch.setenv("HISTORY_SQLITE_PATH", str(tmp_path / "history.db"))
+        backend = create_history_backend()
+        assert isinstance(backend, SQLiteHistory)
+        backend.close()
+
+    def test_single_worker_defaults_to_memory(self, monkeypatch):
+        """Prueba que con un worker se mantiene el historial en memoria"""
+        monkeypatch.delenv("HISTORY_BACKEND", raising=False)
+        monkeypatch.setenv("WEB_CONCURRENCY", "1")
+        assert isinstance(create_history_backend(), CalculationHistory)
+
+
+class TestSQLiteStats:
+    """Pruebas de los agregados persistidos en SQLite"""
+
+    def test_non_finite_results(self, history):
+        """Prueba que inf y NaN se guardan y se cuentan aparte en los rollups"""
+        history.add_many([make_record(2), HistoryRecord(math.inf, "x", "t"), HistoryRecord(math.nan, "y", "t")])
+        assert len(history.get_history()) == 3
+        total = history.get_stats()["total"]
+        assert (total["count"], total["non_finite"], total["mean"]) == (3, 2, 2.0)
+        assert history.memory_usage()["dropped_writes"] == 0
+
+    def test_rollups_survive_restart_and_clear(self, tmp_path):
+        """Prueba que los agregados se persisten y se reinician al limpiar"""
+        path = str(tmp_path / "history.db")
+        first = SQLiteHistory(path=path)
+        first.add_many([make_record(i, "add") for i in (1, 2, 3)])
+        first.add_calculation(make_record(10, "divide"))
+        first.close()
+
+        second = SQLiteHistory(path=path)
+        stats = second.get_stats()
+        assert stats["total"]["count"] == 4
+        assert stats["operations"]["add"]["mean"] == 2.0
+        assert stats["operations"]["add"]["variance"] == 1.0
+        assert second.get_stats(window_seconds=300)["operations"]["divide"]["count"] == 1
+        second.clear_history()
+        assert second.get_stats()["total"]["count"] == 0
+        second.close()
@@ -0,0 +1,119 @@
+import math
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.history import CalculationHistory, HistoryRecord
+from app import main
+from app.main import app
+from app.stats import HistoryStats, RunningStats
+
+client = TestClient(app)
+
+
+class TestRunningStats:
+    """Pruebas de los agregados de Welford"""
+
+    def test_matches_statistics_module(self):
+        """Prueba media y varianza frente al módulo statistics"""
+        values = [1.5, -2.0, 3.25, 10.0, 0.0, 7.5]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        assert math.isclose(stats.mean, statistics.mean(values))
+        assert math.isclose(stats.variance, statistics.variance(values))
+        assert (stats.minimum, stats.maximum, stats.total) == (-2.0, 10.0, sum(values))
+
+    def test_merge_equals_sequential(self):
+        """Prueba que combinar dos acumulados equivale a acumular en serie"""
+        left, right, both = RunningStats(), RunningStats(), RunningStats()
+        for i, value in enumerate([3.0, 1.0, 4.0, 1.0, 5.0, 9.0, 2.0]):
+            (left if i < 3 else right).add(value)
+            both.add(value)
+        left.merge(right)
+        assert left.count == both.count
+        assert math.isclose(left.mean, both.mean)
+        assert math.isclose(left.variance, both.variance)
+
+    def test_non_finite_values(self):
+        """Prueba que inf y NaN se cuentan aparte sin estropear media ni varianza"""
+        left, right, both = RunningStats(), RunningStats(), RunningStats()
+        for i, value in enumerate([math.inf, 2.0, 4.0, math.nan, -math.inf, 6.0]):
+            (left if i < 3 else right).add(value)
+            both.add(value)
+        left.merge(right)
+        for stats in (left, both):
+            assert (stats.count, stats.non_finite) == (6, 3)
+            assert stats.to_dict()["mean"] == 4.0 and stats.variance == 4.0
+            assert (stats.minimum, stats.maximum, stats.total) == (2.0, 6.0, 12.0)
+        only_inf = RunningStats()
+        only_inf.add(math.inf)
+        assert only_inf.to_dict()["mean"] is None
+        assert RunningStats.from_values(*only_inf.values()).non_finite == 1
+
+
+class TestHistoryStats:
+    """Pruebas de los agregados del historial"""
+
+    def test_per_operation_and_reset(self):
+        """Prueba conteos por operación y el reinicio al limpiar"""
+        history = CalculationHistory(max_size=2)
+        for result, operation in [(1.0, "add"), (3.0, "add"), (10.0, "divide")]:
+            history.add_calculation(HistoryRecord(result, "op", "t", operation_type=operation))
+        snapshot = history.get_stats()
+        # Los agregados incluyen también la entrada ya desalojada del buffer
+        assert snapshot["total"]["count"] == 3
+        assert snapshot["operations"]["add"]["mean"] == 2.0
+        assert snapshot["operations"]["divide"]["max"] == 10.0
+        history.clear_history()
+        assert history.get_stats()["total"]["count"] == 0
+
+    def test_time_window(self):
+        """Prueba que la ventana solo incluye cubetas recientes"""
+        stats = HistoryStats(bucket_seconds=60)
+        stats.add(1.0, "add", now=0)
+        stats.add(5.0, "add", now=600)
+        stats.add(7.0, "multiply", now=650)
+        window = stats.snapshot(window_seconds=120, now=660)
+        assert window["total"]["count"] == 2
+        assert set(window["operations"]) == {"add", "multiply"}
+        assert stats.snapshot(now=660)["total"]["count"] == 3
+
+
+class TestHistoryStatsEndpoint:
+    """Pruebas del endpoint /history/stats"""
+
+    def setup_method(self):
+        client.delete("/history")
+
+    def test_stats_endpoint(self):
+        """Prueba que el endpoint refleja los cálculos realizados"""
+        client.post("/calculate", json={"a": 1, "b": 2, "operation": "add"})
+        client.post("/calculate", json={"a": 3, "b": 4, "operation": "add"})
+        client.post("/calculate", json={"a": 6, "b": 7, "operation": "multiply"})
+        data = client.get("/history/stats").json()
+        assert data["total"]["count"] == 3
+        assert data["operations"]["add"]["sum"] == 10
+        assert data["operations"]["multiply"]["mean"] == 42
+        windowed = client.get("/history/stats", params={"window": 300}).json()
+        assert windowed["total"]["count"] == 3
+
+    def test_overflow_result(self):
+        """Prueba que un resultado desbordado no deja los agregados en null"""
+        client.post("/calculate", json={"a": 2, "b": 3, "operation": "add"})
+        # /calculate rechaza el desbordamiento: solo llega al historial importado
+        main.history_db.add_calculation(
+            HistoryRecord(math.inf, "1e308 × 10", operation_type="multiply", epoch_ns=time.time_ns())
+        )
+        data = client.get("/history/stats").json()
+        assert (data["total"]["count"], data["total"]["non_finite"]) == (2, 1)
+        assert data["total"]["sum"] == 5 and data["total"]["mean"] == 5
+        assert data["operations"]["multiply"]["mean"] is None
+
+    def test_empty_stats(self):
+        """Prueba los agregados de un historial vacío"""
+        data = client.get("/history/stats").json()
+        assert data["total"] == {
+            "count": 0, "non_finite": 0, "sum": 0.0, "mean": None, "variance": None, "stddev": None, "min": None, "max": None,
+        }
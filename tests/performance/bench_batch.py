@@ -0,0 +1,60 @@
+"""Benchmark: /calculate individual frente a /calculate/batch.
+
+Uso: python tests/performance/bench_batch.py [operaciones] [tamaño_lote]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+
+def make_requests(n):
+    rng = random.Random(42)
+    return [
+        {"a": rng.uniform(-1000, 1000), "b": rng.uniform(-1000, 1000), "operation": rng.choice(OPERATIONS)}
+        for _ in range(n)
+    ]
+
+
+def bench_single(client, payloads):
+    start = time.perf_counter()
+    for payload in payloads:
+        client.post("/calculate", json=payload)
+    return time.perf_counter() - start
+
+
+def bench_batch(client, payloads, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(payloads), batch_size):
+        client.post("/calculate/batch", json=payloads[i:i + batch_size])
+    return time.perf_counter() - start
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    payloads = make_requests(total)
+    client = TestClient(app)
+
+    client.delete("/history")
+    single = bench_single(client, payloads)
+    client.delete("/history")
+    batch = bench_batch(client, payloads, batch_size)
+    client.delete("/history")
+
+    print(f"operaciones: {total}  tamaño de lote: {batch_size}")
+    print(f"individual: {single:.3f}s  ({total / single:,.0f} ops/s)")
+    print(f"lote:       {batch:.3f}s  ({total / batch:,.0f} ops/s)")
+    print(f"mejora:     x{single / batch:.1f}")
+
+
+if __name__ == "__main__":
+    main()
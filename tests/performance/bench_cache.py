@@ -0,0 +1,70 @@
+"""Benchmark: CPU por petición de /calculate con y sin caché de resultados.
+
+Reproduce una traza NDJSON de peticiones (una CalculationRequest por línea)
+o, si no se indica, una traza sintética con distribución Zipf. Uso:
+
+    python tests/performance/bench_cache.py [traza.ndjson] [--size 4096]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app import main as api  # noqa: E402
+from app.cache import ResultCache  # noqa: E402
+
+
+def synthetic_trace(n=200000, distinct=5000):
+    rng = random.Random(3)
+    operations = ["add", "subtract", "multiply", "divide"]
+    pool = [
+        {"a": round(rng.uniform(1, 1000), 2), "b": round(rng.uniform(1, 1000), 2), "operation": rng.choice(operations)}
+        for _ in range(distinct)
+    ]
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    return rng.choices(pool, weights=weights, k=n)
+
+
+def load_trace(path):
+    with open(path) as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def replay(requests):
+    for request in requests:
+        api.calculate_one(request)
+
+
+def measure(requests, cache):
+    api.result_cache = cache
+    api.history_db.clear_history()
+    start = time.process_time()
+    replay(requests)
+    elapsed = time.process_time() - start
+    return elapsed / len(requests) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("trace", nargs="?")
+    parser.add_argument("--size", type=int, default=4096)
+    args = parser.parse_args()
+
+    payloads = load_trace(args.trace) if args.trace else synthetic_trace()
+    requests = [api.CalculationRequest(**payload) for payload in payloads]
+
+    without = measure(requests, None)
+    cache = ResultCache(max_size=args.size)
+    with_cache = measure(requests, cache)
+    stats = cache.stats()
+    print(f"peticiones: {len(requests)}  caché: {args.size}  tasa de acierto: {stats['hit_rate']:.1%}")
+    print(f"sin caché: {without:6.2f} µs CPU/petición")
+    print(f"con caché: {with_cache:6.2f} µs CPU/petición  ({(without - with_cache) / without:+.1%} ahorro)")
+
+
+if __name__ == "__main__":
+    main()
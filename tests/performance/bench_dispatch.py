@@ -0,0 +1,81 @@
+"""Benchmark: despacho de operaciones con la escalera if/elif frente al registro.
+
+Compara, por operación, el coste del cálculo y la etiqueta de /calculate
+con la escalera if/elif original (copiada aquí como referencia, con su
+`try/except Exception`) y con el registro de app/operations.py, y mide
+además `calculate_one` completo (incluye el alta en el historial). Uso:
+
+    python tests/performance/bench_dispatch.py [repeticiones]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from fastapi import HTTPException  # noqa: E402
+
+from app import main as api  # noqa: E402
+from app.decoding import FastCalculationRequest  # noqa: E402
+from app.operations import OPERATIONS, OperationError  # noqa: E402
+
+OperationType = api.OperationType
+
+
+def legacy_compute(a: float, b: float, operation):
+    if operation == OperationType.ADD:
+        return a + b, "+"
+    elif operation == OperationType.SUBTRACT:
+        return a - b, "-"
+    elif operation == OperationType.MULTIPLY:
+        return a * b, "×"
+    elif operation == OperationType.DIVIDE:
+        if b == 0:
+            raise HTTPException(status_code=400, detail="No se puede dividir por cero")
+        return a / b, "÷"
+    raise HTTPException(status_code=400, detail="Operación no válida")
+
+
+def legacy(request):
+    try:
+        result, symbol = legacy_compute(request.a, request.b, request.operation)
+        return round(result, 6), f"{request.a} {symbol} {request.b}"
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor: {str(e)}")
+
+
+def registry(request):
+    spec = OPERATIONS[request.operation]
+    try:
+        result = spec.apply(request.a, request.b)
+    except (ZeroDivisionError, OperationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return round(result, 6), spec.label(request.a, request.b)
+
+
+def per_call(function, argument, repeat: int) -> float:
+    timer = timeit.Timer(lambda: function(argument))
+    return min(timer.repeat(5, repeat)) / repeat * 1e9
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    api.result_cache = None
+    for operation in OperationType:
+        request = FastCalculationRequest(15.5, 3.25, operation)
+        after = per_call(registry, request, repeat)
+        if operation.value in ("add", "subtract", "multiply", "divide"):
+            before = f"{per_call(legacy, request, repeat):>7.0f} ns"
+        else:
+            before = "      -"
+        print(f"{operation.value:>15}  if/elif: {before}  registro: {after:>7.0f} ns")
+    request = FastCalculationRequest(15.5, 3.25, OperationType.DIVIDE)
+    api.history_db.clear_history()
+    print(f"calculate_one (divide, con historial): {per_call(api.calculate_one, request, repeat // 10):>7.0f} ns")
+    api.history_db.clear_history()
+
+
+if __name__ == "__main__":
+    main()
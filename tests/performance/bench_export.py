@@ -0,0 +1,77 @@
+"""Benchmark: exportación e importación del historial por formato y compresión.
+
+Llena un historial SQLite y mide filas/s, tamaño de salida y pico de
+memoria Python (tracemalloc) de cada combinación; el pico no debe crecer
+con el número de filas. Uso:
+
+    python tests/performance/bench_export.py [filas]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app import archive  # noqa: E402
+from app.history import CalculationHistory, HistoryRecord, local_timestamp  # noqa: E402
+from app.sqlite_history import SQLiteHistory  # noqa: E402
+
+CHUNK = 10000
+START = datetime(2025, 1, 1)
+
+
+def fill(backend, rows):
+    for offset in range(0, rows, CHUNK):
+        backend.add_many([
+            HistoryRecord(
+                i / 7, f"{float(i)} ÷ 7.0", local_timestamp(START + timedelta(microseconds=i)), operation_type="divide"
+            )
+            for i in range(offset, min(rows, offset + CHUNK))
+        ])
+    backend.flush()
+
+
+async def replay(data, size=65536):
+    for offset in range(0, len(data), size):
+        yield data[offset:offset + size]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    formats = ["csv", "ndjson"] + (["arrow"] if archive.pa is not None else [])
+    encodings = [None, "gzip"] + (["zstd"] if archive.zstandard is not None else [])
+    with tempfile.TemporaryDirectory() as directory:
+        backend = SQLiteHistory(path=os.path.join(directory, "history.db"))
+        fill(backend, rows)
+        print(f"{rows:,} filas")
+        for fmt in formats:
+            for encoding in encodings:
+                tracemalloc.start()
+                start = time.perf_counter()
+                size = 0
+                last = b""
+                for chunk in archive.export_history(backend, fmt, encoding):
+                    size += len(chunk)
+                    last = chunk
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                del last
+                print(
+                    f"  exportar {fmt:<6} {encoding or 'sin':<5} {rows / elapsed:>10,.0f} filas/s  "
+                    f"{size / 1e6:8.1f} MB  pico {peak / 1e6:6.1f} MB"
+                )
+        data = b"".join(archive.export_history(backend, "csv", "gzip"))
+        backend.close()
+    target = CalculationHistory(max_size=rows)
+    start = time.perf_counter()
+    asyncio.run(archive.import_history(target, replay(data), "csv", "gzip"))
+    print(f"  importar csv    gzip  {rows / (time.perf_counter() - start):>10,.0f} filas/s")
+
+
+if __name__ == "__main__":
+    main()
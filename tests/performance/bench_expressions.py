@@ -0,0 +1,56 @@
+"""Benchmark: /evaluate frente a encadenar /calculate y coste de la caché.
+
+Mide analizar y compilar una fórmula, evaluarla ya compilada, evaluarla por
+columnas y el recorrido HTTP en proceso de una fórmula de tres operaciones
+frente a las tres llamadas a /calculate equivalentes. Uso:
+
+    python tests/performance/bench_expressions.py [repeticiones]
+"""
+import os
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app import main as api  # noqa: E402
+from app.expressions import CompiledExpression  # noqa: E402
+
+FORMULA = "(price * quantity - discount) / installments"
+BINDINGS = {"price": 19.99, "quantity": 3, "discount": 5, "installments": 4}
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    compiled = CompiledExpression(FORMULA)
+    columns = {name: [value] * 100000 for name, value in BINDINGS.items()}
+    print(f"analizar + compilar : {per_call(lambda: CompiledExpression(FORMULA), repeat):8.2f} µs")
+    print(f"evaluar compilada   : {per_call(lambda: compiled.evaluate(BINDINGS), repeat):8.2f} µs")
+    vector = per_call(lambda: compiled.evaluate_many(columns), 20) / len(columns["price"])
+    print(f"por columnas        : {vector * 1000:8.2f} ns/fila")
+
+    client = TestClient(api.app)
+    body = {"expression": FORMULA, "variables": BINDINGS}
+
+    def chained():
+        step = client.post("/calculate", json={"a": 19.99, "b": 3, "operation": "multiply"}).json()["result"]
+        step = client.post("/calculate", json={"a": step, "b": 5, "operation": "subtract"}).json()["result"]
+        client.post("/calculate", json={"a": step, "b": 4, "operation": "divide"})
+
+    http_repeat = max(1, repeat // 20)
+    print(f"POST /evaluate      : {per_call(lambda: client.post('/evaluate', json=body), http_repeat):8.1f} µs")
+    print(f"3 x POST /calculate : {per_call(chained, http_repeat):8.1f} µs")
+    print(f"caché               : {api.expression_cache.stats()}")
+    api.history_db.clear_history()
+
+
+if __name__ == "__main__":
+    main()
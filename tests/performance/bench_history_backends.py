@@ -0,0 +1,82 @@
+"""Benchmark: historial en memoria frente a SQLite.
+
+Mide altas, lectura paginada, filtro por timestamp, consulta por operación
+y rango de tiempo y memoria/disco para cada tamaño. Uso:
+
+    python tests/performance/bench_history_backends.py [1000,100000,10000000]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.history import CalculationHistory, HistoryRecord, local_timestamp  # noqa: E402
+from app.operations import OPERATIONS as REGISTRY  # noqa: E402
+from app.sqlite_history import SQLiteHistory  # noqa: E402
+
+CHUNK = 10000
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+START = datetime(2025, 1, 1)
+
+
+def stamp(i):
+    # Un microsegundo por fila: el mismo formato que guarda el servicio
+    return local_timestamp(START + timedelta(microseconds=i))
+
+
+def record(i):
+    # Etiqueta como la de /calculate para que el almacén en memoria la empaquete
+    operation = OPERATIONS[i % 4]
+    return HistoryRecord(float(i), REGISTRY[operation].label(float(i), 1.0), stamp(i), operation_type=operation)
+
+
+def fill(backend, rows):
+    start = time.perf_counter()
+    for offset in range(0, rows, CHUNK):
+        backend.add_many([record(i) for i in range(offset, min(rows, offset + CHUNK))])
+    if hasattr(backend, "flush"):
+        backend.flush()
+    return time.perf_counter() - start
+
+
+def timed(fn, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def bench(name, backend, rows):
+    insert = fill(backend, rows)
+    middle = rows // 2
+    page = timed(lambda: backend.get_page(cursor=middle, limit=100))
+    since = timed(lambda: backend.get_page(since=stamp(middle), limit=100))
+    window = max(1, rows // 100)
+    ranged = timed(lambda: backend.get_page(
+        operation_type="divide", since=stamp(middle), until=stamp(middle + window), limit=100
+    ))
+    usage = backend.memory_usage()
+    # Filas fuera de las columnas empaquetadas no medirían lo que hace el servicio
+    assert usage.get("unpacked", 0) == 0, f"{usage['unpacked']} filas sin empaquetar"
+    size = usage.get("estimated_bytes", usage.get("database_bytes", 0) + usage.get("wal_bytes", 0))
+    print(
+        f"{name:<7} {rows:>10,} filas  alta: {rows / insert:>10,.0f} filas/s  "
+        f"página: {page:7.3f} ms  since: {since:7.3f} ms  rango: {ranged:7.3f} ms  bytes: {size / 1e6:9.1f} MB"
+    )
+
+
+def main():
+    sizes = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1000,100000,10000000").split(",")]
+    for rows in sizes:
+        bench("memoria", CalculationHistory(max_size=rows), rows)
+        with tempfile.TemporaryDirectory() as directory:
+            backend = SQLiteHistory(path=os.path.join(directory, "history.db"))
+            bench("sqlite", backend, rows)
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark: memoria y CPU del historial en memoria con 1M entradas.
+
+Registra `entradas` cálculos por la ruta de /calculate (`calculate_one`,
+sin caché de resultados) en un historial con esa capacidad e informa:
+tiempo por alta, memoria residente retenida por entrada y tiempo de
+serializar páginas de /history (con y sin filtro de operación). La
+memoria se mide desde antes de importar app.main, porque el buffer en
+memoria reserva sus columnas al crearse. Uso:
+
+    python tests/performance/bench_history_memory.py [entradas]
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+ENTRIES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+os.environ["HISTORY_BACKEND"] = "memory"
+os.environ["HISTORY_MAX_SIZE"] = str(ENTRIES)
+os.environ["RESULT_CACHE_SIZE"] = "0"
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.decoding import FastCalculationRequest  # noqa: E402
+from app.metrics import resident_memory_bytes  # noqa: E402
+from app.responses import dumps  # noqa: E402
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+
+def main():
+    rng = random.Random(42)
+    operands = [(round(rng.uniform(-1000, 1000), 2), round(rng.uniform(1, 1000), 2)) for _ in range(10000)]
+    gc.collect()
+    before = resident_memory_bytes()
+    from app import main as api
+
+    requests = [FastCalculationRequest(a, b, api.OperationType(rng.choice(OPERATIONS))) for a, b in operands]
+    start = time.perf_counter()
+    for index in range(ENTRIES):
+        api.calculate_one(requests[index % len(requests)])
+    api.history_db.flush_pending()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained = resident_memory_bytes() - before
+    print(f"entradas: {ENTRIES:,}  alta: {elapsed / ENTRIES * 1e6:.2f} us  "
+          f"memoria retenida: {retained / 2**20:.1f} MiB ({retained / ENTRIES:.0f} B/entrada)")
+    print(f"memory_usage(): {api.history_db.memory_usage()['estimated_bytes'] / 2**20:.1f} MiB estimados")
+    for label, filters in (("todas", {}), ("divide", {"operation_type": "divide"})):
+        for limit in (100, 10000):
+            start = time.perf_counter()
+            rounds = 20
+            for _ in range(rounds):
+                body = dumps([record.to_dict() for record in api.history_db.get_page(limit=limit, **filters)])
+            per_page = (time.perf_counter() - start) / rounds
+            print(f"/history {label:>6} limit={limit:>5}: {per_page * 1000:>7.2f} ms  ({len(body):,} bytes)")
+    start = time.perf_counter()
+    records = api.history_db.get_history()
+    print(f"get_history() completo: {(time.perf_counter() - start) * 1000:.0f} ms ({len(records):,} registros)")
+
+
+if __name__ == "__main__":
+    main()
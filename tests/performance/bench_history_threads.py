@@ -0,0 +1,68 @@
+"""Benchmark: altas y lecturas concurrentes sobre el historial en memoria.
+
+Varios hilos escriben mientras otros leen páginas; informa altas/s y
+lecturas/s por número de hilos escritores. Uso:
+
+    python tests/performance/bench_history_threads.py [1,2,4,8] [altas por hilo]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.history import CalculationHistory, HistoryRecord  # noqa: E402
+
+READERS = 2
+
+
+def bench(writers: int, per_writer: int) -> None:
+    history = CalculationHistory(max_size=100000)
+    records = [
+        [HistoryRecord(float(i), f"{i} + 1", "2025-01-01T00:00:00", operation_type="add") for i in range(per_writer)]
+        for _ in range(writers)
+    ]
+    barrier = threading.Barrier(writers + READERS + 1)
+    done = threading.Event()
+    reads = [0] * READERS
+
+    def write(batch):
+        barrier.wait()
+        for record in batch:
+            history.add_calculation(record)
+
+    def read(slot):
+        barrier.wait()
+        while not done.is_set():
+            history.get_page(cursor=max(0, history._next_seq - 200), limit=100)
+            reads[slot] += 1
+
+    threads = [threading.Thread(target=write, args=(batch,)) for batch in records]
+    readers = [threading.Thread(target=read, args=(slot,)) for slot in range(READERS)]
+    for thread in threads + readers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert history.get_stats()["total"]["count"] == writers * per_writer
+    print(
+        f"escritores: {writers:>2}  altas: {writers * per_writer / elapsed:>10,.0f}/s  "
+        f"lecturas: {sum(reads) / elapsed:>8,.0f}/s"
+    )
+
+
+def main():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1,2,4,8").split(",")]
+    per_writer = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+    for writers in counts:
+        bench(writers, per_writer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Benchmark: throughput frente a latencia del micro-batcher de /calculate.
+
+Llama a la aplicación ASGI en proceso con llamadas ASGI mínimas (sin
+cliente HTTP, que en una sola CPU se come casi todo el tiempo) desde
+`concurrencia` tareas, para cada ventana del batcher (`off` = sin
+batcher). Informa peticiones/s, p50/p99 y el tamaño medio de lote. Uso:
+
+    python tests/performance/bench_microbatch.py [off,0,1,5] [1,16,64,256] [peticiones] [distintas]
+
+`distintas` es el número de cuerpos diferentes que se reparten las
+peticiones: con pocos, la coalescencia entra en juego.
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app import main as api  # noqa: E402
+from app.batcher import MicroBatcher  # noqa: E402
+from harness import percentile  # noqa: E402
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+
+def make_bodies(distinct: int):
+    rng = random.Random(42)
+    return [
+        json.dumps({"a": rng.uniform(-1000, 1000), "b": rng.uniform(1, 1000), "operation": rng.choice(OPERATIONS)}).encode()
+        for _ in range(distinct)
+    ]
+
+
+async def call(body: bytes) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/calculate", "raw_path": b"/calculate", "root_path": "",
+        "query_string": b"", "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await api.app(scope, receive, send)
+    return status
+
+
+async def drive(bodies, total_requests: int, concurrency: int):
+    latencies = []
+    errors = 0
+    position = 0
+
+    async def worker():
+        nonlocal position, errors
+        while position < total_requests:
+            body = bodies[position % len(bodies)]
+            position += 1
+            start = time.perf_counter()
+            if await call(body) != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def bench(window: str, concurrency: int, total_requests: int, bodies) -> None:
+    batcher = None if window == "off" else MicroBatcher(api.calculate_many, float(window))
+    api.calculation_batcher = batcher
+    api.history_db.clear_history()
+    elapsed, latencies, errors = asyncio.run(drive(bodies, total_requests, concurrency))
+    mean_batch = f"{batcher.stats()['mean_batch']:>6.1f}" if batcher is not None else "     -"
+    coalesced = batcher.coalesced if batcher is not None else 0
+    print(
+        f"ventana: {window:>4}  concurrencia: {concurrency:>4}  {total_requests / elapsed:>8,.0f} pet/s  "
+        f"p50: {percentile(latencies, 0.5) * 1000:>7.2f} ms  p99: {percentile(latencies, 0.99) * 1000:>7.2f} ms  "
+        f"lote medio: {mean_batch}  combinadas: {coalesced:>6}  errores: {errors}"
+    )
+
+
+def main():
+    windows = (sys.argv[1] if len(sys.argv) > 1 else "off,0,1,5").split(",")
+    concurrency_levels = [int(n) for n in (sys.argv[2] if len(sys.argv) > 2 else "1,16,64,256").split(",")]
+    total_requests = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    bodies = make_bodies(int(sys.argv[4]) if len(sys.argv) > 4 else 1000)
+    for concurrency in concurrency_levels:
+        for window in windows:
+            bench(window, concurrency, total_requests, bodies)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Benchmark: modelos pydantic frente a la capa ligera (slots/msgspec).
+
+Mide bloques y bytes asignados por petición en la ruta caliente de
+/calculate (decodificar cuerpo + construir respuesta) y la memoria
+retenida por 1M entradas de historial con cada representación. Uso:
+
+    python tests/performance/bench_models.py [entradas_historial]
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.decoding import msgspec  # noqa: E402
+from app.history import HistoryRecord  # noqa: E402
+from app.main import CalculationRequest, CalculationResponse, calculation_decoder  # noqa: E402
+
+BODY = json.dumps({"a": 15.5, "b": 10.2, "operation": "add"}).encode()
+REQUESTS = 10000
+
+
+def pydantic_path():
+    request = CalculationRequest.model_validate_json(BODY)
+    return CalculationResponse(
+        result=round(request.a + request.b, 6),
+        operation=f"{request.a} + {request.b}",
+        timestamp=datetime.now().isoformat(),
+    )
+
+
+def light_path():
+    request = calculation_decoder.decode(BODY)
+    result = round(request.a + request.b, 6)
+    return {"result": result, "operation": f"{request.a} + {request.b}", "timestamp": datetime.now().isoformat()}
+
+
+def allocations(fn):
+    # Se conservan los objetos devueltos, como hacía el historial original
+    kept = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(REQUESTS):
+        kept.append(fn())
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        fn()
+    per_call = (time.perf_counter() - start) / REQUESTS * 1e6
+    return blocks / REQUESTS, size / REQUESTS, per_call
+
+
+def retained(factory, entries):
+    tracemalloc.start()
+    items = [factory(i) for i in range(entries)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    print(f"decodificador rápido: {'msgspec' if msgspec is not None else 'orjson/json'}")
+    for name, fn in [("pydantic", pydantic_path), ("ligero", light_path)]:
+        blocks, size, per_call = allocations(fn)
+        print(f"{name:<9} {blocks:5.1f} bloques/petición  {size:6.0f} B/petición  {per_call:5.2f} µs")
+
+    timestamp = datetime.now().isoformat()
+    pydantic_bytes = retained(
+        lambda i: CalculationResponse(result=i * 0.5, operation=f"{i} + {i}", timestamp=timestamp), entries
+    )
+    slots_bytes = retained(lambda i: HistoryRecord(i * 0.5, f"{i} + {i}", timestamp, operation_type="add"), entries)
+    print(f"historial {entries:,} entradas: pydantic {pydantic_bytes / 1e6:.0f} MB  slots {slots_bytes / 1e6:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark: respuesta de /health mientras llegan evaluaciones costosas.
+
+Arranca uvicorn con cada OFFLOAD_EXECUTOR y, durante unos segundos, varias
+tareas envían a /evaluate bloques grandes mientras otra consulta /health
+cada 50 ms. Informa evaluaciones/s, rechazos 503, latencia de /health y
+el retraso máximo del event loop que mide el propio servidor. Uso:
+
+    python tests/performance/bench_offload.py [inline,thread,process] [segundos] [concurrencia] [filas]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from harness import UvicornServer, percentile  # noqa: E402
+
+# Una fórmula larga: unas 60 operaciones por fila
+EXPRESSION = " + ".join(f"(x * {i} - y / {i + 1})" for i in range(1, 21))
+
+
+async def load(base_url: str, seconds: float, concurrency: int, rows: int):
+    rng = random.Random(1)
+    payload = {
+        "expression": EXPRESSION,
+        "variables": {"x": [rng.uniform(-1, 1) for _ in range(rows)], "y": [rng.uniform(1, 2) for _ in range(rows)]},
+    }
+    counts = {"ok": 0, "rejected": 0, "failed": 0}
+    health = []
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+
+        async def evaluator():
+            while time.perf_counter() < deadline:
+                response = await client.post("/evaluate", json=payload)
+                if response.status_code == 200:
+                    counts["ok"] += 1
+                elif response.status_code == 503:
+                    counts["rejected"] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    counts["failed"] += 1
+
+        async def prober():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/health")
+                health.append(time.perf_counter() - start)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(prober(), *(evaluator() for _ in range(concurrency)))
+        lag = (await client.get("/offload")).json()["event_loop"]
+    return counts, sorted(health), lag
+
+
+def bench(kind: str, seconds: float, concurrency: int, rows: int) -> None:
+    env = {
+        "HISTORY_BACKEND": "memory",
+        "OFFLOAD_EXECUTOR": kind,
+        "OFFLOAD_MAX_QUEUE": str(max(1, concurrency // 2)),
+        "OFFLOAD_MIN_ROWS": "1000",
+    }
+    with UvicornServer(env=env) as server:
+        counts, health, lag = asyncio.run(load(server.base_url, seconds, concurrency, rows))
+    print(
+        f"ejecutor: {kind:>7}  evaluaciones: {counts['ok'] / seconds:>6.1f}/s  503: {counts['rejected']:>4}  "
+        f"errores: {counts['failed']}  /health p50: {percentile(health, 0.5) * 1000:>7.1f} ms  "
+        f"p99: {percentile(health, 0.99) * 1000:>7.1f} ms  retraso máx. del loop: {lag['max_ms']:>7.1f} ms"
+    )
+
+
+def main():
+    kinds = (sys.argv[1] if len(sys.argv) > 1 else "inline,thread,process").split(",")
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    rows = int(sys.argv[4]) if len(sys.argv) > 4 else 10000
+    for kind in kinds:
+        bench(kind, seconds, concurrency, rows)
+
+
+if __name__ == "__main__":
+    main()
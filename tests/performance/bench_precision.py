@@ -0,0 +1,95 @@
+"""Benchmark: coste por operación de cada modo de precisión.
+
+Mide el cálculo puro (float + round, Decimal con el contexto cacheado y
+Fraction) y el recorrido completo de /calculate en proceso, incluido el
+decodificado del cuerpo, para cada modo. Uso:
+
+    python tests/performance/bench_precision.py [operaciones]
+"""
+import asyncio
+import decimal
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app import main as api  # noqa: E402
+from app import precision as exact  # noqa: E402
+
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+
+def operands(n):
+    rng = random.Random(5)
+    return [
+        (round(rng.uniform(1, 10000), 2), round(rng.uniform(1, 10000), 2), rng.choice(OPERATIONS))
+        for _ in range(n)
+    ]
+
+
+def per_op(fn, items):
+    start = time.perf_counter()
+    fn(items)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def float_path(items):
+    for a, b, operation in items:
+        result, _ = api.compute(a, b, api.OperationType(operation))
+        round(result, 6)
+
+
+def exact_path(mode):
+    context = exact.default_decimal_context()
+
+    def run(items):
+        for a, b, operation in items:
+            # repr recupera el decimal escrito (2 decimales), como el cuerpo JSON
+            exact.compute_exact(decimal.Decimal(repr(a)), decimal.Decimal(repr(b)), operation, mode, context)
+
+    return run
+
+
+class FakeRequest:
+    """Lo mínimo de starlette.Request que usa el handler de /calculate."""
+
+    # /calculate solo interpreta cuerpos con Content-Type JSON
+    headers = {"content-type": "application/json"}
+
+    def __init__(self, body):
+        self._body = body
+        self.scope = {}
+
+    async def body(self):
+        return self._body
+
+
+def request_bodies(items, mode):
+    # El modo float va sin campo `precision`, como las peticiones actuales
+    extra = {} if mode == "float" else {"precision": mode}
+    return [json.dumps({"a": a, "b": b, "operation": operation, **extra}).encode() for a, b, operation in items]
+
+
+def endpoint_path(bodies):
+    async def replay():
+        for body in bodies:
+            await api.calculate(FakeRequest(body))
+
+    asyncio.run(replay())
+
+
+def main():
+    items = operands(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
+    api.history_db.clear_history()
+    print(f"{'modo':<9} {'cálculo µs/op':>14} {'/calculate µs/op':>17}")
+    for mode, compute in (("float", float_path), ("decimal", exact_path("decimal")), ("fraction", exact_path("fraction"))):
+        bodies = request_bodies(items, mode)
+        print(f"{mode:<9} {per_op(compute, items):>14.3f} {per_op(endpoint_path, bodies):>17.2f}")
+        api.history_db.clear_history()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark: recuperación del historial en memoria desde snapshot + WAL.
+
+Genera en un directorio temporal un snapshot con el 90% de las altas y un
+segmento de WAL con el resto (mismo formato que escribe el diario) y mide
+cuánto tarda `HistoryJournal.recover` en reconstruir el historial. Uso:
+
+    python tests/performance/bench_recovery.py [1000000,10000000]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from app.history import CalculationHistory, HistoryRecord  # noqa: E402
+from app.journal import (  # noqa: E402
+    SNAPSHOT_HEADER,
+    SNAPSHOT_MAGIC,
+    SNAPSHOT_NAME,
+    HistoryJournal,
+    encode_record,
+)
+from app.stats import HistoryStats  # noqa: E402
+
+CHUNK = 100000
+OPERATIONS = ("add", "subtract", "multiply", "divide")
+
+
+def write_records(handle, first: int, last: int, wall: float, stats: HistoryStats) -> None:
+    for start in range(first, last, CHUNK):
+        chunks = []
+        for i in range(start, min(start + CHUNK, last)):
+            record = HistoryRecord(float(i), f"{i} + 1", "2025-01-01T00:00:00", operation_type=OPERATIONS[i % 4])
+            record.seq = i + 1
+            stats.add(record.result, record.operation_type, wall)
+            chunks.append(encode_record(record, wall))
+        handle.write(b"".join(chunks))
+
+
+def prepare(directory: str, entries: int) -> None:
+    wall = time.time()
+    in_snapshot = entries * 9 // 10
+    stats = HistoryStats()
+    body = os.path.join(directory, "body.tmp")
+    with open(body, "wb") as handle:
+        write_records(handle, 0, in_snapshot, wall, stats)
+    stats_bytes = json.dumps(stats.to_state()).encode()
+    with open(os.path.join(directory, SNAPSHOT_NAME), "wb") as snapshot, open(body, "rb") as records:
+        snapshot.write(SNAPSHOT_MAGIC + SNAPSHOT_HEADER.pack(1, in_snapshot + 1, len(stats_bytes)) + stats_bytes)
+        shutil.copyfileobj(records, snapshot, 16 * 1024 * 1024)
+    os.remove(body)
+    with open(os.path.join(directory, "wal-00000001.log"), "wb") as handle:
+        write_records(handle, in_snapshot, entries, wall, HistoryStats())
+
+
+def bench(entries: int) -> None:
+    directory = tempfile.mkdtemp(prefix="calc-wal-")
+    try:
+        prepare(directory, entries)
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        history = CalculationHistory(max_size=entries)
+        journal = HistoryJournal(directory)
+        start = time.perf_counter()
+        journal.recover(history)
+        elapsed = time.perf_counter() - start
+        assert len(history) == entries
+        assert history.get_stats()["total"]["count"] == entries
+        print(
+            f"altas: {entries:>11,}  disco: {size / 2**20:>8,.0f} MiB  "
+            f"recuperación: {elapsed:>7.2f} s  ({entries / elapsed:>9,.0f}/s)"
+        )
+        del history
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    counts = [int(n) for n in (sys.argv[1] if len(sys.argv) > 1 else "1000000,10000000").split(",")]
+    for entries in counts:
+        bench(entries)
+
+
+if __name__ == "__main__":
+    main()
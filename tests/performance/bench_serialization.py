@@ -0,0 +1,63 @@
+"""Benchmark: coste de serialización por endpoint antes y después de orjson.
+
+"antes" reproduce la ruta por defecto de FastAPI (validación contra
+response_model + json.dumps); "después" es la ruta actual (dicts internos
+serializados con FastJSONResponse). Uso:
+
+    python tests/performance/bench_serialization.py [entradas_historial]
+"""
+import json
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.history import HistoryRecord  # noqa: E402
+from app.main import CalculationResponse, HistoryEntry  # noqa: E402
+from app.responses import FastJSONResponse  # noqa: E402
+
+
+def per_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def before(adapter, content):
+    validated = adapter.validate_python(content)
+    return json.dumps(adapter.dump_python(validated, mode="json"), ensure_ascii=False).encode("utf-8")
+
+
+def after(content):
+    return FastJSONResponse(content).body
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    records = []
+    for i in range(entries):
+        record = HistoryRecord(i * 1.5, f"{i} + {i / 2}", "2025-01-01T00:00:00.000000")
+        record.seq = i + 1
+        records.append(record)
+    history = [record.to_dict() for record in records]
+    calculation = {"result": 25.7, "operation": "15.5 + 10.2", "timestamp": "2025-01-01T00:00:00.000000"}
+
+    calculate_adapter = TypeAdapter(CalculationResponse)
+    history_adapter = TypeAdapter(List[HistoryEntry])
+    rows = [
+        ("/calculate", calculate_adapter, calculation, 20000),
+        (f"/history ({entries:,})", history_adapter, history, 5),
+    ]
+    for name, adapter, content, repeat in rows:
+        old = per_call(lambda: before(adapter, content), repeat)
+        new = per_call(lambda: after(content), repeat)
+        print(f"{name:<20} antes: {old:12,.1f} µs  después: {new:12,.1f} µs  x{old / new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
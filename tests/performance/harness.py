@@ -0,0 +1,280 @@
+"""Arnés de carga y benchmark para la API de la calculadora.
+
+Ataca la aplicación en proceso (httpx.ASGITransport) o sobre un uvicorn
+local con una concurrencia y una mezcla de peticiones configurables sobre
+/calculate, /history y /health. Informa p50/p95/p99 y throughput por ruta
+y guarda el resultado en JSON para comparar entre commits. Uso:
+
+    python tests/performance/harness.py --mode asgi --concurrency 32 \\
+        --requests 20000 --mix calculate=8,history=1,health=1 \\
+        --output resultados.json --compare base.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_MIX = {"calculate": 8, "history": 1, "health": 1}
+OPERATIONS = ["add", "subtract", "multiply", "divide"]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Ruta desconocida en la mezcla: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict:
+    routes = {}
+    total = 0
+    for name, values in latencies.items():
+        values.sort()
+        total += len(values)
+        routes[name] = {
+            "requests": len(values),
+            "errors": errors.get(name, 0),
+            "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+            "max_ms": (values[-1] if values else 0.0) * 1000,
+        }
+    return {
+        "elapsed_s": elapsed,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "routes": routes,
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    total_requests: int,
+    concurrency: int,
+    mix: Dict[str, float],
+    history_limit: int,
+    seed: int = 1,
+) -> Dict:
+    rng = random.Random(seed)
+    names = list(mix)
+    plan = rng.choices(names, weights=[mix[name] for name in names], k=total_requests)
+    payloads = [
+        {"a": rng.uniform(-1000, 1000), "b": rng.uniform(1, 1000), "operation": rng.choice(OPERATIONS)}
+        for _ in range(min(total_requests, 1000))
+    ]
+    history_params = {"limit": history_limit} if history_limit else {}
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {}
+    position = 0
+
+    async def worker():
+        nonlocal position
+        while position < total_requests:
+            index = position
+            position += 1
+            name = plan[index]
+            start = time.perf_counter()
+            try:
+                if name == "calculate":
+                    response = await client.post("/calculate", json=payloads[index % len(payloads)])
+                elif name == "history":
+                    response = await client.get("/history", params=history_params)
+                else:
+                    response = await client.get("/health")
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies[name].append(time.perf_counter() - start)
+            if failed:
+                errors[name] = errors.get(name, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class UvicornServer:
+    """Arranca `uvicorn app.main:app` en un puerto local libre."""
+
+    def __init__(self, workers: int = 1, env: Optional[Dict[str, str]] = None):
+        self.port = free_port()
+        self.workers = workers
+        self.env = dict(os.environ, **(env or {}))
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "UvicornServer":
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning",
+            ],
+            cwd=BACKEND_DIR,
+            env=self.env,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                if httpx.get(f"{self.base_url}/health").status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        self.__exit__()
+        raise RuntimeError("uvicorn no arrancó a tiempo")
+
+    def __exit__(self, *exc_info) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+async def run_asgi(total_requests: int, concurrency: int, mix: Dict[str, float], history_limit: int) -> Dict:
+    from app.main import app, history_db
+
+    history_db.clear_history()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://asgi") as client:
+        return await drive(client, total_requests, concurrency, mix, history_limit)
+
+
+async def run_socket(
+    base_url: str, total_requests: int, concurrency: int, mix: Dict[str, float], history_limit: int
+) -> Dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        await client.delete("/history")
+        return await drive(client, total_requests, concurrency, mix, history_limit)
+
+
+def run_benchmark(
+    mode: str = "asgi",
+    total_requests: int = 2000,
+    concurrency: int = 16,
+    mix: Optional[Dict[str, float]] = None,
+    history_limit: int = 100,
+    workers: int = 1,
+) -> Dict:
+    mix = mix or DEFAULT_MIX
+    if mode == "asgi":
+        results = asyncio.run(run_asgi(total_requests, concurrency, mix, history_limit))
+    elif mode == "uvicorn":
+        with UvicornServer(workers=workers) as server:
+            results = asyncio.run(run_socket(server.base_url, total_requests, concurrency, mix, history_limit))
+    else:
+        raise ValueError(f"Modo desconocido: {mode}")
+    return {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(),
+        "config": {
+            "mode": mode,
+            "requests": total_requests,
+            "concurrency": concurrency,
+            "mix": mix,
+            "history_limit": history_limit,
+            "workers": workers,
+        },
+        "results": results,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Lista las rutas cuyo p95 o throughput empeoran más que `tolerance`."""
+    regressions = []
+    for name, now in current["results"]["routes"].items():
+        before = baseline["results"]["routes"].get(name)
+        if before is None:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {now['p95_ms']:.2f} ms")
+        if before["throughput_rps"] and now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']:.0f} -> {now['throughput_rps']:.0f} req/s"
+            )
+    return regressions
+
+
+def print_report(report: Dict) -> None:
+    config = report["config"]
+    results = report["results"]
+    print(
+        f"modo: {config['mode']}  concurrencia: {config['concurrency']}  peticiones: {results['requests']}  "
+        f"throughput: {results['throughput_rps']:,.0f} req/s  errores: {results['errors']}"
+    )
+    for name, route in results["routes"].items():
+        print(
+            f"  {name:<10} {route['requests']:>7}  {route['throughput_rps']:>9,.0f} req/s  "
+            f"p50 {route['p50_ms']:7.2f}  p95 {route['p95_ms']:7.2f}  p99 {route['p99_ms']:7.2f} ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la API de la calculadora")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="p.ej. calculate=8,history=1,health=1")
+    parser.add_argument("--history-limit", type=int, default=100, help="limit de /history (0 = completo)")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn en modo uvicorn")
+    parser.add_argument("--output", help="fichero JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+
+    report = run_benchmark(args.mode, args.requests, args.concurrency, args.mix, args.history_limit, args.workers)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(report, json.load(handle), args.tolerance)
+        for line in regressions:
+            print(f"REGRESIÓN {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Prueba de carga: escalado de /calculate con el número de workers de uvicorn.
+
+Para cada número de workers arranca `uvicorn app.main:app --workers N` con
+el historial SQLite compartido, lanza varios procesos cliente concurrentes
+durante unos segundos y comprueba que el historial contiene exactamente las
+operaciones exitosas de todos los workers. Uso:
+
+    python tests/performance/load_multiworker.py --workers 1,2,4,8,16 --duration 10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "backend")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers: int, port: int, db_path: str) -> subprocess.Popen:
+    env = dict(os.environ, HISTORY_BACKEND="sqlite", HISTORY_SQLITE_PATH=db_path, WEB_CONCURRENCY=str(workers))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("El servidor no arrancó")
+
+
+async def client_loop(port: int, concurrency: int, duration: float) -> int:
+    payload = {"a": 15.5, "b": 10.2, "operation": "add"}
+    ok = 0
+    stop_at = time.perf_counter() + duration
+
+    async def worker(client):
+        nonlocal ok
+        while time.perf_counter() < stop_at:
+            response = await client.post("/calculate", json=payload)
+            ok += response.status_code == 200
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return ok
+
+
+def client_process(args) -> int:
+    return asyncio.run(client_loop(*args))
+
+
+def run(workers: int, clients: int, concurrency: int, duration: float):
+    with tempfile.TemporaryDirectory() as directory:
+        port = free_port()
+        server = start_server(workers, port, os.path.join(directory, "history.db"))
+        try:
+            httpx.delete(f"http://127.0.0.1:{port}/history")
+            with multiprocessing.Pool(clients) as pool:
+                start = time.perf_counter()
+                ok = sum(pool.map(client_process, [(port, concurrency, duration)] * clients))
+                elapsed = time.perf_counter() - start
+            # Deja que cada worker confirme su última ventana de escrituras
+            time.sleep(1)
+            entries = httpx.get(f"http://127.0.0.1:{port}/history/memory").json()["entries"]
+        finally:
+            server.terminate()
+            server.wait()
+    return ok / elapsed, ok, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="procesos cliente")
+    parser.add_argument("--concurrency", type=int, default=32, help="peticiones en vuelo por cliente")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(",")]:
+        throughput, ok, entries = run(workers, args.clients, args.concurrency, args.duration)
+        baseline = baseline or throughput / workers
+        consistent = "OK" if ok == entries else f"DISTINTO ({entries})"
+        print(
+            f"workers: {workers:>2}  {throughput:>9,.0f} req/s  "
+            f"eficiencia: {throughput / (baseline * workers):5.0%}  historial: {ok} {consistent}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import copy
+import json
+
+import pytest
+
+from harness import compare, parse_mix, percentile, run_benchmark
+
+
+@pytest.fixture(scope="module")
+def asgi_report():
+    return run_benchmark(mode="asgi", total_requests=1000, concurrency=8)
+
+
+class TestPerformance:
+    """Pruebas de rendimiento con el arnés de benchmark"""
+
+    def test_asgi_run_without_errors(self, asgi_report):
+        """Prueba que la mezcla por defecto se ejecuta sin errores"""
+        results = asgi_report["results"]
+        assert results["requests"] == 1000
+        assert results["errors"] == 0
+        assert set(results["routes"]) == {"calculate", "history", "health"}
+
+    def test_percentiles_are_ordered(self, asgi_report):
+        """Prueba que p50 <= p95 <= p99 en cada ruta"""
+        for route in asgi_report["results"]["routes"].values():
+            assert route["p50_ms"] <= route["p95_ms"] <= route["p99_ms"] <= route["max_ms"]
+
+    def test_single_calculation_performance(self, asgi_report):
+        """Prueba que /calculate responde en menos de 100ms en p99"""
+        assert asgi_report["results"]["routes"]["calculate"]["p99_ms"] < 100
+
+    def test_report_is_machine_readable(self, asgi_report, tmp_path):
+        """Prueba que el informe se guarda y relee como JSON"""
+        path = tmp_path / "results.json"
+        path.write_text(json.dumps(asgi_report))
+        loaded = json.loads(path.read_text())
+        assert loaded["config"]["mode"] == "asgi"
+        assert loaded["results"]["throughput_rps"] > 0
+
+    def test_compare_detects_regression(self, asgi_report):
+        """Prueba que la comparación detecta un p95 peor"""
+        slower = copy.deepcopy(asgi_report)
+        slower["results"]["routes"]["calculate"]["p95_ms"] *= 2
+        assert compare(asgi_report, asgi_report, 0.1) == []
+        assert any(line.startswith("calculate: p95") for line in compare(slower, asgi_report, 0.1))
+
+    def test_uvicorn_socket_mode(self):
+        """Prueba el arnés contra un uvicorn local"""
+        report = run_benchmark(mode="uvicorn", total_requests=200, concurrency=4, mix=parse_mix("calculate=1,health=1"))
+        assert report["results"]["errors"] == 0
+        assert report["results"]["requests"] == 200
+
+
+class TestHelpers:
+    """Pruebas de utilidades del arnés"""
+
+    def test_percentile_nearest_rank(self):
+        """Prueba el percentil por rango más cercano"""
+        values = [float(i) for i in range(1, 101)]
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile([], 0.5) == 0
+
+    def test_parse_mix_rejects_unknown_route(self):
+        """Prueba que una ruta desconocida es un error"""
+        with pytest.raises(ValueError):
+            parse_mix("calculate=1,unknown=2")